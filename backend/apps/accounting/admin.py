@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ChartOfAccount, GeneralLedger
+from .models import AccountBalanceSnapshot, ChartOfAccount, GeneralLedger
 
 @admin.register(ChartOfAccount)
 class ChartOfAccountAdmin(admin.ModelAdmin):
@@ -10,3 +10,9 @@ class ChartOfAccountAdmin(admin.ModelAdmin):
 class GeneralLedgerAdmin(admin.ModelAdmin):
 	list_display = ('TransactionID', 'CompanyID', 'AccountID', 'TransactionDate', 'Description', 'DebitAmount', 'CreditAmount', 'GLNotes', 'CurrencyCode', 'ExchangeRate', 'UserID', 'CreatedDate')
 	search_fields = ('Description', 'CurrencyCode')
+
+@admin.register(AccountBalanceSnapshot)
+class AccountBalanceSnapshotAdmin(admin.ModelAdmin):
+	list_display = ('SnapshotID', 'CompanyID', 'AccountID', 'SnapshotDate', 'CumulativeDebit', 'CumulativeCredit', 'UpdatedDate')
+	list_filter = ('CompanyID',)
+	readonly_fields = ('CumulativeDebit', 'CumulativeCredit', 'UpdatedDate')
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AccountingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.accounting'
+
+    def ready(self):
+        # Keep AccountBalanceSnapshot in step with GeneralLedger writes
+        import apps.accounting.signals  # noqa: F401
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounting.snapshots import DEFAULT_BATCH_SIZE, rebuild_snapshots, verify_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Rebuild (or verify) the daily account balance snapshots from the general ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, action='append', dest='companies',
+                            help='Only process this company ID (repeatable)')
+        parser.add_argument('--verify-only', action='store_true',
+                            help='Compare snapshots with the ledger without rewriting them')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Snapshot rows per bulk insert')
+        parser.add_argument('--max-report', type=int, default=20,
+                            help='Maximum mismatches to print when verifying')
+
+    def handle(self, *args, **options):
+        companies = options['companies']
+
+        if not options['verify_only']:
+            written = rebuild_snapshots(companies, batch_size=options['batch_size'])
+            self.stdout.write(f"Wrote {written} snapshot rows")
+
+        mismatches = verify_snapshots(companies)
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("Snapshots match the general ledger"))
+            return
+
+        for company_id, account_id, day, expected, actual in mismatches[:options['max_report']]:
+            self.stdout.write(
+                f"Company {company_id} account {account_id} {day}: expected {expected}, found {actual}"
+            )
+        raise CommandError(f"{len(mismatches)} snapshot rows do not match the general ledger")
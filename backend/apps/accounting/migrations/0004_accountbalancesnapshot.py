@@ -0,0 +1,43 @@
+# Generated by Django 4.2.11 on 2026-10-18 09:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_snapshots(apps, schema_editor):
+    from apps.accounting.snapshots import rebuild_snapshots
+
+    rebuild_snapshots(
+        snapshot_model=apps.get_model('accounting', 'AccountBalanceSnapshot'),
+        ledger_model=apps.get_model('accounting', 'GeneralLedger'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_profile_photo'),
+        ('accounting', '0003_alter_chartofaccount_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountBalanceSnapshot',
+            fields=[
+                ('SnapshotID', models.AutoField(primary_key=True, serialize=False, verbose_name='Snapshot ID')),
+                ('SnapshotDate', models.DateField(verbose_name='Snapshot Date')),
+                ('CumulativeDebit', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Cumulative Debit')),
+                ('CumulativeCredit', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Cumulative Credit')),
+                ('UpdatedDate', models.DateTimeField(auto_now=True, verbose_name='Updated Date')),
+                ('AccountID', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounting.chartofaccount', verbose_name='Account')),
+                ('CompanyID', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.company', verbose_name='Company')),
+            ],
+            options={
+                'verbose_name': 'Account Balance Snapshot',
+                'verbose_name_plural': 'Account Balance Snapshots',
+                'db_table': 'AccountBalanceSnapshots',
+                'unique_together': {('AccountID', 'SnapshotDate')},
+            },
+        ),
+        migrations.RunPython(build_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.11 on 2026-10-18 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0004_accountbalancesnapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='generalledger',
+            index=models.Index(fields=['CompanyID', 'AccountID', 'TransactionDate'], include=('DebitAmount', 'CreditAmount'), name='gl_company_acct_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='generalledger',
+            index=models.Index(fields=['CompanyID', '-TransactionDate'], name='gl_company_date_idx'),
+        ),
+    ]
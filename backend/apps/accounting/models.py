@@ -41,3 +41,42 @@ class GeneralLedger(models.Model):
         db_table = 'GeneralLedger'
         verbose_name = "General Ledger Entry"
         verbose_name_plural = "General Ledger"
+        indexes = [
+            # Report engine: per-company GROUP BY AccountID over a date window.
+            # The amounts are included so SQL Server answers it from the index alone.
+            models.Index(
+                fields=['CompanyID', 'AccountID', 'TransactionDate'],
+                include=['DebitAmount', 'CreditAmount'],
+                name='gl_company_acct_date_idx',
+            ),
+            # General ledger report: company entries by date, newest first
+            models.Index(fields=['CompanyID', '-TransactionDate'], name='gl_company_date_idx'),
+        ]
+
+
+class AccountBalanceSnapshot(models.Model):
+    """
+    Cumulative debit/credit totals for an account through the end of a day.
+
+    One row exists for every (account, day) with ledger activity, so the
+    balance as of any moment is the latest snapshot before that day plus the
+    ledger entries posted on the day itself. Rows are maintained by the
+    GeneralLedger signal handlers in apps.accounting.signals and can be
+    rebuilt with ``manage.py rebuild_balance_snapshots``.
+    """
+    SnapshotID = models.AutoField(primary_key=True, verbose_name="Snapshot ID")
+    CompanyID = models.ForeignKey(Company, on_delete=models.CASCADE, verbose_name="Company")
+    AccountID = models.ForeignKey(ChartOfAccount, on_delete=models.CASCADE, verbose_name="Account")
+    SnapshotDate = models.DateField(verbose_name="Snapshot Date")
+    CumulativeDebit = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="Cumulative Debit")
+    CumulativeCredit = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="Cumulative Credit")
+    UpdatedDate = models.DateTimeField(auto_now=True, verbose_name="Updated Date")
+
+    def __str__(self):
+        return f"{self.AccountID_id} @ {self.SnapshotDate}: Dr {self.CumulativeDebit} / Cr {self.CumulativeCredit}"
+
+    class Meta:
+        db_table = 'AccountBalanceSnapshots'
+        verbose_name = "Account Balance Snapshot"
+        verbose_name_plural = "Account Balance Snapshots"
+        unique_together = (('AccountID', 'SnapshotDate'),)
@@ -3,7 +3,7 @@ from .models import ChartOfAccount, GeneralLedger
 
 class ChartOfAccountSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(source='AccountID', read_only=True)
-    company_id = serializers.IntegerField(source='CompanyID', read_only=True)
+    company_id = serializers.IntegerField(source='CompanyID_id', read_only=True)
     code = serializers.CharField(source='AccountCode')
     name = serializers.CharField(source='AccountName')
     type = serializers.CharField(source='AccountType')
@@ -18,17 +18,17 @@ class ChartOfAccountSerializer(serializers.ModelSerializer):
 
 class GeneralLedgerSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(source='TransactionID', read_only=True)
-    company_id = serializers.IntegerField(source='CompanyID', read_only=True)
-    account_id = serializers.IntegerField(source='AccountID', read_only=True)
+    company_id = serializers.IntegerField(source='CompanyID_id', read_only=True)
+    account_id = serializers.IntegerField(source='AccountID_id', read_only=True)
     account = ChartOfAccountSerializer(source='AccountID', read_only=True)
     transaction_date = serializers.DateTimeField(source='TransactionDate')
-    description = serializers.CharField(required=False, allow_blank=True)
+    description = serializers.CharField(source='Description', required=False, allow_blank=True)
     debit_amount = serializers.DecimalField(source='DebitAmount', max_digits=18, decimal_places=2)
     credit_amount = serializers.DecimalField(source='CreditAmount', max_digits=18, decimal_places=2)
     notes = serializers.CharField(source='GLNotes', required=False, allow_blank=True)
     currency_code = serializers.CharField(source='CurrencyCode', default='USD')
     exchange_rate = serializers.DecimalField(source='ExchangeRate', max_digits=10, decimal_places=6, default=1.000000)
-    user_id = serializers.IntegerField(source='UserID', read_only=True)
+    user_id = serializers.IntegerField(source='UserID_id', read_only=True)
     created_date = serializers.DateTimeField(source='CreatedDate', read_only=True)
     
     class Meta:
@@ -0,0 +1,66 @@
+from decimal import Decimal
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import GeneralLedger
+from .snapshots import apply_delta, snapshot_day
+
+
+def _snapshot_key(entry):
+    """The (company, account, day, debit, credit) contribution of a ledger entry."""
+    return (
+        entry.CompanyID_id,
+        entry.AccountID_id,
+        snapshot_day(entry.TransactionDate),
+        Decimal(str(entry.DebitAmount or 0)),
+        Decimal(str(entry.CreditAmount or 0)),
+    )
+
+
+@receiver(pre_save, sender=GeneralLedger)
+def remember_previous_ledger_values(sender, instance, raw=False, **kwargs):
+    """
+    Stash the stored values of an entry that is about to be updated so the
+    post_save handler can reverse its old contribution.
+    """
+    instance._snapshot_previous = None
+    if raw or instance.pk is None:
+        return
+    previous = sender.objects.filter(pk=instance.pk).first()
+    if previous is not None:
+        instance._snapshot_previous = _snapshot_key(previous)
+
+
+@receiver(post_save, sender=GeneralLedger)
+def update_snapshots_on_save(sender, instance, created, raw=False, **kwargs):
+    """
+    Move the entry's contribution into the daily balance snapshots.
+    """
+    if raw:
+        return
+    previous = getattr(instance, '_snapshot_previous', None)
+    current = _snapshot_key(instance)
+    if previous == current:
+        return
+    if previous is not None:
+        company_id, account_id, day, debit, credit = previous
+        apply_delta(company_id, account_id, day, -debit, -credit)
+    company_id, account_id, day, debit, credit = current
+    apply_delta(company_id, account_id, day, debit, credit)
+    instance._snapshot_previous = current
+
+
+@receiver(post_delete, sender=GeneralLedger)
+def update_snapshots_on_delete(sender, instance, origin=None, **kwargs):
+    """
+    Remove a deleted entry's contribution from the daily balance snapshots.
+
+    Entries deleted by cascade from their account or company are skipped:
+    the snapshots go with them.
+    """
+    origin_model = getattr(origin, 'model', type(origin))
+    if origin is not None and origin_model is not GeneralLedger:
+        return
+    company_id, account_id, day, debit, credit = _snapshot_key(instance)
+    apply_delta(company_id, account_id, day, -debit, -credit)
@@ -0,0 +1,285 @@
+"""
+Daily cumulative balance snapshots for the general ledger.
+
+``AccountBalanceSnapshot`` stores, for every account and every day with
+ledger activity, the cumulative debit and credit totals through the end of
+that day. A balance as of any moment is then the nearest earlier snapshot
+plus the (short) tail of entries posted on the cutoff day, instead of a scan
+of the account's whole history.
+
+Snapshots are maintained incrementally by the GeneralLedger signal handlers
+in ``apps.accounting.signals``. ``bulk_create``, ``QuerySet.update`` and raw
+SQL bypass those handlers; run ``manage.py rebuild_balance_snapshots`` after
+such loads.
+"""
+import bisect
+from collections import defaultdict
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, F, OuterRef, QuerySet, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+ZERO = Decimal('0')
+DEFAULT_BATCH_SIZE = 5000
+
+
+def snapshots_enabled():
+    """Whether balance-as-of reads should go through the snapshot table."""
+    return getattr(settings, 'LEDGER_SNAPSHOTS_ENABLED', True)
+
+
+def _default_tz():
+    return timezone.get_default_timezone()
+
+
+def _ledger_model():
+    from .models import GeneralLedger
+    return GeneralLedger
+
+
+def _snapshot_model():
+    from .models import AccountBalanceSnapshot
+    return AccountBalanceSnapshot
+
+
+def _zero():
+    return Value(ZERO, output_field=DecimalField(max_digits=20, decimal_places=2))
+
+
+def as_cutoff(value):
+    """
+    Normalise a ``TransactionDate`` bound to an aware datetime.
+
+    Plain dates become midnight in the default time zone, which is how the
+    ORM itself compares a date against the DateTimeField.
+    """
+    if isinstance(value, datetime):
+        if timezone.is_naive(value):
+            return timezone.make_aware(value, _default_tz())
+        return value
+    if isinstance(value, date):
+        return timezone.make_aware(datetime.combine(value, time.min), _default_tz())
+    return as_cutoff(_ledger_model()._meta.get_field('TransactionDate').to_python(value))
+
+
+def snapshot_day(value):
+    """Return the snapshot day (default time zone) a ``TransactionDate`` belongs to."""
+    return timezone.localtime(as_cutoff(value), _default_tz()).date()
+
+
+def day_start(day):
+    """Return the aware datetime at which ``day`` begins."""
+    return timezone.make_aware(datetime.combine(day, time.min), _default_tz())
+
+
+# --- incremental maintenance -------------------------------------------------
+
+def apply_delta(company_id, account_id, day, debit, credit):
+    """
+    Add ``debit``/``credit`` to the snapshot for ``day`` and every later day.
+
+    Creates the snapshot for ``day`` (seeded from the previous snapshot) when
+    the account had no activity on that day yet. Joins the caller's
+    transaction, so a ledger write wrapped in ``atomic()`` and its snapshot
+    update commit or roll back together.
+    """
+    debit = Decimal(str(debit or 0))
+    credit = Decimal(str(credit or 0))
+    if not debit and not credit:
+        return
+
+    Snapshot = _snapshot_model()
+    with transaction.atomic():
+        if not Snapshot.objects.filter(AccountID_id=account_id, SnapshotDate=day).exists():
+            previous = (
+                Snapshot.objects.filter(AccountID_id=account_id, SnapshotDate__lt=day)
+                .order_by('-SnapshotDate')
+                .values_list('CumulativeDebit', 'CumulativeCredit')
+                .first()
+            )
+            base_debit, base_credit = previous or (ZERO, ZERO)
+            try:
+                with transaction.atomic():
+                    Snapshot.objects.create(
+                        CompanyID_id=company_id,
+                        AccountID_id=account_id,
+                        SnapshotDate=day,
+                        CumulativeDebit=base_debit,
+                        CumulativeCredit=base_credit,
+                    )
+            except IntegrityError:
+                # A concurrent writer created the row first; the update below still applies
+                pass
+
+        Snapshot.objects.filter(AccountID_id=account_id, SnapshotDate__gte=day).update(
+            CumulativeDebit=F('CumulativeDebit') + debit,
+            CumulativeCredit=F('CumulativeCredit') + credit,
+            UpdatedDate=timezone.now(),
+        )
+
+
+# --- reads -------------------------------------------------------------------
+
+def latest_snapshots(company, before_day=None):
+    """
+    Return the latest snapshot per account strictly before ``before_day``.
+
+    With ``before_day=None`` the latest snapshot overall is used. ``company``
+    may be a Company, a primary key, or a queryset/iterable of either.
+    """
+    Snapshot = _snapshot_model()
+    latest = Snapshot.objects.filter(AccountID=OuterRef('AccountID'))
+    if before_day is not None:
+        latest = latest.filter(SnapshotDate__lt=before_day)
+    latest = latest.order_by('-SnapshotDate').values('SnapshotDate')[:1]
+
+    if isinstance(company, (QuerySet, list, tuple, set, frozenset)):
+        snapshots = Snapshot.objects.filter(CompanyID__in=company)
+    else:
+        snapshots = Snapshot.objects.filter(CompanyID=company)
+    if before_day is not None:
+        snapshots = snapshots.filter(SnapshotDate__lt=before_day)
+    return snapshots.filter(SnapshotDate=Subquery(latest))
+
+
+def snapshot_totals(snapshots, group_field):
+    """Sum the cumulative columns of ``snapshots`` grouped by ``group_field``."""
+    rows = (
+        snapshots.order_by()
+        .values(group_field)
+        .annotate(
+            debit=Coalesce(Sum('CumulativeDebit'), _zero()),
+            credit=Coalesce(Sum('CumulativeCredit'), _zero()),
+        )
+        .values_list(group_field, 'debit', 'credit')
+    )
+    return {key: (debit, credit) for key, debit, credit in rows}
+
+
+# --- rebuild and verification --------------------------------------------------
+
+def _daily_totals(ledger_model, company_id):
+    """Yield ``(account_id, day, debit, credit)`` ordered by account and day."""
+    return (
+        ledger_model.objects.filter(CompanyID_id=company_id)
+        .annotate(day=TruncDate('TransactionDate', tzinfo=_default_tz()))
+        .order_by()
+        .values('AccountID', 'day')
+        .annotate(
+            debit=Coalesce(Sum('DebitAmount'), _zero()),
+            credit=Coalesce(Sum('CreditAmount'), _zero()),
+        )
+        .order_by('AccountID', 'day')
+        .values_list('AccountID', 'day', 'debit', 'credit')
+        .iterator()
+    )
+
+
+def _cumulative_rows(ledger_model, company_id):
+    """Yield ``(account_id, day, cumulative_debit, cumulative_credit)``."""
+    current_account = None
+    running_debit = running_credit = ZERO
+    for account_id, day, debit, credit in _daily_totals(ledger_model, company_id):
+        if account_id != current_account:
+            current_account = account_id
+            running_debit = running_credit = ZERO
+        running_debit += debit
+        running_credit += credit
+        yield account_id, day, running_debit, running_credit
+
+
+def _company_ids(ledger_model, company_ids):
+    if company_ids is not None:
+        return list(company_ids)
+    return list(
+        ledger_model.objects.order_by().values_list('CompanyID', flat=True).distinct()
+    )
+
+
+def rebuild_snapshots(company_ids=None, batch_size=DEFAULT_BATCH_SIZE, snapshot_model=None, ledger_model=None):
+    """
+    Recompute snapshots from the ledger, one company per transaction.
+
+    Returns the number of snapshot rows written. The model arguments let the
+    data migration pass its historical models.
+    """
+    Snapshot = snapshot_model or _snapshot_model()
+    Ledger = ledger_model or _ledger_model()
+    if company_ids is None:
+        Snapshot.objects.all().delete()
+
+    written = 0
+    for company_id in _company_ids(Ledger, company_ids):
+        with transaction.atomic():
+            Snapshot.objects.filter(CompanyID_id=company_id).delete()
+            batch = []
+            for account_id, day, debit, credit in _cumulative_rows(Ledger, company_id):
+                batch.append(Snapshot(
+                    CompanyID_id=company_id,
+                    AccountID_id=account_id,
+                    SnapshotDate=day,
+                    CumulativeDebit=debit,
+                    CumulativeCredit=credit,
+                ))
+                if len(batch) >= batch_size:
+                    Snapshot.objects.bulk_create(batch, batch_size=batch_size)
+                    written += len(batch)
+                    batch = []
+            if batch:
+                Snapshot.objects.bulk_create(batch, batch_size=batch_size)
+                written += len(batch)
+    return written
+
+
+def verify_snapshots(company_ids=None):
+    """
+    Compare stored snapshots with totals recomputed from the ledger.
+
+    Returns a list of ``(company_id, account_id, day, expected, actual)``
+    tuples, where ``expected``/``actual`` are ``(debit, credit)`` pairs and
+    ``actual`` is ``None`` for a missing snapshot. Snapshots left behind on
+    days whose entries were all deleted are valid as long as they carry the
+    cumulative totals of the preceding day.
+    """
+    Snapshot = _snapshot_model()
+    Ledger = _ledger_model()
+    if company_ids is None:
+        company_ids = sorted(
+            set(_company_ids(Ledger, None))
+            | set(Snapshot.objects.order_by().values_list('CompanyID', flat=True).distinct())
+        )
+
+    mismatches = []
+    for company_id in company_ids:
+        expected = defaultdict(list)
+        for account_id, day, debit, credit in _cumulative_rows(Ledger, company_id):
+            expected[account_id].append((day, (debit, credit)))
+
+        stored = defaultdict(dict)
+        rows = (
+            Snapshot.objects.filter(CompanyID_id=company_id)
+            .values_list('AccountID', 'SnapshotDate', 'CumulativeDebit', 'CumulativeCredit')
+            .iterator()
+        )
+        for account_id, day, debit, credit in rows:
+            stored[account_id][day] = (debit, credit)
+
+        for account_id in set(expected) | set(stored):
+            days = [day for day, _ in expected.get(account_id, [])]
+            totals = [pair for _, pair in expected.get(account_id, [])]
+            account_stored = stored.get(account_id, {})
+            for day, pair in expected.get(account_id, []):
+                if account_stored.get(day) != pair:
+                    mismatches.append((company_id, account_id, day, pair, account_stored.get(day)))
+            for day, pair in account_stored.items():
+                if day in days:
+                    continue
+                position = bisect.bisect_right(days, day)
+                want = totals[position - 1] if position else (ZERO, ZERO)
+                if pair != want:
+                    mismatches.append((company_id, account_id, day, want, pair))
+    return mismatches
@@ -0,0 +1,160 @@
+from datetime import date, datetime
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import Company, User, UserCompanyRole
+from apps.reports import engine
+
+from .models import AccountBalanceSnapshot, ChartOfAccount, GeneralLedger
+from .snapshots import verify_snapshots
+
+
+def _at(year, month, day, hour=12):
+    return timezone.make_aware(datetime(year, month, day, hour, 0))
+
+
+class AccountBalanceSnapshotTests(TestCase):
+    """GeneralLedger writes keep the daily balance snapshots current."""
+
+    def setUp(self):  # noqa: D401
+        """Create a company with two accounts."""
+        self.company = Company.objects.create(CompanyName="Acme LLC")
+        self.cash = ChartOfAccount.objects.create(
+            CompanyID=self.company, AccountCode="1000", AccountName="Cash", AccountType="CURRENT_ASSET"
+        )
+        self.sales = ChartOfAccount.objects.create(
+            CompanyID=self.company, AccountCode="4000", AccountName="Sales", AccountType="REVENUE"
+        )
+
+    def _post(self, account, when, debit="0.00", credit="0.00"):
+        return GeneralLedger.objects.create(
+            CompanyID=self.company,
+            AccountID=account,
+            TransactionDate=when,
+            DebitAmount=Decimal(debit),
+            CreditAmount=Decimal(credit),
+        )
+
+    def _snapshot(self, account, day):
+        row = AccountBalanceSnapshot.objects.get(AccountID=account, SnapshotDate=day)
+        return row.CumulativeDebit, row.CumulativeCredit
+
+    def test_backdated_entry_updates_later_snapshots(self):
+        """An entry posted on an earlier day rolls forward into every later snapshot."""
+        self._post(self.cash, _at(2024, 1, 10), debit="100.00")
+        self._post(self.cash, _at(2024, 1, 20), debit="50.00")
+        self._post(self.cash, _at(2024, 1, 15), credit="30.00")
+
+        self.assertEqual(self._snapshot(self.cash, date(2024, 1, 10)), (Decimal("100.00"), Decimal("0.00")))
+        self.assertEqual(self._snapshot(self.cash, date(2024, 1, 15)), (Decimal("100.00"), Decimal("30.00")))
+        self.assertEqual(self._snapshot(self.cash, date(2024, 1, 20)), (Decimal("150.00"), Decimal("30.00")))
+        self.assertEqual(verify_snapshots([self.company.CompanyID]), [])
+
+    def test_update_and_delete_reverse_old_contribution(self):
+        """Moving an entry to another account or day, or deleting it, keeps snapshots exact."""
+        entry = self._post(self.cash, _at(2024, 3, 1), debit="80.00")
+        entry.AccountID = self.sales
+        entry.TransactionDate = _at(2024, 3, 2)
+        entry.DebitAmount = Decimal("90.00")
+        entry.save()
+
+        self.assertEqual(self._snapshot(self.cash, date(2024, 3, 1)), (Decimal("0.00"), Decimal("0.00")))
+        self.assertEqual(self._snapshot(self.sales, date(2024, 3, 2)), (Decimal("90.00"), Decimal("0.00")))
+
+        entry.delete()
+        self.assertEqual(self._snapshot(self.sales, date(2024, 3, 2)), (Decimal("0.00"), Decimal("0.00")))
+        self.assertEqual(verify_snapshots([self.company.CompanyID]), [])
+
+    def test_as_of_balances_match_full_ledger_scan(self):
+        """Snapshot-backed balances equal the plain ledger aggregation, including the cutoff-day tail."""
+        self._post(self.cash, _at(2024, 1, 5), debit="1000.00")
+        self._post(self.sales, _at(2024, 1, 5), credit="1000.00")
+        self._post(self.cash, _at(2024, 2, 1, hour=0), debit="7.00")
+        self._post(self.cash, _at(2024, 2, 1, hour=18), credit="250.00")
+
+        for end_date in (date(2024, 2, 1), _at(2024, 2, 1, hour=9), _at(2024, 3, 1), None):
+            with override_settings(LEDGER_SNAPSHOTS_ENABLED=False):
+                expected = engine.account_balances(self.company, end_date=end_date)
+                expected_types = engine.account_type_balances(self.company, end_date=end_date)
+            self.assertEqual(engine.account_balances(self.company, end_date=end_date), expected)
+            self.assertEqual(engine.account_type_balances(self.company, end_date=end_date), expected_types)
+
+    def test_rebuild_command_repairs_bulk_loaded_rows(self):
+        """bulk_create bypasses the signals; the rebuild command restores the snapshots."""
+        GeneralLedger.objects.bulk_create([
+            GeneralLedger(CompanyID=self.company, AccountID=self.cash, TransactionDate=_at(2024, 5, 1),
+                          DebitAmount=Decimal("40.00"), CreditAmount=Decimal("0.00")),
+        ])
+        with self.assertRaises(CommandError):
+            call_command('rebuild_balance_snapshots', '--verify-only', stdout=StringIO())
+
+        out = StringIO()
+        call_command('rebuild_balance_snapshots', '--company', str(self.company.CompanyID), stdout=out)
+        self.assertIn("Snapshots match the general ledger", out.getvalue())
+        self.assertEqual(self._snapshot(self.cash, date(2024, 5, 1)), (Decimal("40.00"), Decimal("0.00")))
+
+
+class GeneralLedgerKeysetPaginationTests(TestCase):
+    """Keyset pages walk the ledger on (TransactionDate, TransactionID) without OFFSET."""
+
+    def setUp(self):  # noqa: D401
+        """Create seven entries, several sharing a timestamp."""
+        self.user = User.objects.create_user(username="owner", password="pass1234")
+        self.company = Company.objects.create(CompanyName="Acme LLC")
+        UserCompanyRole.objects.create(UserID=self.user, CompanyID=self.company, Role="owner")
+        cash = ChartOfAccount.objects.create(
+            CompanyID=self.company, AccountCode="1000", AccountName="Cash", AccountType="CURRENT_ASSET"
+        )
+        for day in (1, 2, 2, 2, 3, 3, 4):
+            GeneralLedger.objects.create(
+                CompanyID=self.company, AccountID=cash, TransactionDate=_at(2024, 1, day),
+                DebitAmount=Decimal("1.00"), CreditAmount=Decimal("0.00"),
+            )
+        self.expected = list(
+            GeneralLedger.objects.order_by("-TransactionDate", "-TransactionID").values_list("TransactionID", flat=True)
+        )
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+
+    def test_cursor_walks_forward_and_back_without_gaps(self):
+        """Following next then previous links visits every entry once, in order."""
+        response = self.api_client.get(reverse("generalledger-list"), {"cursor": "", "page_size": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 7)
+        self.assertIsNone(response.data["previous"])
+
+        seen, pages = [], []
+        while True:
+            pages.append(response.data)
+            seen.extend(row["id"] for row in response.data["results"])
+            if not response.data["next"]:
+                break
+            response = self.api_client.get(response.data["next"])
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(pages), 3)
+
+        response = self.api_client.get(pages[-1]["previous"])
+        self.assertEqual([row["id"] for row in response.data["results"]], self.expected[3:6])
+        self.assertIsNotNone(response.data["previous"])
+
+    def test_count_opt_out_and_default_modes(self):
+        """?count=false skips the COUNT(*); without a cursor the old response shapes are kept."""
+        response = self.api_client.get(
+            reverse("generalledger-list"), {"pagination": "keyset", "page_size": 5, "count": "false"}
+        )
+        self.assertNotIn("count", response.data)
+        self.assertEqual(len(response.data["results"]), 5)
+
+        self.assertEqual(len(self.api_client.get(reverse("generalledger-list")).data), 7)
+        report = self.api_client.get(reverse("general-ledger")).data
+        self.assertEqual((report["count"], len(report["results"])), (7, 7))
+
+        response = self.api_client.get(reverse("generalledger-list"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
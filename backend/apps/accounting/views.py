@@ -1,6 +1,7 @@
 from rest_framework import viewsets
 from .models import ChartOfAccount, GeneralLedger
 from .serializers import ChartOfAccountSerializer, GeneralLedgerSerializer
+from lifeline_backend.pagination import GeneralLedgerKeysetPagination
 
 class ChartOfAccountViewSet(viewsets.ModelViewSet):
     queryset = ChartOfAccount.objects.all()
@@ -16,13 +17,15 @@ class ChartOfAccountViewSet(viewsets.ModelViewSet):
 class GeneralLedgerViewSet(viewsets.ModelViewSet):
     queryset = GeneralLedger.objects.all()
     serializer_class = GeneralLedgerSerializer
+    # Unpaginated unless ?cursor= / ?pagination=keyset is passed
+    pagination_class = GeneralLedgerKeysetPagination
 
     def get_queryset(self):
         """
         Filter transactions by user's companies
         """
         user = self.request.user
-        return GeneralLedger.objects.filter(CompanyID__usercompanyrole__UserID=user)
+        return GeneralLedger.objects.filter(CompanyID__usercompanyrole__UserID=user).select_related('AccountID')
 
     def perform_create(self, serializer):
         """
@@ -1,7 +1,30 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
 from django.conf import settings
 
-class JWTCookieAuthentication(JWTAuthentication):
+from .token_cache import token_cache_settings, token_user_cache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that remembers the user of each access token by ``jti``
+    (``apps.accounts.token_cache``), so repeated requests need no user query.
+    """
+
+    def get_user(self, validated_token):
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        if not jti or not token_cache_settings()['ENABLED']:
+            return super().get_user(validated_token)
+
+        user = token_user_cache.get(jti)
+        if user is None:
+            # Loads and checks the user (active, password unchanged) as before
+            user = super().get_user(validated_token)
+            token_user_cache.set(jti, user, validated_token['exp'])
+        return user
+
+
+class JWTCookieAuthentication(CachedJWTAuthentication):
     def authenticate(self, request):
         try:
             raw_token = request.COOKIES.get(settings.SIMPLE_JWT['ACCESS_TOKEN_COOKIE']) or None
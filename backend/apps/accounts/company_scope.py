@@ -0,0 +1,147 @@
+"""
+Request-scoped resolution of the companies a user may act for.
+
+The company-scoped viewsets used to re-run
+``Company.objects.filter(usercompanyrole__UserID=user)`` with ``exists()``,
+``get()`` and ``first()`` every time they needed the active company - several
+times per API call. ``get_company_scope(request)`` resolves the user's
+company ids once per request (and caches them per user in the company-scope cache tier),
+so list endpoints need no permission queries at all on a warm cache.
+
+The cached ids are invalidated by the UserCompanyRole signal handlers in
+``apps.accounts.signals``.
+"""
+from django.conf import settings
+from lifeline_backend.cache import COMPANY_SCOPE, tier
+from rest_framework.exceptions import PermissionDenied
+
+from .models import Company, UserCompanyRole
+
+CACHE_KEY = 'company-scope:{user_id}'
+
+
+def _cache_timeout():
+    return getattr(settings, 'COMPANY_SCOPE_CACHE_TIMEOUT', 300)
+
+
+def cache_key(user_id):
+    return CACHE_KEY.format(user_id=user_id)
+
+
+def invalidate_company_scope(*user_ids):
+    """Drop the cached company ids of the given users."""
+    tier(COMPANY_SCOPE).delete_many([cache_key(user_id) for user_id in user_ids if user_id is not None])
+
+
+def allowed_company_ids(user):
+    """Return the sorted ids of the companies ``user`` has a role in (cached)."""
+    if not user or not user.is_authenticated:
+        return []
+    key = cache_key(user.pk)
+    cache = tier(COMPANY_SCOPE)
+    company_ids = cache.get(key)
+    if company_ids is None:
+        company_ids = sorted(
+            UserCompanyRole.objects.filter(UserID=user).values_list('CompanyID', flat=True)
+        )
+        cache.set(key, company_ids, _cache_timeout())
+    return company_ids
+
+
+class CompanyScope:
+    """
+    The companies a request's user may access and the one it is acting for.
+
+    The active company is taken from the ``X-Company-ID`` header, a
+    ``CompanyID`` query parameter or a ``CompanyID`` body field, falling back
+    to the user's first company. Asking for a company the user has no role in
+    raises PermissionDenied.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.user = request.user
+        self._allowed = None
+        self._active_company = None
+
+    @property
+    def allowed_company_ids(self):
+        if self._allowed is None:
+            self._allowed = allowed_company_ids(self.user)
+        return self._allowed
+
+    def has_access(self, company_id):
+        try:
+            return int(company_id) in self.allowed_company_ids
+        except (TypeError, ValueError):
+            return False
+
+    def requested_company_id(self):
+        query_params = getattr(self.request, 'query_params', {})
+        request_data = getattr(self.request, 'data', {})
+        if not hasattr(request_data, 'get'):
+            request_data = {}
+        return (
+            self.request.headers.get('X-Company-ID')
+            or query_params.get('CompanyID')
+            or request_data.get('CompanyID')
+        )
+
+    @property
+    def active_company_id(self):
+        """The id of the company this request acts for, or None if the user has none."""
+        if not self.allowed_company_ids:
+            return None
+        requested = self.requested_company_id()
+        if requested:
+            if not self.has_access(requested):
+                raise PermissionDenied("You do not have access to this company.")
+            return int(requested)
+        return self.allowed_company_ids[0]
+
+    @property
+    def active_company(self):
+        """The active Company instance, loaded on first use (one query)."""
+        company_id = self.active_company_id
+        if company_id is None:
+            return None
+        if self._active_company is None or self._active_company.pk != company_id:
+            self._active_company = Company.objects.get(pk=company_id)
+        return self._active_company
+
+
+def get_company_scope(request):
+    """
+    Return the CompanyScope for ``request``, computed once per request.
+
+    Accepts a DRF Request or a plain HttpRequest; the scope is memoized on the
+    underlying HttpRequest so views, permissions and serializers share it.
+    """
+    http_request = getattr(request, '_request', request)
+    scope = getattr(http_request, '_company_scope', None)
+    user_id = getattr(request.user, 'pk', None)
+    if scope is None or getattr(scope.user, 'pk', None) != user_id:
+        scope = CompanyScope(request)
+        http_request._company_scope = scope
+    elif hasattr(request, 'query_params'):
+        # Prefer the DRF request once a view has one (parsed query params and body)
+        scope.request = request
+    return scope
+
+
+class CompanyScopedMixin:
+    """
+    Viewset helpers backed by the request's CompanyScope.
+
+    Provides ``_get_active_company()`` (the Company instance, loaded only when
+    needed) and ``_active_company_id()`` for filtering querysets by id.
+    """
+
+    def _company_scope(self):
+        return get_company_scope(self.request)
+
+    def _active_company_id(self):
+        return self._company_scope().active_company_id
+
+    def _get_active_company(self):
+        return self._company_scope().active_company
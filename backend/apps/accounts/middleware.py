@@ -1,16 +1,35 @@
+from django.conf import settings
 from django.contrib.auth import logout
 from django.http import JsonResponse
-from django.utils import timezone
-from datetime import timedelta
 import time
 
+
 class SessionSecurityMiddleware:
     """
     Middleware to enforce session security and automatic logout after inactivity
+
+    ``last_activity`` is only rewritten once it is more than
+    ``SESSION_SECURITY_ACTIVITY_INTERVAL`` seconds old, so a burst of API calls
+    leaves the session unmodified (and, with SESSION_SAVE_EVERY_REQUEST off,
+    unsaved) instead of writing it on every request. The idle timeout is
+    therefore measured from an activity time up to that interval old, i.e. it
+    can end a session at most one interval early, never late.
     """
     def __init__(self, get_response):
         self.get_response = get_response
 
+    @property
+    def idle_timeout(self):
+        return getattr(settings, 'SESSION_SECURITY_WARN_AFTER', 1800)
+
+    @property
+    def absolute_timeout(self):
+        return getattr(settings, 'SESSION_SECURITY_EXPIRE_AFTER', 3600)
+
+    @property
+    def activity_interval(self):
+        return getattr(settings, 'SESSION_SECURITY_ACTIVITY_INTERVAL', 60)
+
     def __call__(self, request):
         # Process the request
         response = self.get_response(request)
@@ -41,8 +60,8 @@ class SessionSecurityMiddleware:
             last_activity = request.session.get('last_activity', current_time)
             time_since_activity = current_time - last_activity
             
-            # Check for inactivity timeout (30 minutes = 1800 seconds)
-            if time_since_activity > 1800:
+            # Check for inactivity timeout (30 minutes)
+            if time_since_activity > self.idle_timeout:
                 logout(request)
                 # Clear all session data
                 request.session.flush()
@@ -50,18 +69,20 @@ class SessionSecurityMiddleware:
                     return JsonResponse({'error': 'Session expired due to inactivity'}, status=401)
                 return response
             
-            # Check for absolute session timeout (1 hour = 3600 seconds)
+            # Check for absolute session timeout (1 hour)
             session_start = request.session.get('session_start', current_time)
             total_session_time = current_time - session_start
-            if total_session_time > 3600:
+            if total_session_time > self.absolute_timeout:
                 logout(request)
                 request.session.flush()
                 if request.path.startswith('/api/'):
                     return JsonResponse({'error': 'Session expired - maximum time reached'}, status=401)
                 return response
             
-            # Update last activity time and user ID
-            request.session['last_activity'] = current_time
-            request.session['user_id'] = request.user.id  # Ensure user_id is always current
+            # Update last activity time once it is stale; assigning marks the session for saving
+            if time_since_activity >= self.activity_interval:
+                request.session['last_activity'] = current_time
+            if session_user_id != request.user.id:
+                request.session['user_id'] = request.user.id
         
-        return response
\ No newline at end of file
+        return response
@@ -0,0 +1,47 @@
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .company_scope import invalidate_company_scope
+from .models import Company, User, UserCompanyRole
+from .token_cache import invalidate_user_tokens
+
+
+@receiver(post_save, sender=UserCompanyRole)
+@receiver(post_delete, sender=UserCompanyRole)
+def invalidate_scope_on_role_change(sender, instance, **kwargs):
+    """
+    A user's company membership changed; drop their cached company ids.
+    """
+    invalidate_company_scope(instance.UserID_id)
+
+
+@receiver(m2m_changed, sender=Company.users.through)
+def invalidate_scope_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    ``company.users.add()/remove()/clear()`` bypass the model signals above.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if isinstance(instance, User):
+        invalidate_company_scope(instance.pk)
+    elif action == 'pre_clear':
+        invalidate_company_scope(*instance.users.values_list('pk', flat=True))
+    else:
+        invalidate_company_scope(*(pk_set or ()))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_tokens_on_user_change(sender, instance, **kwargs):
+    """
+    Password changes, deactivation and any other edit must not be served
+    from the token user cache.
+    """
+    invalidate_user_tokens(instance.pk)
+
+
+@receiver(user_logged_out)
+def invalidate_tokens_on_logout(sender, request, user, **kwargs):
+    if user is not None:
+        invalidate_user_tokens(user.pk)
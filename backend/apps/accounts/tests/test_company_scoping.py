@@ -2,7 +2,9 @@ from datetime import date
 from decimal import Decimal
 from typing import Any, Callable, cast
 
+from django.db import connection
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.response import Response
@@ -10,6 +12,7 @@ from rest_framework.test import APIClient, APITestCase
 
 from apps.accounts.models import Company, User, UserCompanyRole
 from apps.customers.models import Customer
+from lifeline_backend.cache import clear_all
 from apps.invoices.models import Invoice
 from apps.vendors.models import Vendor
 
@@ -28,6 +31,7 @@ class CompanyScopedEndpointTests(APITestCase):
 
     def setUp(self):  # noqa: D401
         """Create a user with a single company membership and sample data."""
+        clear_all()
         self.user = User.objects.create_user(
             username="owner",
             password="pass1234",
@@ -134,7 +138,7 @@ class CompanyScopedEndpointTests(APITestCase):
 
     def test_invoice_list_is_scoped_to_authenticated_company(self):
         """Invoices should only include data for the authenticated company."""
-        response = self._request("get", "invoice-list", self.company)
+        response = self._request("get", "invoices-list", self.company)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         payload = response.json()
         invoice_ids = {invoice["InvoiceID"] for invoice in payload}
@@ -143,5 +147,32 @@ class CompanyScopedEndpointTests(APITestCase):
 
     def test_invoice_list_rejects_unowned_company(self):
         """An unauthorized company context should be denied for invoices."""
-        response = self._request("get", "invoice-list", self.other_company)
+        response = self._request("get", "invoices-list", self.other_company)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_company_scope_is_cached_across_requests(self):
+        """A warm company scope answers list requests without membership queries."""
+        self._request("get", "customer-list", self.company)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._request("get", "customer-list", self.company)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        scope_queries = [
+            q for q in ctx.captured_queries
+            if '"UserCompanyRole"' in q["sql"] or 'FROM "Companies"' in q["sql"]
+        ]
+        self.assertEqual(scope_queries, [])
+
+    def test_company_scope_invalidated_on_role_change(self):
+        """Granting or revoking a role takes effect on the next request."""
+        self.assertEqual(
+            self._request("get", "customer-list", self.other_company).status_code, status.HTTP_403_FORBIDDEN
+        )
+        role = UserCompanyRole.objects.create(UserID=self.user, CompanyID=self.other_company, Role="viewer")
+        response = self._request("get", "customer-list", self.other_company)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({c["CustomerID"] for c in response.json()}, {self.other_customer.CustomerID})
+
+        role.delete()
+        self.assertEqual(
+            self._request("get", "customer-list", self.other_company).status_code, status.HTTP_403_FORBIDDEN
+        )
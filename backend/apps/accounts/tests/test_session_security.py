@@ -0,0 +1,56 @@
+import time
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from apps.accounts.models import User
+from lifeline_backend.cache import clear_all
+
+
+@override_settings(SESSION_SAVE_EVERY_REQUEST=False, SESSION_SECURITY_ACTIVITY_INTERVAL=60)
+class SessionSecurityMiddlewareTests(TestCase):
+    """Activity tracking without a session write per request, and the idle/absolute timeouts."""
+
+    def setUp(self):  # noqa: D401
+        """A logged-in user whose session has been stamped by a first request."""
+        clear_all()
+        self.user = User.objects.create_user(username="clerk", password="pass1234")
+        self.client.force_login(self.user)
+        self.client.get('/api/health/')
+
+    def session_queries(self):
+        """Run one request and return the SQL it sent to django_session."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/health/')
+        return [query['sql'] for query in queries if 'django_session' in query['sql']]
+
+    def shift_session(self, **seconds_ago):
+        session = self.client.session
+        for key, ago in seconds_ago.items():
+            session[key] = time.time() - ago
+        session.save()
+
+    def test_fresh_activity_is_not_rewritten(self):
+        """Requests inside the interval neither modify nor save the session"""
+        stamped = self.client.session['last_activity']
+        for _ in range(3):
+            self.assertEqual(self.session_queries(), [])
+        self.assertEqual(self.client.session['last_activity'], stamped)
+
+    def test_stale_activity_is_refreshed_with_one_write(self):
+        self.shift_session(last_activity=61)
+        writes = [sql for sql in self.session_queries() if sql.startswith(('UPDATE', 'INSERT'))]
+        self.assertEqual(len(writes), 1)
+        self.assertAlmostEqual(self.client.session['last_activity'], time.time(), delta=5)
+
+    def test_idle_and_absolute_timeouts_still_end_the_session(self):
+        self.shift_session(last_activity=1801)
+        self.client.get('/api/health/')
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+        self.client.force_login(self.user)
+        self.client.get('/api/health/')
+        self.shift_session(session_start=3601, last_activity=10)
+        self.client.get('/api/health/')
+        self.assertNotIn('_auth_user_id', self.client.session)
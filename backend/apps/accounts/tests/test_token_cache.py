@@ -0,0 +1,64 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.accounts.models import User
+from apps.accounts.token_cache import TokenUserCache, token_user_cache
+from lifeline_backend.cache import clear_all
+
+
+class TokenUserCacheTests(TestCase):
+    """Users behind access tokens are loaded once per token until something invalidates them."""
+
+    def setUp(self):  # noqa: D401
+        """A user authenticating with a bearer access token."""
+        clear_all()
+        token_user_cache.clear()
+        self.user = User.objects.create_user(username="clerk", password="pass1234")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.url = reverse('current_user')
+
+    def user_queries(self):
+        """Make one request; return its status and the SELECTs it sent to the users table."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        selects = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and 'FROM "Users"' in q['sql']]
+        return response.status_code, len(selects)
+
+    def test_repeated_requests_do_not_query_the_user(self):
+        self.assertEqual(self.user_queries(), (200, 1))
+        self.assertEqual(self.user_queries(), (200, 0))
+        self.assertEqual(self.user_queries(), (200, 0))
+
+    def test_deactivation_and_password_change_invalidate(self):
+        """Saving the user drops its cached tokens; an inactive user is refused again"""
+        self.user_queries()
+        self.user.set_password("changed5678")
+        self.user.save()
+        self.assertEqual(self.user_queries(), (200, 1))
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.user_queries()[0], 401)
+
+    def test_logout_invalidates(self):
+        self.user_queries()
+        self.client.post(reverse('logout'))
+        self.assertEqual(self.user_queries(), (200, 1))
+
+    def test_least_recently_used_tokens_are_evicted(self):
+        cache = TokenUserCache(max_entries=2, clock=lambda: 1000.0)
+        for jti in ('a', 'b'):
+            cache.set(jti, self.user, 2000)
+        cache.get('a')
+        cache.set('c', self.user, 2000)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a').pk, self.user.pk)
+
+        cache.clock = lambda: 2000.0
+        self.assertIsNone(cache.get('c'))  # the token has expired
@@ -0,0 +1,110 @@
+"""
+Per-process cache of the users behind verified access tokens.
+
+The SPA fires 10-20 API calls per screen with the same access token, and
+each used to cost a ``User`` SELECT in ``JWTAuthentication.get_user``.
+``TokenUserCache`` keeps the user of each token, keyed by its ``jti``, in a
+bounded LRU until the token expires (or ``TIMEOUT`` passes), so repeated
+requests authenticate without touching the database. The token itself is
+still decoded and verified on every request.
+
+Entries are invalidated through a per-user version stamp in the ``auth``
+cache tier, shared by every worker: logout, saving the user (password
+change, deactivation) or deleting it writes a new stamp, and an entry whose
+stamp no longer matches is dropped and reloaded. Checking the stamp is one
+cache read per request. ``QuerySet.update()`` sends no signals; call
+``invalidate_user_tokens`` after bulk updates of users.
+
+Configured by ``settings.TOKEN_USER_CACHE``; see ``DEFAULTS``.
+"""
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from lifeline_backend.cache import AUTH, tier
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 10000,   # tokens kept per process; least recently used go first
+    'TIMEOUT': 300,         # upper bound on an entry's life, whatever the token's expiry
+}
+
+VERSION_KEY = 'auth-version:{user_id}'
+
+
+def token_cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_USER_CACHE', {})}
+
+
+def user_version(user_id):
+    return tier(AUTH).get(VERSION_KEY.format(user_id=user_id))
+
+
+def invalidate_user_tokens(*user_ids):
+    """Make every cached token of the given users miss, in all processes."""
+    timeout = token_cache_settings()['TIMEOUT']
+    tier(AUTH).set_many(
+        {VERSION_KEY.format(user_id=user_id): uuid.uuid4().hex for user_id in user_ids if user_id is not None},
+        timeout,
+    )
+    for user_id in user_ids:
+        token_user_cache.discard_user(user_id)
+
+
+class TokenUserCache:
+    """A thread-safe LRU of ``jti -> (user, version, expires_at)``."""
+
+    def __init__(self, max_entries=None, clock=time.time):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, jti):
+        """The cached user for ``jti`` (a copy, safe to mutate), or None."""
+        with self._lock:
+            entry = self._entries.get(jti)
+            if entry is None:
+                return None
+            user, version, expires_at = entry
+            if expires_at <= self.clock():
+                del self._entries[jti]
+                return None
+            self._entries.move_to_end(jti)
+        if version != user_version(user.pk):
+            self.discard(jti)
+            return None
+        return copy.copy(user)
+
+    def set(self, jti, user, token_expires_at):
+        """Cache ``user`` for ``jti`` until the token expires, at most ``TIMEOUT`` seconds."""
+        config = token_cache_settings()
+        entry = (copy.copy(user), user_version(user.pk), min(token_expires_at, self.clock() + config['TIMEOUT']))
+        max_entries = self.max_entries or config['MAX_ENTRIES']
+        with self._lock:
+            self._entries[jti] = entry
+            self._entries.move_to_end(jti)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, jti):
+        with self._lock:
+            self._entries.pop(jti, None)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            for jti in [jti for jti, (user, _, _) in self._entries.items() if user.pk == user_id]:
+                del self._entries[jti]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_user_cache = TokenUserCache()
@@ -1,5 +1,7 @@
 from rest_framework import viewsets, permissions
 from .models import User, Company, UserCompanyRole
+from .company_scope import allowed_company_ids
+from .token_cache import invalidate_user_tokens
 from .serializers import UserSerializer, CompanySerializer, UserCompanyRoleSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -10,10 +12,9 @@ from rest_framework import status
 from django.middleware.csrf import get_token
 from django.conf import settings
 from rest_framework.decorators import api_view, permission_classes
-from django.db.models import Sum, Count, Q
+from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import timedelta
-from decimal import Decimal
 import logging
 
 # Security logger for authentication events
@@ -32,7 +33,7 @@ def current_user(request):
         user_data = UserSerializer(user, context={'request': request}).data
 
         # Get their company roles
-        user_company_roles = UserCompanyRole.objects.filter(UserID=user)
+        user_company_roles = UserCompanyRole.objects.filter(UserID=user).select_related('CompanyID')
         roles_data = UserCompanyRoleSerializer(user_company_roles, many=True).data
 
         # Combine the data
@@ -54,7 +55,7 @@ def current_user(request):
             print(f"User updated successfully. Profile photo: {updated_user.profile_photo}")
             
             # Return updated user data with company roles
-            user_company_roles = UserCompanyRole.objects.filter(UserID=user)
+            user_company_roles = UserCompanyRole.objects.filter(UserID=user).select_related('CompanyID')
             roles_data = UserCompanyRoleSerializer(user_company_roles, many=True).data
             
             response_data = {
@@ -93,7 +94,7 @@ class UserCompanyRoleViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return UserCompanyRole.objects.filter(UserID=self.request.user)
+        return UserCompanyRole.objects.filter(UserID=self.request.user).select_related('CompanyID')
 
     def perform_create(self, serializer):
         serializer.save(UserID=self.request.user.id)
@@ -208,6 +209,10 @@ class LogoutView(APIView):
             f"LOGOUT_REQUEST - Username: {username} | "
             f"IP: {client_ip}"
         )
+
+        # Stop serving this user's tokens from the token user cache
+        if hasattr(request, 'user') and request.user.is_authenticated:
+            invalidate_user_tokens(request.user.pk)
         
         response = Response({'detail': 'Successfully logged out'}, status=status.HTTP_200_OK)
         
@@ -226,89 +231,43 @@ def csrf_token(request):
     from django.http import JsonResponse
     return JsonResponse({'csrfToken': get_token(request)})
 
+def _sum_account_types(type_balances, keyword):
+    from apps.dashboard.services import sum_account_types
+
+    return sum_account_types(type_balances, keyword)
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def dashboard_metrics(request):
     """
     Get dashboard financial metrics for the current user's companies
     """
-    user = request.user
-    companies = Company.objects.filter(usercompanyrole__UserID=user)
-    
     # Import here to avoid circular imports
-    from apps.accounting.models import GeneralLedger, ChartOfAccount
-    
-    # Calculate date ranges using timezone-aware datetimes
-    now = timezone.localtime()
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    current_month_start = today_start.replace(day=1)
-    last_month_start = (current_month_start - timedelta(days=1)).replace(day=1)
-    current_year_start = today_start.replace(month=1, day=1)
-    
-    # Get revenue accounts (income/revenue type accounts)
-    revenue_accounts = ChartOfAccount.objects.filter(
-        CompanyID__in=companies,
-        AccountType__icontains='revenue'
-    )
-    
-    # Get expense accounts
-    expense_accounts = ChartOfAccount.objects.filter(
-        CompanyID__in=companies,
-        AccountType__icontains='expense'
-    )
-    
-    # Calculate current month revenue
-    current_month_revenue = GeneralLedger.objects.filter(
-        CompanyID__in=companies,
-        AccountID__in=revenue_accounts,
-        TransactionDate__gte=current_month_start,
-        TransactionDate__lt=today_start
-    ).aggregate(
-        total=Sum('CreditAmount') - Sum('DebitAmount')
-    )['total'] or Decimal('0.00')
-    
-    # Calculate last month revenue for comparison
-    last_month_revenue = GeneralLedger.objects.filter(
-        CompanyID__in=companies,
-        AccountID__in=revenue_accounts,
-        TransactionDate__gte=last_month_start,
-        TransactionDate__lt=current_month_start
-    ).aggregate(
-        total=Sum('CreditAmount') - Sum('DebitAmount')
-    )['total'] or Decimal('0.00')
-    
-    # Calculate current month expenses
-    current_month_expenses = GeneralLedger.objects.filter(
-        CompanyID__in=companies,
-        AccountID__in=expense_accounts,
-        TransactionDate__gte=current_month_start,
-        TransactionDate__lt=today_start
-    ).aggregate(
-        total=Sum('DebitAmount') - Sum('CreditAmount')
-    )['total'] or Decimal('0.00')
-    
-    # Calculate last month expenses for comparison
-    last_month_expenses = GeneralLedger.objects.filter(
-        CompanyID__in=companies,
-        AccountID__in=expense_accounts,
-        TransactionDate__gte=last_month_start,
-        TransactionDate__lt=current_month_start
-    ).aggregate(
-        total=Sum('DebitAmount') - Sum('CreditAmount')
-    )['total'] or Decimal('0.00')
+    from apps.dashboard.services import dashboard_figures
+    
+    # Cached per company; recomputed with two grouped queries after ledger changes
+    windows = dashboard_figures(allowed_company_ids(request.user))['windows']
+    current_month = windows['current_month']
+    last_month = windows['last_month']
+    year_to_date = windows['year_to_date']
+    
+    # Revenue (credit-normal) and expenses (debit-normal) by matching account type
+    current_month_revenue = _sum_account_types(current_month, 'revenue')
+    current_month_revenue = current_month_revenue.credit - current_month_revenue.debit
+    last_month_revenue = _sum_account_types(last_month, 'revenue')
+    last_month_revenue = last_month_revenue.credit - last_month_revenue.debit
+    current_month_expenses = _sum_account_types(current_month, 'expense')
+    current_month_expenses = current_month_expenses.debit - current_month_expenses.credit
+    last_month_expenses = _sum_account_types(last_month, 'expense')
+    last_month_expenses = last_month_expenses.debit - last_month_expenses.credit
     
     # Calculate profit
     current_month_profit = current_month_revenue - current_month_expenses
     last_month_profit = last_month_revenue - last_month_expenses
     
     # Calculate year-to-date cash flow (simplified)
-    ytd_cash_flow = GeneralLedger.objects.filter(
-        CompanyID__in=companies,
-        TransactionDate__gte=current_year_start,
-        TransactionDate__lt=today_start
-    ).aggregate(
-        total=Sum('DebitAmount') - Sum('CreditAmount')
-    )['total'] or Decimal('0.00')
+    ytd_totals = _sum_account_types(year_to_date, '')
+    ytd_cash_flow = ytd_totals.debit - ytd_totals.credit
     
     # Calculate percentage changes
     def calculate_change(current, previous):
@@ -349,16 +308,18 @@ def dashboard_activity(request):
     """
     Get recent activity for dashboard
     """
-    user = request.user
-    companies = Company.objects.filter(usercompanyrole__UserID=user)
+    # Company ids from the cached company scope: no permission join per query
+    company_ids = allowed_company_ids(request.user)
     
     # Import here to avoid circular imports
     from apps.accounting.models import GeneralLedger
     
-    # Get recent transactions (last 10)
+    # Get recent transactions (last 10), with the account name in the same query
     recent_transactions = GeneralLedger.objects.filter(
-        CompanyID__in=companies
-    ).select_related('AccountID').order_by('-CreatedDate')[:10]
+        CompanyID__in=company_ids
+    ).select_related('AccountID').only(
+        'TransactionID', 'Description', 'DebitAmount', 'CreditAmount', 'CreatedDate', 'AccountID__AccountName'
+    ).order_by('-CreatedDate')[:10]
     
     activities = []
     for transaction in recent_transactions:
@@ -383,8 +344,7 @@ def dashboard_pending(request):
     """
     Get pending items for dashboard
     """
-    user = request.user
-    companies = Company.objects.filter(usercompanyrole__UserID=user)
+    company_ids = allowed_company_ids(request.user)
     
     # Import here to avoid circular imports
     from apps.invoices.models import Invoice
@@ -393,7 +353,9 @@ def dashboard_pending(request):
     pending_items = []
     
     # Get pending invoices (this is simplified - you'd need status fields)
-    invoices = Invoice.objects.filter(CompanyID__in=companies)[:5]
+    invoices = Invoice.objects.filter(CompanyID__in=company_ids).select_related('CustomerID').only(
+        'InvoiceID', 'InvoiceNumber', 'CustomerID__Name'
+    )[:5]
     for invoice in invoices:
         pending_items.append({
             'id': f'invoice-{invoice.InvoiceID}',
@@ -404,7 +366,9 @@ def dashboard_pending(request):
         })
     
     # Get pending bills
-    bills = Bill.objects.filter(CompanyID__in=companies)[:5]
+    bills = Bill.objects.filter(CompanyID__in=company_ids).select_related('VendorID').only(
+        'BillID', 'BillNumber', 'VendorID__Name'
+    )[:5]
     for bill in bills:
         pending_items.append({
             'id': f'bill-{bill.BillID}',
@@ -422,57 +386,23 @@ def dashboard_financial_health(request):
     """
     Calculate financial health score and metrics
     """
-    user = request.user
-    companies = Company.objects.filter(usercompanyrole__UserID=user)
-    
     # Import here to avoid circular imports
-    from apps.accounting.models import GeneralLedger, ChartOfAccount
-    
-    # Calculate various financial health indicators
-    now = timezone.localtime()
-    current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    current_year_start = current_month_start.replace(month=1, day=1)
-    
-    # Get account types
-    revenue_accounts = ChartOfAccount.objects.filter(
-        CompanyID__in=companies,
-        AccountType__icontains='revenue'
-    )
-    expense_accounts = ChartOfAccount.objects.filter(
-        CompanyID__in=companies,
-        AccountType__icontains='expense'
-    )
-    asset_accounts = ChartOfAccount.objects.filter(
-        CompanyID__in=companies,
-        AccountType__icontains='asset'
-    )
-    liability_accounts = ChartOfAccount.objects.filter(
-        CompanyID__in=companies,
-        AccountType__icontains='liability'
-    )
+    from apps.dashboard.services import dashboard_figures
+    
+    # Year-to-date activity and all-time balances by account type (cached)
+    windows = dashboard_figures(allowed_company_ids(request.user))['windows']
+    year_to_date = windows['year_to_now']
+    all_time = windows['all_time']
     
     # Calculate metrics
-    total_revenue = GeneralLedger.objects.filter(
-        CompanyID__in=companies,
-        AccountID__in=revenue_accounts,
-        TransactionDate__gte=current_year_start
-    ).aggregate(total=Sum('CreditAmount'))['total'] or Decimal('0.00')
-    
-    total_expenses = GeneralLedger.objects.filter(
-        CompanyID__in=companies,
-        AccountID__in=expense_accounts,
-        TransactionDate__gte=current_year_start
-    ).aggregate(total=Sum('DebitAmount'))['total'] or Decimal('0.00')
-    
-    total_assets = GeneralLedger.objects.filter(
-        CompanyID__in=companies,
-        AccountID__in=asset_accounts
-    ).aggregate(total=Sum('DebitAmount') - Sum('CreditAmount'))['total'] or Decimal('0.00')
-    
-    total_liabilities = GeneralLedger.objects.filter(
-        CompanyID__in=companies,
-        AccountID__in=liability_accounts
-    ).aggregate(total=Sum('CreditAmount') - Sum('DebitAmount'))['total'] or Decimal('0.00')
+    total_revenue = _sum_account_types(year_to_date, 'revenue').credit
+    total_expenses = _sum_account_types(year_to_date, 'expense').debit
+    
+    assets = _sum_account_types(all_time, 'asset')
+    total_assets = assets.debit - assets.credit
+    
+    liabilities = _sum_account_types(all_time, 'liability')
+    total_liabilities = liabilities.credit - liabilities.debit
     
     # Calculate health score (simplified algorithm)
     profit_margin = float((total_revenue - total_expenses) / total_revenue * 100) if total_revenue > 0 else 0
@@ -522,61 +452,29 @@ def dashboard_charts(request):
     """
     Get chart data for dashboard
     """
-    user = request.user
-    companies = Company.objects.filter(usercompanyrole__UserID=user)
-    
     # Import here to avoid circular imports
-    from apps.accounting.models import GeneralLedger, ChartOfAccount
-    
-    # Get last 6 months of revenue data
-    reference_month_start = timezone.localtime().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    revenue_data = []
-    
-    for i in range(6):
-        month_start = (reference_month_start - timedelta(days=i * 30)).replace(day=1)
-        next_month_start = (month_start + timedelta(days=32)).replace(day=1)
-        
-        revenue_accounts = ChartOfAccount.objects.filter(
-            CompanyID__in=companies,
-            AccountType__icontains='revenue'
-        )
-        
-        month_revenue = GeneralLedger.objects.filter(
-            CompanyID__in=companies,
-            AccountID__in=revenue_accounts,
-            TransactionDate__gte=month_start,
-            TransactionDate__lt=next_month_start
-        ).aggregate(
-            total=Sum('CreditAmount') - Sum('DebitAmount')
-        )['total'] or Decimal('0.00')
-        
-        revenue_data.insert(0, {
-            'month': month_start.strftime('%b'),
-            'value': float(month_revenue)
-        })
-    
-    # Get expense breakdown by account type
-    expense_accounts = ChartOfAccount.objects.filter(
-        CompanyID__in=companies,
-        AccountType__icontains='expense'
-    )
-    
-    expense_breakdown = []
-    for account in expense_accounts[:5]:  # Top 5 expense accounts
-        total = GeneralLedger.objects.filter(
-            CompanyID__in=companies,
-            AccountID=account,
-            TransactionDate__gte=reference_month_start
-        ).aggregate(
-            total=Sum('DebitAmount') - Sum('CreditAmount')
-        )['total'] or Decimal('0.00')
-
-        if total > 0:
-            expense_breakdown.append({
-                'label': account.AccountName,
-                'value': float(total),
-                'color': f'#{"".join([f"{hash(account.AccountName) % 16:x}" for _ in range(6)])}'[:7]
-            })
+    from apps.dashboard.services import dashboard_figures
+    
+    figures = dashboard_figures(allowed_company_ids(request.user))
+    
+    # Last 6 calendar months of net revenue, oldest first
+    revenue_data = [
+        {'month': month_start.strftime('%b'), 'value': float(month_revenue)}
+        for month_start, month_revenue in zip(figures['trend_months'], figures['revenue_trend'])
+    ]
+    
+    # Top 5 expense accounts this month
+    top_expenses = sorted(
+        (item for item in figures['expense_accounts'] if item[1] > 0), key=lambda item: item[1], reverse=True
+    )[:5]
+    expense_breakdown = [
+        {
+            'label': account_name,
+            'value': float(total),
+            'color': f'#{"".join([f"{hash(account_name) % 16:x}" for _ in range(6)])}'[:7]
+        }
+        for account_name, total in top_expenses
+    ]
     
     return Response({
         'revenue_trend': revenue_data,
@@ -9,9 +9,9 @@ Django admin interface.
 Usage:
   python audit_cli.py list [--days=30] [--company=1] [--user=admin] [--action=login]
   python audit_cli.py view <log_id>
-  python audit_cli.py export <output_csv> [--days=30] [--company=1]
+  python audit_cli.py export <output_file> [--days=30] [--company=1] [--format=csv|ndjson]
   python audit_cli.py stats [--days=30] [--company=1]
-  python audit_cli.py prune [--days=90] [--company=1] [--dry-run]
+  python audit_cli.py prune [--days=90] [--company=1] [--dry-run] [--archive-dir=DIR] [--layout=monthly]
 """
 
 import os
@@ -19,7 +19,6 @@ import sys
 import django
 import argparse
 from datetime import datetime, timedelta
-import csv
 import json
 
 # Setup Django environment
@@ -28,9 +27,13 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lifeline_backend.settings_produ
 django.setup()
 
 from apps.audit.models import AuditLog
-from apps.accounts.models import User, Company
+from apps.audit import retention
+from apps.audit.exporters import FORMATS, export_audit_logs, filtered_audit_logs
+from apps.audit.stats import audit_stats
+from apps.audit.management.commands.audit_stats import render_stats
+from apps.accounts.models import User
 from django.utils import timezone
-from django.db.models import Count
+from django.core.management import call_command
 from django.core.paginator import Paginator
 
 
@@ -133,150 +136,47 @@ def view_log(args):
 
 
 def export_logs(args):
-    """Export logs to CSV"""
-    # Build query
-    query = AuditLog.objects
-    
-    # Apply filters
-    if args.days:
-        start_date = timezone.now() - timedelta(days=args.days)
-        query = query.filter(timestamp__gte=start_date)
-        
-    if args.company:
-        query = query.filter(company_id=args.company)
-        
-    # Count and inform
-    count = query.count()
-    print(f"Exporting {count} audit log entries...")
+    """Export logs to CSV, gzip-compressed CSV or NDJSON"""
+    start_date = timezone.now() - timedelta(days=args.days) if args.days else None
+    query = filtered_audit_logs(start_date, args.company)
+    export_format = args.format or ('ndjson' if '.ndjson' in args.output_csv else 'csv')
     
-    # Define CSV columns
-    fieldnames = [
-        'id', 'timestamp', 'user', 'user_email', 'company', 'action_type',
-        'action_description', 'model', 'object_id', 'details',
-        'ip_address', 'user_agent'
-    ]
+    def progress(rows, last_id, elapsed):
+        print(f"Exported {rows} entries ({rows / elapsed if elapsed else 0:,.0f} rows/sec)...")
     
-    # Export to CSV
-    with open(args.output_csv, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        # Process in chunks to avoid memory issues
-        offset = 0
-        chunk_size = 1000
-        
-        while True:
-            logs = query.select_related('user', 'company', 'content_type')[offset:offset+chunk_size]
-            if not logs:
-                break
-                
-            for log in logs:
-                writer.writerow({
-                    'id': log.id,
-                    'timestamp': log.timestamp.isoformat(),
-                    'user': log.user.username if log.user else 'System',
-                    'user_email': log.user.email if log.user else '',
-                    'company': log.company.name,
-                    'action_type': log.action_type,
-                    'action_description': log.action_description,
-                    'model': log.content_type.model if log.content_type else '',
-                    'object_id': log.object_id or '',
-                    'details': log.details or '',
-                    'ip_address': log.ip_address or '',
-                    'user_agent': log.user_agent[:100] if log.user_agent else ''
-                })
-                
-            offset += chunk_size
-            print(f"Exported {min(offset, count)} of {count} entries...")
-            
-    print(f"Successfully exported {count} audit log entries to {args.output_csv}")
+    print(f"Exporting audit log entries to {args.output_csv}...")
+    try:
+        rows, last_id, elapsed = export_audit_logs(query, args.output_csv, export_format, progress=progress)
+    except FileExistsError:
+        print(f"{args.output_csv} already exists")
+        return
+    print(f"Successfully exported {rows} audit log entries to {args.output_csv} "
+          f"in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:,.0f} rows/sec)")
 
 
 def generate_stats(args):
-    """Generate statistics about audit logs"""
-    # Build query
-    query = AuditLog.objects
-    
-    # Apply filters
-    if args.days:
-        start_date = timezone.now() - timedelta(days=args.days)
-        query = query.filter(timestamp__gte=start_date)
-        
-    if args.company:
-        query = query.filter(company_id=args.company)
-        company_name = Company.objects.get(id=args.company).name if Company.objects.filter(id=args.company).exists() else f"Company #{args.company}"
-    else:
-        company_name = "All Companies"
-        
-    # Generate statistics
-    print(f"Audit Log Statistics for {company_name} (Last {args.days} days)")
-    print("=" * 60)
-    
-    # Total count
-    total_count = query.count()
-    print(f"Total audit log entries: {total_count}")
+    """Generate statistics about audit logs (aggregated in the database, cached per day)"""
+    report = audit_stats(args.days, args.company)
+    render_stats(report, print)
     
-    # Action type breakdown
-    action_counts = query.values('action_type').annotate(count=Count('id')).order_by('-count')
-    print("\nBreakdown by Action Type:")
-    for item in action_counts:
-        percentage = (item['count'] / total_count) * 100 if total_count else 0
-        print(f"  {item['action_type']:10} : {item['count']:5} ({percentage:.1f}%)")
-        
-    # User activity (top 10)
-    user_counts = query.exclude(user__isnull=True).values(
-        'user__username', 'user__email'
-    ).annotate(count=Count('id')).order_by('-count')[:10]
-    
-    print("\nTop 10 Users by Activity:")
-    for item in user_counts:
-        print(f"  {item['user__username']:15} : {item['count']:5} logs")
-        
     # Export to JSON if requested
     if args.output:
-        report = {
-            'generated_at': timezone.now().isoformat(),
-            'period_days': args.days,
-            'company_id': args.company,
-            'company_name': company_name,
-            'total_logs': total_count,
-            'action_breakdown': [
-                {'action': item['action_type'], 'count': item['count']} 
-                for item in action_counts
-            ],
-            'top_users': [
-                {
-                    'username': item['user__username'],
-                    'email': item['user__email'],
-                    'count': item['count']
-                } 
-                for item in user_counts
-            ]
-        }
-        
         with open(args.output, 'w') as f:
-            json.dump(report, f, indent=2)
+            json.dump({'generated_at': timezone.now().isoformat(), **report}, f, indent=2)
             
         print(f"\nReport saved to {args.output}")
 
 
 def prune_logs(args):
-    """Delete old audit logs"""
-    # Build query
+    """Delete old audit logs in batches (see the prune_audit_logs command)"""
     cutoff_date = timezone.now() - timedelta(days=args.days)
-    query = AuditLog.objects.filter(timestamp__lt=cutoff_date)
-    
-    if args.company:
-        query = query.filter(company_id=args.company)
-        
-    # Count records to be deleted
-    count = query.count()
+    count = retention.count_expired(cutoff_date, args.company)
     
     if args.dry_run:
         print(f"Would delete {count} log entries older than {args.days} days")
         return
         
-    if count == 0:
+    if count == 0 and args.layout != 'monthly':
         print("No logs to delete")
         return
         
@@ -287,24 +187,10 @@ def prune_logs(args):
             print("Operation cancelled")
             return
             
-    # Delete in chunks to avoid memory issues
-    deleted_count = 0
-    chunk_size = 1000
-    
-    while True:
-        # Get IDs for a chunk
-        ids = list(query.values_list('id', flat=True)[:chunk_size])
-        if not ids:
-            break
-            
-        # Delete this chunk
-        AuditLog.objects.filter(id__in=ids).delete()
-        deleted_count += len(ids)
-        
-        # Report progress
-        print(f"Deleted {deleted_count} of {count} log entries...")
-        
-    print(f"Successfully deleted {deleted_count} audit log entries older than {args.days} days")
+    call_command(
+        'prune_audit_logs', days=args.days, company=args.company, batch_size=args.batch_size,
+        sleep=args.sleep, archive_dir=args.archive_dir, layout=args.layout,
+    )
 
 
 def main():
@@ -326,8 +212,9 @@ def main():
     view_parser.add_argument('log_id', type=int, help='ID of the log to view')
     
     # Export command
-    export_parser = subparsers.add_parser('export', help='Export logs to CSV')
-    export_parser.add_argument('output_csv', type=str, help='Output CSV file path')
+    export_parser = subparsers.add_parser('export', help='Export logs to CSV or NDJSON')
+    export_parser.add_argument('output_csv', type=str, help='Output file path (.gz to compress)')
+    export_parser.add_argument('--format', choices=FORMATS, help='csv or ndjson (default: from the file name)')
     export_parser.add_argument('--days', type=int, default=30, help='Export logs from the last N days')
     export_parser.add_argument('--company', type=int, help='Company ID to filter by')
     
@@ -343,6 +230,10 @@ def main():
     prune_parser.add_argument('--company', type=int, help='Company ID to filter by')
     prune_parser.add_argument('--dry-run', action='store_true', help='Show what would be deleted without deleting')
     prune_parser.add_argument('--force', action='store_true', help='Skip confirmation prompt')
+    prune_parser.add_argument('--batch-size', type=int, help='AuditID range deleted per transaction')
+    prune_parser.add_argument('--sleep', type=float, help='Seconds to pause between batches')
+    prune_parser.add_argument('--archive-dir', type=str, help='Archive deleted rows as NDJSON.gz here first')
+    prune_parser.add_argument('--layout', choices=['single', 'monthly'], help='Retention layout')
     
     # Parse args
     args = parser.parse_args()
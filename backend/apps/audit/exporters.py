@@ -0,0 +1,121 @@
+"""
+Streaming export of AuditLog rows to CSV, gzip-compressed CSV or NDJSON.
+
+Rows are read in keyset batches on the primary key
+(``WHERE AuditID > last_id ORDER BY AuditID``) instead of OFFSET slices, so
+every batch is an index seek and an export of tens of millions of rows runs
+at a constant rate. Each batch is a ``values_list`` projection joined to the
+user, company and content type in the same query, and is written through a
+buffered (optionally gzip) file handle.
+"""
+import gzip
+import os
+import time
+
+from lifeline_backend.exports import export_chunks
+
+from .models import AuditLog
+
+# (column header, AuditLog lookup); AuditID must stay first for the keyset
+EXPORT_COLUMNS = (
+    ('id', 'AuditID'),
+    ('action_date', 'ActionDate'),
+    ('user', 'UserID__username'),
+    ('user_email', 'UserID__email'),
+    ('company_id', 'CompanyID'),
+    ('company', 'CompanyID__CompanyName'),
+    ('action_type', 'ActionType'),
+    ('action_description', 'ActionDescription'),
+    ('model', 'ContentType__model'),
+    ('object_id', 'ObjectID'),
+    ('details', 'Details'),
+    ('ip_address', 'IPAddress'),
+    ('user_agent', 'UserAgent'),
+)
+
+FORMATS = ('csv', 'ndjson')
+DEFAULT_BATCH_SIZE = 5000
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def iter_audit_rows(queryset, batch_size=DEFAULT_BATCH_SIZE, after_id=0, columns=EXPORT_COLUMNS):
+    """
+    Yield ``values_list`` tuples of ``queryset`` in AuditID order, one keyset batch at a time.
+
+    ``after_id`` resumes an interrupted export after the last id written.
+    """
+    lookups = [lookup for _, lookup in columns]
+    last_id = after_id or 0
+    while True:
+        batch = list(
+            queryset.filter(AuditID__gt=last_id).order_by('AuditID').values_list(*lookups)[:batch_size]
+        )
+        if not batch:
+            return
+        yield from batch
+        last_id = batch[-1][0]
+
+
+def open_export_file(path, compress=None, append=False):
+    """
+    Open ``path`` for text writing; gzip when ``compress`` or the name ends in ``.gz``.
+
+    A new file is required (``FileExistsError`` otherwise) unless ``append``;
+    appended gzip output is a second gzip member, which readers concatenate.
+    """
+    if compress is None:
+        compress = path.endswith('.gz')
+    mode = 'a' if append else 'x'
+    if compress:
+        return gzip.open(path, f'{mode}t', encoding='utf-8', newline='', compresslevel=6)
+    return open(path, mode, encoding='utf-8', newline='', buffering=WRITE_BUFFER_SIZE)
+
+
+def export_audit_logs(queryset, path, export_format='csv', compress=None, batch_size=DEFAULT_BATCH_SIZE,
+                      after_id=0, progress=None, progress_every=100000):
+    """
+    Write every AuditLog row of ``queryset`` to ``path``.
+
+    ``path`` must not exist yet, unless ``after_id`` resumes an interrupted
+    export: the rows after it are then appended, without a second CSV header.
+    ``progress(rows, last_id, elapsed_seconds)`` is called every
+    ``progress_every`` rows. Returns ``(rows, last_id, elapsed_seconds)``.
+    """
+    if export_format not in FORMATS:
+        raise ValueError(f"Unknown export format '{export_format}'; use one of {', '.join(FORMATS)}")
+
+    state = {'rows': 0, 'last_id': after_id or 0}
+    started = time.monotonic()
+
+    def counted(rows):
+        for row in rows:
+            state['rows'] += 1
+            state['last_id'] = row[0]
+            if progress is not None and state['rows'] % progress_every == 0:
+                progress(state['rows'], state['last_id'], time.monotonic() - started)
+            yield row
+
+    header = [name for name, _ in EXPORT_COLUMNS]
+    rows = counted(iter_audit_rows(queryset, batch_size, after_id))
+    resume = bool(after_id) and os.path.exists(path)
+    with open_export_file(path, compress, append=resume) as handle:
+        chunks = export_chunks(export_format, header, rows, batch_size=1000)
+        if resume and export_format == 'csv':
+            next(chunks)  # the header is already in the file
+        for chunk in chunks:
+            handle.write(chunk)
+    return state['rows'], state['last_id'], time.monotonic() - started
+
+
+def filtered_audit_logs(start_date=None, company_id=None, user=None, action_type=None):
+    """The AuditLog queryset for the export/stats filters shared by the commands and audit_cli."""
+    queryset = AuditLog.objects.all()
+    if start_date is not None:
+        queryset = queryset.filter(ActionDate__gte=start_date)
+    if company_id:
+        queryset = queryset.filter(CompanyID=company_id)
+    if user is not None:
+        queryset = queryset.filter(UserID=user)
+    if action_type:
+        queryset = queryset.filter(ActionType=action_type)
+    return queryset
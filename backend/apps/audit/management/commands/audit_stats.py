@@ -1,10 +1,34 @@
 from django.core.management.base import BaseCommand
-from apps.audit.models import AuditLog
+from apps.audit.stats import audit_stats
 from django.utils import timezone
-from django.db.models import Count
 import json
-from collections import Counter
-from datetime import timedelta
+
+
+def render_stats(report, write):
+    """Write the human-readable audit statistics report line by line."""
+    total_count = report['total_logs']
+    write(f"Audit Log Statistics for {report['company_name']} (Last {report['period_days']} days)")
+    write("=" * 60)
+    write(f"Total audit log entries: {total_count}")
+
+    write("\nBreakdown by Action Type:")
+    for item in report['action_breakdown']:
+        percentage = (item['count'] / total_count) * 100 if total_count else 0
+        write(f"  {item['action']:10} : {item['count']:5} ({percentage:.1f}%)")
+
+    write("\nTop 10 Users by Activity:")
+    for item in report['top_users']:
+        name = item['name'] or item['username']
+        write(f"  {name[:20]:20} : {item['count']:5} logs")
+
+    write("\nTop 10 IP Addresses:")
+    for item in report['top_ips']:
+        write(f"  {item['ip']:15} : {item['count']:5} logs")
+
+    write("\nActivity by Hour of Day:")
+    peak = max(report['hourly']) or 1
+    for hour, count in enumerate(report['hourly']):
+        write(f"  {hour:02d}:00 : {count:5} {'#' * round(30 * count / peak)}")
 
 
 class Command(BaseCommand):
@@ -19,80 +43,16 @@ class Command(BaseCommand):
                             help='Output file path for JSON report (optional)')
 
     def handle(self, *args, **options):
-        days_back = options['days']
-        company_id = options['company']
         output_file = options.get('output')
-        
-        start_date = timezone.now() - timedelta(days=days_back)
-        
-        # Build base query
-        query = AuditLog.objects.filter(action_date__gte=start_date)
-        if company_id:
-            query = query.filter(company_id=company_id)
-            company_name = query.first().company.name if query.exists() else f"Company #{company_id}"
-        else:
-            company_name = "All Companies"
-            
-        # Generate statistics
-        self.stdout.write(f"Audit Log Statistics for {company_name} (Last {days_back} days)")
-        self.stdout.write("=" * 60)
-        
-        # Total count
-        total_count = query.count()
-        self.stdout.write(f"Total audit log entries: {total_count}")
-        
-        # Action type breakdown
-        action_counts = query.values('action').annotate(count=Count('id')).order_by('-count')
-        self.stdout.write("\nBreakdown by Action Type:")
-        for item in action_counts:
-            percentage = (item['count'] / total_count) * 100 if total_count else 0
-            self.stdout.write(f"  {item['action']:10} : {item['count']:5} ({percentage:.1f}%)")
-            
-        # User activity (top 10)
-        user_counts = query.exclude(user__isnull=True).values(
-            'user__username', 'user__first_name', 'user__last_name'
-        ).annotate(count=Count('id')).order_by('-count')[:10]
-        
-        self.stdout.write("\nTop 10 Users by Activity:")
-        for item in user_counts:
-            name = f"{item['user__first_name']} {item['user__last_name']}".strip() or item['user__username']
-            self.stdout.write(f"  {name[:20]:20} : {item['count']:5} logs")
-            
-        # IP address statistics
-        ip_counts = Counter(
-            query.exclude(ip_address__isnull=True).values_list('ip_address', flat=True)
-        ).most_common(10)
-        
-        self.stdout.write("\nTop 10 IP Addresses:")
-        for ip, count in ip_counts:
-            self.stdout.write(f"  {ip:15} : {count:5} logs")
-            
+
+        report = audit_stats(options['days'], options['company'])
+        render_stats(report, self.stdout.write)
+
         # Save to JSON if requested
         if output_file:
-            report = {
-                'generated_at': timezone.now().isoformat(),
-                'period_days': days_back,
-                'company_id': company_id,
-                'company_name': company_name,
-                'total_logs': total_count,
-                'action_breakdown': [
-                    {'action': item['action_type'], 'count': item['count']} 
-                    for item in action_counts
-                ],
-                'top_users': [
-                    {
-                        'username': item['user__username'],
-                        'name': f"{item['user__first_name']} {item['user__last_name']}".strip(),
-                        'count': item['count']
-                    } 
-                    for item in user_counts
-                ],
-                'top_ips': [{'ip': ip, 'count': count} for ip, count in ip_counts]
-            }
-            
             with open(output_file, 'w') as f:
-                json.dump(report, f, indent=2)
-                
+                json.dump({'generated_at': timezone.now().isoformat(), **report}, f, indent=2)
+
             self.stdout.write(self.style.SUCCESS(f"\nReport saved to {output_file}"))
-        
+
         self.stdout.write(self.style.SUCCESS("Analysis complete!"))
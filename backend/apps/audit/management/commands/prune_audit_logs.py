@@ -1,11 +1,11 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 import datetime
-from apps.audit.models import AuditLog
+from apps.audit import retention
 from django.utils import timezone
 
 
 class Command(BaseCommand):
-    help = 'Deletes old audit log entries to keep the database size manageable'
+    help = 'Deletes old audit log entries in small batches, optionally archiving them first'
 
     def add_arguments(self, parser):
         parser.add_argument('--days', type=int, default=90,
@@ -14,45 +14,62 @@ class Command(BaseCommand):
                             help='Print what would be deleted without actually deleting')
         parser.add_argument('--company', type=int,
                             help='Only delete logs for a specific company ID')
+        parser.add_argument('--batch-size', type=int,
+                            help='AuditID range deleted per transaction (default AUDIT_LOG_RETENTION BATCH_SIZE)')
+        parser.add_argument('--sleep', type=float,
+                            help='Seconds to pause between batches (default AUDIT_LOG_RETENTION SLEEP)')
+        parser.add_argument('--archive-dir', type=str,
+                            help='Write deleted rows to gzip-compressed NDJSON in this directory first')
+        parser.add_argument('--layout', choices=['single', 'monthly'],
+                            help='Retention layout (default AUDIT_LOG_RETENTION LAYOUT)')
 
     def handle(self, *args, **options):
         days_old = options['days']
         dry_run = options['dry_run']
         company_id = options['company']
-        
+        layout = options['layout'] or retention.retention_settings()['LAYOUT']
+
         cutoff_date = timezone.now() - datetime.timedelta(days=days_old)
-        
-        # Build query
-        query = AuditLog.objects.filter(action_date__lt=cutoff_date)
-        if company_id:
-            query = query.filter(company_id=company_id)
-            
-        # Count records to be deleted
-        count = query.count()
-        
+
+        if layout == 'monthly' and company_id:
+            raise CommandError('--company cannot be combined with the monthly layout; periods hold every company')
+
         if dry_run:
+            count = retention.count_expired(cutoff_date, company_id)
             self.stdout.write(self.style.SUCCESS(
-                f'Would delete {count} log entries older than {days_old} days'
+                f'Would delete {count} live log entries older than {days_old} days'
             ))
+            if layout == 'monthly':
+                expired = [table for month, table in retention.period_tables().items()
+                           if retention.add_months(month, 1) <= cutoff_date]
+                self.stdout.write(self.style.SUCCESS(
+                    f"Would drop period tables: {', '.join(expired) or 'none'}"
+                ))
             return
-            
-        # Delete in chunks to avoid memory issues
-        deleted_count = 0
-        chunk_size = 1000
-        
-        while True:
-            # Get IDs for a chunk
-            ids = list(query.values_list('id', flat=True)[:chunk_size])
-            if not ids:
-                break
-                
-            # Delete this chunk
-            AuditLog.objects.filter(id__in=ids).delete()
-            deleted_count += len(ids)
-            
-            # Report progress
-            self.stdout.write(f'Deleted {deleted_count} of {count} log entries...')
-            
+
+        batch_options = {'batch_size': options['batch_size'], 'sleep': options['sleep']}
+
+        if layout == 'monthly':
+            live_months = retention.retention_settings()['LIVE_MONTHS']
+            boundary = retention.add_months(retention.month_start(timezone.now()), -live_months)
+            moved = retention.rotate_into_period_tables(
+                boundary, progress=lambda rows, table: self.stdout.write(f'Moved {rows} log entries ({table})...'),
+                **batch_options,
+            )
+            rows, tables = retention.drop_period_tables(cutoff_date, archive_dir=options['archive_dir'])
+            self.stdout.write(
+                f'Moved {moved} log entries into period tables; '
+                f'dropped {len(tables)} period tables holding {rows} entries'
+            )
+
+        deleted, archive_path = retention.prune_audit_logs(
+            cutoff_date, company_id, archive_dir=options['archive_dir'],
+            progress=lambda rows, last_id: self.stdout.write(f'Deleted {rows} log entries (through AuditID {last_id})...'),
+            **batch_options,
+        )
+        if archive_path:
+            self.stdout.write(f'Archived deleted entries to {archive_path}')
+
         self.stdout.write(self.style.SUCCESS(
-            f'Successfully deleted {deleted_count} audit log entries older than {days_old} days'
+            f'Successfully deleted {deleted} audit log entries older than {days_old} days'
         ))
@@ -1,412 +1,251 @@
-import json
-import re
-import asyncio
-from asgiref.sync import iscoroutinefunction
-from django.urls import resolve
+from collections import namedtuple
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import close_old_connections
+from django.urls import URLPattern, URLResolver, get_resolver
 from django.conf import settings
-from .utils import log_action
-from apps.accounts.models import Company
+from .utils import log_action, resolve_company_id
+
+
+# How a route is audited: ``audit`` False skips it entirely; ``login`` and
+# ``logout`` mark the authentication endpoints; ``list_view`` routes are not
+# logged for GET (listing endpoints would flood the log).
+RoutePolicy = namedtuple('RoutePolicy', 'audit login logout list_view')
+
+SKIP = RoutePolicy(audit=False, login=False, logout=False, list_view=False)
+
+# Methods whose JSON body may name the company of the request
+BODY_METHODS = frozenset(('POST', 'PUT', 'PATCH', 'DELETE'))
+
+
+def _join_route(prefix, route):
+    """Join route fragments the way ``ResolverMatch.route`` does."""
+    if route.startswith('^'):
+        route = route[1:]
+    return prefix + route
+
+
+class RouteClassifier:
+    """
+    Audit policy per URL route, computed once from the URL resolver.
+
+    The middleware looks requests up by ``request.resolver_match.route``,
+    which Django has already resolved for the view, so classifying a request
+    is a dict lookup. Routes the walk did not produce (e.g. added at runtime)
+    are classified on first sight and remembered.
+    """
+
+    def __init__(self, excluded_prefixes, login_names, logout_names, urlconf=None):
+        self.excluded_prefixes = tuple(excluded_prefixes)
+        self.login_names = frozenset(login_names)
+        self.logout_names = frozenset(logout_names)
+        self.policies = {}
+        self._walk(get_resolver(urlconf).url_patterns, '')
+
+    def _walk(self, patterns, prefix):
+        for entry in patterns:
+            route = _join_route(prefix, str(entry.pattern))
+            if isinstance(entry, URLResolver):
+                self._walk(entry.url_patterns, route)
+            elif isinstance(entry, URLPattern):
+                self.policies[route] = self.classify(route, entry.name)
+
+    def classify(self, route, url_name):
+        if route.startswith(self.excluded_prefixes):
+            return SKIP
+        return RoutePolicy(
+            audit=True,
+            login=url_name in self.login_names,
+            logout=url_name in self.logout_names,
+            list_view=bool(url_name) and url_name.endswith('-list'),
+        )
+
+    def policy(self, resolver_match):
+        route = resolver_match.route
+        policy = self.policies.get(route)
+        if policy is None:
+            policy = self.policies[route] = self.classify(route, resolver_match.url_name)
+        return policy
 
 
 class AuditLogMiddleware:
     """
     Middleware to automatically log user actions for auditing purposes.
-    
+
     This middleware captures:
     - Login/logout events
-    - API access for specified views
+    - Create/update/delete calls and detail views of the API routes
     - Other configurable actions
+
+    Whether and how a request is audited is decided per route by a
+    ``RouteClassifier`` built on the first request. The JSON body is only
+    parsed when an entry is actually written and needs its company.
+
+    Under ASGI the middleware runs natively async: the decision is made on
+    the event loop, and only requests that are logged hand the blocking part
+    (company lookup, ``request.user``, the ORM or writer call) to a worker
+    thread with ``sync_to_async(thread_sensitive=False)``, so audit writes
+    never run on the loop or queue behind the single thread-sensitive
+    executor the sync views share.
     """
-    
-    # URLs that should not be logged (to prevent excessive logging)
-    EXCLUDED_URLS = [
-        r'^/admin/jsi18n/',
-        r'^/static/',
-        r'^/media/',
-        r'^/favicon\.ico$',
+
+    sync_capable = True
+    async_capable = True
+
+    # Route prefixes (as in ``ResolverMatch.route``, no leading slash) that are never logged
+    EXCLUDED_ROUTES = [
+        'admin/',
+        'static/',
+        'media/',
+        'favicon.ico',
+        'swagger/',
+        'redoc/',
+        'api/health/',
+        'api/metrics/',
     ]
-    
+    # URL names of the authentication endpoints
+    LOGIN_URL_NAMES = ['token_obtain_pair']
+    LOGOUT_URL_NAMES = ['logout']
+
     def __init__(self, get_response):
         self.get_response = get_response
         # Check if the get_response is async
         self.is_async = iscoroutinefunction(get_response)
-        
+        if self.is_async:
+            markcoroutinefunction(self)
+        # Plain prefix test for requests that will not reach an audited view
+        self._excluded_paths = tuple('/' + route for route in self.EXCLUDED_ROUTES)
+        self._classifier = None
+
+    @property
+    def classifier(self):
+        # Built lazily: the URLconf may import views that import this module
+        if self._classifier is None:
+            self._classifier = RouteClassifier(self.EXCLUDED_ROUTES, self.LOGIN_URL_NAMES, self.LOGOUT_URL_NAMES)
+        return self._classifier
+
     def __call__(self, request):
-        """Handle sync requests"""
-        # Store request body for logging purposes
-        if request.content_type == 'application/json' and request.body:
-            try:
-                request._body_data = json.loads(request.body)
-            except json.JSONDecodeError:
-                request._body_data = None
-        else:
-            request._body_data = None
-            
-        # Get response from the next middleware or view
+        """Handle sync requests (async ones are dispatched to ``__acall__``)"""
+        if self.is_async:
+            return self.__acall__(request)
+        self._buffer_body(request)
         response = self.get_response(request)
-        
-        # Process response for audit logging
-        if not self._should_skip_logging(request):
-            # Only log API calls
-            if request.path.startswith('/api/'):
-                # Skip OPTIONS requests (CORS preflight)
-                if request.method != 'OPTIONS':
-                    try:
-                        self._log_request(request, response)
-                    except Exception as e:
-                        if settings.DEBUG:
-                            print(f"Error logging audit action: {e}")
-        
+        self._process_response(request, response)
         return response
-        
+
     async def __acall__(self, request):
-        """Handle async requests"""
-        # Store request body for logging purposes
-        if request.content_type == 'application/json' and request.body:
-            try:
-                request._body_data = json.loads(request.body)
-            except json.JSONDecodeError:
-                request._body_data = None
-        else:
-            request._body_data = None
-            
-        # Get response from the next middleware or view
+        """Handle async requests without blocking the event loop"""
+        self._buffer_body(request)
         response = await self.get_response(request)
-        
-        # Process response for audit logging
-        if not self._should_skip_logging(request):
-            # Only log API calls
-            if request.path.startswith('/api/'):
-                # Skip OPTIONS requests (CORS preflight)
-                if request.method != 'OPTIONS':
-                    try:
-                        self._log_request(request, response)
-                    except Exception as e:
-                        if settings.DEBUG:
-                            print(f"Error logging audit action: {e}")
-        
+        try:
+            action_info = self._get_action_info(request, response)
+        except Exception as e:
+            action_info = None
+            if settings.DEBUG:
+                print(f"Error logging audit action: {e}")
+        if action_info:
+            await sync_to_async(self._log_in_worker, thread_sensitive=False)(request, response, action_info)
         return response
-        
-    def _should_skip_logging(self, request):
-        """
-        Determine if this request should be skipped for logging.
-        """
-        path = request.path
-        
-        # Check against excluded URL patterns
-        for pattern in self.EXCLUDED_URLS:
-            if re.match(pattern, path):
-                return True
-                
-        return False
-        
-    def _log_request(self, request, response):
-        """Log the request and response for audit purposes"""
-        # Attempt to determine the action type and description
-        action_info = self._get_action_info(request, response)
-        if not action_info:
-            return
-            
-        action_type, action_description = action_info
-        
-        # Try to determine the company from the request
-        company = self._get_company(request)
-        if not company:
-            # If we can't determine the company, we can't log
-            return
-            
-        # Log the action
-        log_action(
-            request=request,
-            company=company,
-            action_type=action_type,
-            action_description=action_description,
-            # No specific object for middleware-level logging
-            details=f"URL: {request.path}, Method: {request.method}, Status: {response.status_code}"
-        )
-        
-    def _get_action_info(self, request, response):
-        """
-        Determine the action type and description based on the request and response.
-        Returns (action_type, action_description) or None if no logging should occur.
-        """
-        from .models import AuditLog
-        
-        method = request.method
-        path = request.path
-        status = response.status_code
-        
-        # Skip failed requests (except unauthorized, which we want to log)
-        if status >= 400 and status != 401:
-            return None
-            
-        # Handle login/logout
-        if path.endswith('/api/login/') and method == 'POST' and status == 200:
-            return (AuditLog.LOGIN, "User logged in")
-            
-        if path.endswith('/api/logout/') and status == 200:
-            return (AuditLog.LOGOUT, "User logged out")
-            
-        # Handle common API actions
-        if method == 'GET':
-            # Skip listing endpoints to avoid excessive logging
-            if path.endswith('/') and '/' not in path.rstrip('/'):
-                return None
-            return (AuditLog.VIEW, f"Viewed resource at {path}")
-            
-        if method == 'POST':
-            return (AuditLog.CREATE, f"Created resource at {path}")
-            
-        if method == 'PUT' or method == 'PATCH':
-            return (AuditLog.UPDATE, f"Updated resource at {path}")
-            
-        if method == 'DELETE':
-            return (AuditLog.DELETE, f"Deleted resource at {path}")
-            
-        # Default case
-        return (AuditLog.OTHER, f"{method} request to {path}")
-        
-    def _get_company(self, request):
-        """
-        Try to determine the company from the request.
+
+    def _buffer_body(self, request):
         """
-        # First check if company ID is in the request data
-        company_id = None
-        
-        # Try to get from request body
-        if hasattr(request, '_body_data') and request._body_data:
-            company_id = request._body_data.get('company')
-            
-        # Try to get from query parameters
-        if not company_id:
-            company_id = request.GET.get('company')
-            
-        # Try to get from request user
-        if not company_id and hasattr(request, 'user') and request.user.is_authenticated:
-            if hasattr(request.user, 'active_company') and request.user.active_company:
-                return request.user.active_company
-                
-        # If we found a company ID, get the company
-        if company_id:
-            try:
-                return Company.objects.get(id=company_id)
-            except (Company.DoesNotExist, ValueError):
-                pass
-                
-        # If we couldn't determine the company, try to use a default one
-        # This is just a fallback - in a real system you might not want this
+        Keep the raw body readable after the view has consumed the stream.
+
+        Reading ``request.body`` buffers the bytes the view reads anyway; it
+        is not parsed here (see ``utils.request_body_data``).
+        """
+        if (
+            request.method in BODY_METHODS
+            and request.content_type == 'application/json'
+            and not request.path_info.startswith(self._excluded_paths)
+        ):
+            request.body  # noqa: B018
+
+    def _process_response(self, request, response):
+        """Log the request if its route and outcome are audited; never raises."""
         try:
-            return Company.objects.first()
-        except Company.DoesNotExist:
-            return None
-        
-    def _process_response_sync(self, request, response):
-        """Process the response for auditing (sync version)"""
-        # Check if this URL should be logged
-        if self._should_skip_logging(request):
-            return response
-            
-        # Only log API calls
-        if not request.path.startswith('/api/'):
-            return response
-            
-        # Skip OPTIONS requests (CORS preflight)
-        if request.method == 'OPTIONS':
-            return response
-            
-        # Attempt to determine the action type and description
-        action_info = self._get_action_info_sync(request, response)
-        if not action_info:
-            return response
-            
-        action_type, action_description = action_info
-        
-        # Try to determine the company from the request
-        company = self._get_company_sync(request)
-        if not company:
-            # If we can't determine the company, we can't log
-            return response
-            
-        # Log the action
+            action_info = self._get_action_info(request, response)
+            if action_info:
+                self._log_request(request, response, *action_info)
+        except Exception as e:
+            if settings.DEBUG:
+                print(f"Error logging audit action: {e}")
+
+    def _log_in_worker(self, request, response, action_info):
+        """Write one entry from a worker thread, then release that thread's stale connections."""
         try:
-            log_action(
-                request=request,
-                company=company,
-                action_type=action_type,
-                action_description=action_description,
-                # No specific object for middleware-level logging
-                details=f"URL: {request.path}, Method: {request.method}, Status: {response.status_code}"
-            )
+            self._log_request(request, response, *action_info)
         except Exception as e:
-            # Log the exception but don't interrupt the response
             if settings.DEBUG:
                 print(f"Error logging audit action: {e}")
-                
-        return response
-        
-    def _should_skip_logging(self, request):
-        """
-        Determine if this request should be skipped for logging.
-        """
-        path = request.path
-        
-        # Check against excluded URL patterns
-        for pattern in self.EXCLUDED_URLS:
-            if re.match(pattern, path):
-                return True
-                
-        return False
-        
-    async def _get_action_info_async(self, request, response):
+        finally:
+            close_old_connections()
+
+    def _get_action_info(self, request, response):
         """
-        Determine the action type and description based on the request and response.
+        Determine the action type and description based on the route and response.
         Returns (action_type, action_description) or None if no logging should occur.
-        (Async version)
         """
         from .models import AuditLog
-        
-        method = request.method
-        path = request.path
-        status = response.status_code
-        
-        # Skip failed requests (except unauthorized, which we want to log)
-        if status >= 400 and status != 401:
+
+        match = getattr(request, 'resolver_match', None)
+        # Unresolved (404) requests and CORS preflights are not logged
+        if match is None or request.method == 'OPTIONS':
             return None
-            
-        # Handle login/logout
-        if path.endswith('/api/login/') and method == 'POST' and status == 200:
-            return (AuditLog.LOGIN, "User logged in")
-            
-        if path.endswith('/api/logout/') and status == 200:
-            return (AuditLog.LOGOUT, "User logged out")
-            
-        # Handle common API actions
-        if method == 'GET':
-            # Skip listing endpoints to avoid excessive logging
-            if path.endswith('/') and '/' not in path.rstrip('/'):
-                return None
-            return (AuditLog.VIEW, f"Viewed resource at {path}")
-            
-        if method == 'POST':
-            return (AuditLog.CREATE, f"Created resource at {path}")
-            
-        if method == 'PUT' or method == 'PATCH':
-            return (AuditLog.UPDATE, f"Updated resource at {path}")
-            
-        if method == 'DELETE':
-            return (AuditLog.DELETE, f"Deleted resource at {path}")
-            
-        # Default case
-        return (AuditLog.OTHER, f"{method} request to {path}")
-        
-    def _get_action_info_sync(self, request, response):
-        """
-        Determine the action type and description based on the request and response.
-        Returns (action_type, action_description) or None if no logging should occur.
-        (Sync version)
-        """
-        from .models import AuditLog
-        
+
+        policy = self.classifier.policy(match)
+        if not policy.audit:
+            return None
+
         method = request.method
         path = request.path
         status = response.status_code
-        
+
         # Skip failed requests (except unauthorized, which we want to log)
         if status >= 400 and status != 401:
             return None
-            
+
         # Handle login/logout
-        if path.endswith('/api/login/') and method == 'POST' and status == 200:
-            return (AuditLog.LOGIN, "User logged in")
-            
-        if path.endswith('/api/logout/') and status == 200:
-            return (AuditLog.LOGOUT, "User logged out")
-            
+        if policy.login:
+            if method == 'POST' and status == 200:
+                return (AuditLog.LOGIN, "User logged in")
+            return None
+
+        if policy.logout:
+            return (AuditLog.LOGOUT, "User logged out") if status == 200 else None
+
         # Handle common API actions
         if method == 'GET':
             # Skip listing endpoints to avoid excessive logging
-            if path.endswith('/') and '/' not in path.rstrip('/'):
+            if policy.list_view:
                 return None
             return (AuditLog.VIEW, f"Viewed resource at {path}")
-            
+
         if method == 'POST':
             return (AuditLog.CREATE, f"Created resource at {path}")
-            
+
         if method == 'PUT' or method == 'PATCH':
             return (AuditLog.UPDATE, f"Updated resource at {path}")
-            
+
         if method == 'DELETE':
             return (AuditLog.DELETE, f"Deleted resource at {path}")
-            
+
         # Default case
         return (AuditLog.OTHER, f"{method} request to {path}")
-        
-    async def _get_company_async(self, request):
-        """
-        Try to determine the company from the request.
-        (Async version)
-        """
-        # First check if company ID is in the request data
-        company_id = None
-        
-        # Try to get from request body
-        if hasattr(request, '_body_data') and request._body_data:
-            company_id = request._body_data.get('company')
-            
-        # Try to get from query parameters
-        if not company_id:
-            company_id = request.GET.get('company')
-            
-        # Try to get from request user
-        if not company_id and hasattr(request, 'user') and request.user.is_authenticated:
-            if hasattr(request.user, 'active_company') and request.user.active_company:
-                return request.user.active_company
-                
-        # If we found a company ID, get the company
-        if company_id:
-            try:
-                return Company.objects.get(id=company_id)
-            except (Company.DoesNotExist, ValueError):
-                pass
-                
-        # If we couldn't determine the company, try to use a default one
-        # This is just a fallback - in a real system you might not want this
-        try:
-            return Company.objects.first()
-        except Company.DoesNotExist:
-            return None
-            
-    def _get_company_sync(self, request):
-        """
-        Try to determine the company from the request.
-        (Sync version)
-        """
-        # First check if company ID is in the request data
-        company_id = None
-        
-        # Try to get from request body
-        if hasattr(request, '_body_data') and request._body_data:
-            company_id = request._body_data.get('company')
-            
-        # Try to get from query parameters
-        if not company_id:
-            company_id = request.GET.get('company')
-            
-        # Try to get from request user
-        if not company_id and hasattr(request, 'user') and request.user.is_authenticated:
-            if hasattr(request.user, 'active_company') and request.user.active_company:
-                return request.user.active_company
-                
-        # If we found a company ID, get the company
-        if company_id:
-            try:
-                return Company.objects.get(id=company_id)
-            except (Company.DoesNotExist, ValueError):
-                pass
-                
-        # If we couldn't determine the company, try to use a default one
-        # This is just a fallback - in a real system you might not want this
-        try:
-            return Company.objects.first()
-        except Company.DoesNotExist:
-            return None
+
+    def _log_request(self, request, response, action_type, action_description):
+        """Log the request and response for audit purposes"""
+        # Try to determine the company from the request (parses the JSON body if needed)
+        company = resolve_company_id(request)
+        if not company:
+            # If we can't determine the company, we can't log
+            return
+
+        # Log the action
+        log_action(
+            request=request,
+            company=company,
+            action_type=action_type,
+            action_description=action_description,
+            # No specific object for middleware-level logging
+            details=f"URL: {request.path}, Method: {request.method}, Status: {response.status_code}"
+        )
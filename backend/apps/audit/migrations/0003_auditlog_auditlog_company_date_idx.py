@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-18 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0002_alter_auditlog_options_alter_auditlog_action_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['CompanyID', '-ActionDate'], name='auditlog_company_date_idx'),
+        ),
+    ]
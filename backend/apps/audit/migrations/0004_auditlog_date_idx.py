@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-18 10:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0003_auditlog_auditlog_company_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['ActionDate'], name='auditlog_date_idx'),
+        ),
+    ]
@@ -60,6 +60,12 @@ class AuditLog(models.Model):
         verbose_name = "Audit Log Entry"
         verbose_name_plural = "Audit Log"
         ordering = ['-ActionDate']
+        indexes = [
+            # Company audit trail, newest first (list views, exports, stats)
+            models.Index(fields=['CompanyID', '-ActionDate'], name='auditlog_company_date_idx'),
+            # Retention: expired AuditID bounds and the oldest month without a scan
+            models.Index(fields=['ActionDate'], name='auditlog_date_idx'),
+        ]
 
     def __str__(self):
         username = self.UserID.username if self.UserID else 'System'
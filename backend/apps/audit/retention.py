@@ -0,0 +1,296 @@
+"""
+Audit log retention: bounded batch deletes and monthly period tables.
+
+Deleting every expired row in one statement holds locks on the whole range
+(SQL Server escalates to a table lock past ~5000 row locks) and blocks the
+audit writes every API request makes. ``prune_audit_logs`` instead walks the
+expired rows in ``AuditID`` ranges of ``batch_size``, deleting each range in
+its own short transaction and optionally sleeping between batches. Before a
+range is deleted it can be appended to a gzip-compressed NDJSON archive.
+
+``AuditLog.objects.filter(...).delete()`` would also load every row: the
+catch-all ``post_delete`` receiver in ``apps.audit.signals`` disables
+Django's fast-delete path. Nothing references AuditLog and no handler cares
+about its rows, so each range is removed with one explicit ``DELETE``
+statement (see ``_delete_rows``).
+
+With the monthly layout (``AUDIT_LOG_RETENTION['LAYOUT'] = 'monthly'``) closed
+months are moved out of the live table into ``AuditLog_YYYYMM`` tables of the
+same shape, and expiring a month is a ``DROP TABLE`` instead of a delete.
+The API, exports and stats read the live table only.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import AuditLog
+
+DEFAULTS = {
+    'BATCH_SIZE': 4000,     # stays under SQL Server's lock escalation threshold
+    'SLEEP': 0.0,           # seconds to pause between batches
+    'LAYOUT': 'single',     # 'single' or 'monthly' (AuditLog_YYYYMM period tables)
+    'LIVE_MONTHS': 1,       # closed months kept in the live table by the monthly layout
+}
+
+PERIOD_TABLE_PREFIX = f'{AuditLog._meta.db_table}_'
+
+_period_models = {}
+
+
+def retention_settings():
+    return {**DEFAULTS, **getattr(settings, 'AUDIT_LOG_RETENTION', {})}
+
+
+def _columns():
+    return [field.attname for field in AuditLog._meta.concrete_fields]
+
+
+# --- archive -----------------------------------------------------------------
+
+class NDJSONArchive:
+    """Append-only gzip NDJSON file of full AuditLog rows."""
+
+    def __init__(self, directory, name):
+        os.makedirs(directory, exist_ok=True)
+        stamp = timezone.now().strftime('%Y%m%dT%H%M%S')
+        self.path = os.path.join(directory, f'{name}-{stamp}.ndjson.gz')
+        self._handle = gzip.open(self.path, 'at', encoding='utf-8')
+        self.rows = 0
+
+    def write(self, rows):
+        """Write ``rows`` (dicts) and flush, so they are on disk before the delete."""
+        self._handle.write(''.join(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows))
+        self._handle.flush()
+        self.rows += len(rows)
+
+    def close(self):
+        self._handle.close()
+
+
+# --- batch deletes -----------------------------------------------------------
+
+def _id_ranges(queryset, batch_size):
+    """Yield ``(low, high)`` AuditID ranges of ``batch_size`` covering ``queryset``."""
+    bounds = queryset.aggregate(low=Min('AuditID'), high=Max('AuditID'))
+    if bounds['low'] is None:
+        return
+    for low in range(bounds['low'], bounds['high'] + 1, batch_size):
+        yield low, min(low + batch_size - 1, bounds['high'])
+
+
+def _delete_rows(queryset):
+    """
+    Delete the AuditLog rows of ``queryset`` with a single ``DELETE`` and
+    return how many went.
+
+    No cascades or delete signals can apply: AuditLog is a leaf (no foreign
+    key or generic relation points at it) and the only ``post_delete``
+    receiver, ``apps.audit.signals.model_post_delete``, ignores it. Should a
+    model ever reference AuditLog, ``QuerySet.delete()`` takes over so its
+    cascades still run.
+    """
+    if AuditLog._meta.related_objects:
+        return queryset.delete()[0]
+    quote = connection.ops.quote_name
+    select_sql, params = queryset.order_by().values('AuditID').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(AuditLog._meta.db_table)} WHERE {quote(AuditLog._meta.pk.column)} IN ({select_sql})',
+            params,
+        )
+        return cursor.rowcount
+
+
+def prune_audit_logs(cutoff, company_id=None, batch_size=None, sleep=None, archive_dir=None, progress=None):
+    """
+    Delete AuditLog rows older than ``cutoff`` in AuditID ranges of ``batch_size``.
+
+    Each range is archived (when ``archive_dir`` is given) and deleted in its
+    own transaction. ``progress(deleted, high_id)`` is called after each
+    non-empty batch. Returns ``(deleted, archive_path)``.
+    """
+    config = retention_settings()
+    batch_size = batch_size or config['BATCH_SIZE']
+    sleep = config['SLEEP'] if sleep is None else sleep
+
+    expired = AuditLog.objects.filter(ActionDate__lt=cutoff)
+    if company_id:
+        expired = expired.filter(CompanyID=company_id)
+
+    archive = NDJSONArchive(archive_dir, 'auditlog') if archive_dir else None
+    deleted = 0
+    try:
+        for low, high in _id_ranges(expired, batch_size):
+            batch = expired.filter(AuditID__gte=low, AuditID__lte=high)
+            with transaction.atomic():
+                if archive is not None:
+                    rows = list(batch.order_by('AuditID').values(*_columns()))
+                    if not rows:
+                        continue
+                    archive.write(rows)
+                count = _delete_rows(batch)
+            if not count:
+                continue
+            deleted += count
+            if progress is not None:
+                progress(deleted, high)
+            if sleep:
+                time.sleep(sleep)
+    finally:
+        if archive is not None:
+            archive.close()
+    return deleted, archive.path if archive is not None else None
+
+
+def count_expired(cutoff, company_id=None):
+    expired = AuditLog.objects.filter(ActionDate__lt=cutoff)
+    if company_id:
+        expired = expired.filter(CompanyID=company_id)
+    return expired.count()
+
+
+# --- monthly period tables ---------------------------------------------------
+
+def month_start(value):
+    """Midnight on the first of ``value``'s month, in the current time zone."""
+    return timezone.localtime(value).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value, months):
+    index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=index // 12, month=index % 12 + 1)
+
+
+def period_table_name(month):
+    return f'{PERIOD_TABLE_PREFIX}{month.year:04d}{month.month:02d}'
+
+
+def period_model(month):
+    """
+    An unmanaged model for the ``AuditLog_YYYYMM`` table of ``month``.
+
+    Columns match AuditLog, but the primary key is a plain integer (rows keep
+    their AuditID) and foreign keys carry no constraints, so deleting a user
+    or company never has to look at archived periods.
+    """
+    table = period_table_name(month)
+    if table in _period_models:
+        return _period_models[table]
+
+    attrs = {'__module__': __name__}
+    for field in AuditLog._meta.concrete_fields:
+        if field.primary_key:
+            attrs[field.name] = models.IntegerField(primary_key=True, db_column=field.column)
+            continue
+        clone = field.clone()
+        if field.is_relation:
+            clone.remote_field.related_name = '+'
+            clone.db_constraint = False
+        attrs[field.name] = clone
+    attrs['Meta'] = type('Meta', (), {'db_table': table, 'managed': False, 'app_label': AuditLog._meta.app_label})
+    model = type(f'AuditLogPeriod{month.year:04d}{month.month:02d}', (models.Model,), attrs)
+    _period_models[table] = model
+    return model
+
+
+def period_tables():
+    """``{month_start: table_name}`` of the existing period tables."""
+    tables = {}
+    for name in connection.introspection.table_names():
+        suffix = name[len(PERIOD_TABLE_PREFIX):]
+        if name.startswith(PERIOD_TABLE_PREFIX) and len(suffix) == 6 and suffix.isdigit():
+            month = timezone.make_aware(datetime(int(suffix[:4]), int(suffix[4:]), 1))
+            tables[month] = name
+    return dict(sorted(tables.items()))
+
+
+def ensure_period_table(month):
+    model = period_model(month)
+    if model._meta.db_table not in connection.introspection.table_names():
+        with connection.schema_editor() as editor:
+            editor.create_model(model)
+    return model
+
+
+def rotate_into_period_tables(before, batch_size=None, sleep=None, progress=None):
+    """
+    Move rows of every month that ended on or before ``before`` into its period table.
+
+    Rows are copied with ``INSERT ... SELECT`` and deleted from the live table
+    one AuditID range at a time, each range in one transaction. Returns the
+    number of rows moved.
+    """
+    config = retention_settings()
+    batch_size = batch_size or config['BATCH_SIZE']
+    sleep = config['SLEEP'] if sleep is None else sleep
+    boundary = month_start(before)
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in AuditLog._meta.concrete_fields)
+
+    moved = 0
+    while True:
+        oldest = AuditLog.objects.filter(ActionDate__lt=boundary).aggregate(first=Min('ActionDate'))['first']
+        if oldest is None:
+            return moved
+        start = month_start(oldest)
+        end = add_months(start, 1)
+        model = ensure_period_table(start)
+        rows = AuditLog.objects.filter(ActionDate__gte=start, ActionDate__lt=end)
+        for low, high in _id_ranges(rows, batch_size):
+            batch = rows.filter(AuditID__gte=low, AuditID__lte=high).order_by()
+            select_sql, params = batch.values_list(*_columns()).query.sql_with_params()
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'INSERT INTO {quote(model._meta.db_table)} ({columns}) {select_sql}', params
+                    )
+                count = _delete_rows(batch)
+            moved += count
+            if progress is not None and count:
+                progress(moved, period_table_name(start))
+            if sleep and count:
+                time.sleep(sleep)
+
+
+def drop_period_tables(cutoff, archive_dir=None, progress=None):
+    """
+    Drop the period tables of months that ended before ``cutoff``.
+
+    Each table is first dumped to ``archive_dir`` when given. Returns
+    ``(rows_dropped, [table names])``.
+    """
+    dropped_rows = 0
+    dropped = []
+    for month, table in period_tables().items():
+        if add_months(month, 1) > cutoff:
+            break
+        model = period_model(month)
+        rows = model.objects.count()
+        if archive_dir:
+            archive = NDJSONArchive(archive_dir, table)
+            try:
+                last_id = 0
+                while True:
+                    batch = list(model.objects.filter(AuditID__gt=last_id).order_by('AuditID')
+                                 .values(*_columns())[:retention_settings()['BATCH_SIZE']])
+                    if not batch:
+                        break
+                    archive.write(batch)
+                    last_id = batch[-1]['AuditID']
+            finally:
+                archive.close()
+        with connection.schema_editor() as editor:
+            editor.delete_model(model)
+        dropped_rows += rows
+        dropped.append(table)
+        if progress is not None:
+            progress(dropped_rows, table)
+    return dropped_rows, dropped
@@ -0,0 +1,145 @@
+"""
+Audit log statistics computed with database aggregation and cached per day.
+
+Each calendar day (in the current time zone) of a company - or of all
+companies - is summarised by four ``GROUP BY`` queries over the whole
+window being computed: entries per action type, per user, per IP address
+and per hour of day. No AuditLog row is loaded into Python.
+
+Summaries of finished days are cached in the reports tier under ``audit-stats:{company}:{day}``
+for ``AUDIT_STATS_CACHE_TIMEOUT`` seconds, so a 90-day report run every day
+only aggregates the days it has not seen - normally just today, which is
+never cached because it is still being written to.
+"""
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Count
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from apps.accounts.models import Company
+from lifeline_backend.cache import REPORTS, tier
+
+from .models import AuditLog
+
+HOURS = 24
+
+
+def stats_cache_timeout():
+    return getattr(settings, 'AUDIT_STATS_CACHE_TIMEOUT', 7 * 24 * 3600)
+
+
+def cache_key(company_id, day):
+    return f"audit-stats:{company_id or 'all'}:{day.isoformat()}"
+
+
+def empty_day():
+    return {'total': 0, 'actions': {}, 'users': {}, 'names': {}, 'ips': {}, 'hours': [0] * HOURS}
+
+
+def compute_daily_stats(start_day, end_day, company_id=None):
+    """``{day: summary}`` for every day from ``start_day`` to ``end_day`` inclusive."""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(start_day, time.min), tz)
+    end = timezone.make_aware(datetime.combine(end_day + timedelta(days=1), time.min), tz)
+
+    logs = AuditLog.objects.filter(ActionDate__gte=start, ActionDate__lt=end)
+    if company_id:
+        logs = logs.filter(CompanyID=company_id)
+    logs = logs.annotate(day=TruncDate('ActionDate', tzinfo=tz)).order_by()
+
+    days = {start_day + timedelta(days=offset): empty_day() for offset in range((end_day - start_day).days + 1)}
+
+    for row in logs.values('day', 'ActionType').annotate(count=Count('AuditID')):
+        summary = days[row['day']]
+        summary['actions'][row['ActionType']] = row['count']
+        summary['total'] += row['count']
+
+    users = logs.exclude(UserID__isnull=True).values(
+        'day', 'UserID__username', 'UserID__first_name', 'UserID__last_name'
+    ).annotate(count=Count('AuditID'))
+    for row in users:
+        username = row['UserID__username']
+        summary = days[row['day']]
+        summary['users'][username] = row['count']
+        summary['names'][username] = f"{row['UserID__first_name']} {row['UserID__last_name']}".strip()
+
+    for row in logs.exclude(IPAddress__isnull=True).values('day', 'IPAddress').annotate(count=Count('AuditID')):
+        days[row['day']]['ips'][row['IPAddress']] = row['count']
+
+    hours = logs.annotate(hour=ExtractHour('ActionDate', tzinfo=tz)).values('day', 'hour').annotate(count=Count('AuditID'))
+    for row in hours:
+        days[row['day']]['hours'][row['hour']] = row['count']
+
+    return days
+
+
+def daily_stats(start_day, end_day, company_id=None, today=None):
+    """
+    Per-day summaries for the window, read from the cache where possible.
+
+    Missing days are computed in one pass over the span they cover; finished
+    days are written back to the cache, ``today`` (and later) never is.
+    """
+    today = today or timezone.localdate()
+    all_days = [start_day + timedelta(days=offset) for offset in range((end_day - start_day).days + 1)]
+    keys = {cache_key(company_id, day): day for day in all_days}
+    cache = tier(REPORTS)
+    cached = cache.get_many(list(keys))
+    days = {keys[key]: summary for key, summary in cached.items()}
+
+    missing = [day for day in all_days if day not in days]
+    if missing:
+        computed = compute_daily_stats(missing[0], missing[-1], company_id)
+        finished = {}
+        for day in missing:
+            days[day] = computed[day]
+            if day < today:
+                finished[cache_key(company_id, day)] = computed[day]
+        if finished:
+            cache.set_many(finished, stats_cache_timeout())
+    return [(day, days[day]) for day in all_days]
+
+
+def audit_stats(days_back=30, company_id=None, top=10):
+    """
+    Statistics for the last ``days_back`` days up to and including today.
+
+    Returns totals, the action type breakdown, the ``top`` users and IP
+    addresses, an hour-of-day histogram and the per-day totals.
+    """
+    today = timezone.localdate()
+    per_day = daily_stats(today - timedelta(days=days_back), today, company_id, today=today)
+
+    actions, users, ips = Counter(), Counter(), Counter()
+    names = {}
+    hours = [0] * HOURS
+    for _, summary in per_day:
+        actions.update(summary['actions'])
+        users.update(summary['users'])
+        ips.update(summary['ips'])
+        names.update(summary['names'])
+        hours = [total + count for total, count in zip(hours, summary['hours'])]
+
+    if company_id:
+        company_name = Company.objects.filter(pk=company_id).values_list('CompanyName', flat=True).first() \
+            or f"Company #{company_id}"
+    else:
+        company_name = "All Companies"
+
+    return {
+        'company_id': company_id,
+        'company_name': company_name,
+        'period_days': days_back,
+        'total_logs': sum(summary['total'] for _, summary in per_day),
+        'action_breakdown': [{'action': action, 'count': count} for action, count in actions.most_common()],
+        'top_users': [
+            {'username': username, 'name': names.get(username, ''), 'count': count}
+            for username, count in users.most_common(top)
+        ],
+        'top_ips': [{'ip': ip, 'count': count} for ip, count in ips.most_common(top)],
+        'hourly': hours,
+        'daily': [{'date': day.isoformat(), 'count': summary['total']} for day, summary in per_day],
+    }
@@ -0,0 +1,12 @@
+from celery import shared_task
+
+from .writer import row_to_entry, write_rows, writer_settings
+
+
+@shared_task
+def write_audit_batch(rows):
+    """
+    Insert a batch of serialised AuditLog rows queued by the audit writer.
+    """
+    write_rows([row_to_entry(row) for row in rows], writer_settings()['BATCH_SIZE'])
+    return len(rows)
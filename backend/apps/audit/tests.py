@@ -1,11 +1,37 @@
-from django.test import TestCase, RequestFactory
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import datetime, time, timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
-from django.urls import reverse
+from django.http import HttpResponse
+from django.urls import resolve, reverse
+from django.utils import timezone
 from rest_framework.test import APIClient
-from apps.accounts.models import Company
+from apps.accounts.models import Company, UserCompanyRole
+from lifeline_backend.cache import REPORTS, clear_all, tier
 from .models import AuditLog
 from .utils import log_action
 from .decorators import audit_view, audit_change
+from .writer import AuditLogWriter, entry_to_row
+from . import retention
+from .middleware import AuditLogMiddleware
+from .exporters import export_audit_logs, filtered_audit_logs, iter_audit_rows
+from .stats import audit_stats, cache_key as stats_cache_key
 
 User = get_user_model()
 
@@ -225,3 +251,352 @@ class AuditAPITest(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data['id'], log_id)
+
+
+class AuditLogWriterTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(CompanyName="Writer Co")
+        self.spill_dir = tempfile.mkdtemp()
+        self.writer = AuditLogWriter(
+            batch_size=3, flush_interval=60, spill_path=os.path.join(self.spill_dir, 'spill.ndjson')
+        )
+
+    def tearDown(self):
+        self.writer._stopped.set()
+        self.writer._wakeup.set()
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def _entry(self, description):
+        return AuditLog(CompanyID=self.company, ActionType=AuditLog.VIEW, ActionDescription=description)
+
+    def test_entries_are_buffered_until_flush(self):
+        """Queued entries reach the database in one batch on flush"""
+        for i in range(2):
+            self.writer.submit(self._entry(f"entry {i}"))
+        self.assertEqual(AuditLog.objects.count(), 0)
+        self.assertEqual(self.writer.pending(), 2)
+
+        self.writer.flush()
+        self.assertEqual(AuditLog.objects.count(), 2)
+        self.assertEqual(self.writer.pending(), 0)
+
+    def test_failed_write_spills_to_disk_and_replays(self):
+        """A database outage spills the batch to disk; the next flush replays it"""
+        self.writer.submit(self._entry("during outage"))
+        with mock.patch('apps.audit.writer.write_rows', side_effect=DatabaseError("down")):
+            self.writer.flush()
+        self.assertEqual(AuditLog.objects.count(), 0)
+        self.assertEqual(len(os.listdir(self.spill_dir)), 1)
+
+        self.writer.submit(self._entry("after outage"))
+        self.writer.flush()
+        self.assertEqual(
+            set(AuditLog.objects.values_list('ActionDescription', flat=True)),
+            {"during outage", "after outage"},
+        )
+        self.assertEqual(os.listdir(self.spill_dir), [])
+
+    def test_failed_replay_keeps_entries_spilled_meanwhile(self):
+        """A replay that fails again must not overwrite entries spilled while it ran"""
+        self.writer.submit(self._entry("during outage"))
+        with mock.patch('apps.audit.writer.write_rows', side_effect=DatabaseError("down")):
+            self.writer.flush()
+
+        def spill_then_fail(entries, batch_size):
+            self.writer._spill([entry_to_row(self._entry("overflow"))])
+            raise DatabaseError("still down")
+
+        with mock.patch('apps.audit.writer.write_rows', side_effect=spill_then_fail):
+            self.writer.flush()
+        self.assertEqual(AuditLog.objects.count(), 0)
+
+        self.writer.flush()
+        self.assertEqual(
+            sorted(AuditLog.objects.values_list('ActionDescription', flat=True)), ["during outage", "overflow"]
+        )
+        self.assertEqual(os.listdir(self.spill_dir), [])
+
+    def test_replays_abandoned_by_a_dead_process_are_reclaimed(self):
+        """A .replaying-<pid> file is picked up again once its process is gone"""
+        dead = subprocess.Popen([sys.executable, '-c', ''])
+        dead.wait()
+        row = json.dumps(entry_to_row(self._entry("orphaned"))) + '\n'
+        for name in (f'spill.ndjson.1.replaying-{dead.pid}', f'spill.ndjson.2.replaying-{os.getppid()}'):
+            with open(os.path.join(self.spill_dir, name), 'w', encoding='utf-8') as handle:
+                handle.write(row)
+
+        self.writer.flush()
+        self.assertEqual(list(AuditLog.objects.values_list('ActionDescription', flat=True)), ["orphaned"])
+        # A replay still owned by a live process is left alone
+        self.assertEqual(os.listdir(self.spill_dir), [f'spill.ndjson.2.replaying-{os.getppid()}'])
+
+    def test_close_flushes_pending_entries(self):
+        """Shutdown writes out whatever is still queued"""
+        self.writer.submit(self._entry("last words"))
+        self.writer.close()
+        self.assertTrue(AuditLog.objects.filter(ActionDescription="last words").exists())
+
+
+class AuditLogExportTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(CompanyName="Export Co")
+        self.user = User.objects.create_user(username='exporter', email='exporter@example.com', password='x')
+        AuditLog.objects.bulk_create(
+            AuditLog(CompanyID=self.company, UserID=self.user, ActionType=AuditLog.VIEW,
+                     ActionDescription=f"entry {i}")
+            for i in range(7)
+        )
+        self.export_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.export_dir, ignore_errors=True)
+
+    def test_keyset_batches_cover_every_row_once(self):
+        """Small keyset batches walk the table in AuditID order without repeats"""
+        ids = [row[0] for row in iter_audit_rows(AuditLog.objects.all(), batch_size=3)]
+        self.assertEqual(ids, sorted(AuditLog.objects.values_list('AuditID', flat=True)))
+
+        with self.assertNumQueries(3):
+            resumed = list(iter_audit_rows(AuditLog.objects.all(), batch_size=3, after_id=ids[2]))
+        self.assertEqual([row[0] for row in resumed], ids[3:])
+
+    def test_gzip_csv_and_ndjson_exports(self):
+        """The command writes gzip CSV; the exporter writes NDJSON with the same columns"""
+        csv_path = os.path.join(self.export_dir, 'audit.csv.gz')
+        call_command('export_audit_logs', output=csv_path, batch_size=2, stdout=io.StringIO())
+        with gzip.open(csv_path, 'rt', encoding='utf-8', newline='') as handle:
+            rows = list(csv.DictReader(handle))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[0]['user'], 'exporter')
+        self.assertEqual(rows[0]['company'], 'Export Co')
+
+        ndjson_path = os.path.join(self.export_dir, 'audit.ndjson')
+        count, last_id, _ = export_audit_logs(
+            filtered_audit_logs(company_id=self.company.pk), ndjson_path, 'ndjson', batch_size=4
+        )
+        with open(ndjson_path, encoding='utf-8') as handle:
+            records = [json.loads(line) for line in handle]
+        self.assertEqual(count, 7)
+        self.assertEqual(records[-1]['id'], last_id)
+        self.assertEqual(records[-1]['action_description'], 'entry 6')
+
+
+    def test_resumed_export_appends_to_the_interrupted_file(self):
+        """--after-id appends the remaining rows without a second header; a fresh export never overwrites"""
+        csv_path = os.path.join(self.export_dir, 'audit.csv.gz')
+        ids = list(AuditLog.objects.order_by('AuditID').values_list('AuditID', flat=True))
+        export_audit_logs(AuditLog.objects.filter(AuditID__lte=ids[2]), csv_path)
+
+        with self.assertRaises(CommandError):
+            call_command('export_audit_logs', output=csv_path, stdout=io.StringIO())
+        call_command('export_audit_logs', output=csv_path, after_id=ids[2], stdout=io.StringIO())
+
+        with gzip.open(csv_path, 'rt', encoding='utf-8', newline='') as handle:
+            rows = list(csv.DictReader(handle))
+        self.assertEqual([int(row['id']) for row in rows], ids)
+
+
+class AuditLogRetentionTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(CompanyName="Retention Co")
+        self.now = timezone.now()
+        AuditLog.objects.bulk_create(
+            AuditLog(CompanyID=self.company, ActionType=AuditLog.VIEW, ActionDescription=f"old {i}",
+                     ActionDate=self.now - timedelta(days=120 + i))
+            for i in range(5)
+        )
+        AuditLog.objects.create(CompanyID=self.company, ActionType=AuditLog.VIEW, ActionDescription="recent")
+        self.archive_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.archive_dir, ignore_errors=True)
+
+    def test_prune_deletes_in_batches_and_archives_first(self):
+        """Expired rows are archived to NDJSON.gz and deleted one AuditID range at a time"""
+        batches = []
+        deleted, archive_path = retention.prune_audit_logs(
+            self.now - timedelta(days=90), batch_size=2, archive_dir=self.archive_dir,
+            progress=lambda rows, last_id: batches.append(rows),
+        )
+        self.assertEqual(deleted, 5)
+        self.assertEqual(batches, [2, 4, 5])
+        self.assertEqual(list(AuditLog.objects.values_list('ActionDescription', flat=True)), ["recent"])
+
+        with gzip.open(archive_path, 'rt', encoding='utf-8') as handle:
+            archived = [json.loads(line) for line in handle]
+        self.assertEqual(sorted(row['ActionDescription'] for row in archived), [f"old {i}" for i in range(5)])
+        self.assertEqual(archived[0]['CompanyID_id'], self.company.pk)
+
+    def test_each_batch_is_one_delete_that_spares_unexpired_rows_in_its_range(self):
+        """A batch deletes only the expired rows of its AuditID range, in a single DELETE statement"""
+        self.assertFalse(AuditLog._meta.related_objects)
+        AuditLog.objects.filter(ActionDescription="old 1").update(ActionDate=self.now)
+        with CaptureQueriesContext(connection) as captured:
+            deleted, _ = retention.prune_audit_logs(self.now - timedelta(days=90), batch_size=10)
+        self.assertEqual(deleted, 4)
+        self.assertEqual(
+            sorted(AuditLog.objects.values_list('ActionDescription', flat=True)), ["old 1", "recent"]
+        )
+        deletes = [query['sql'] for query in captured.captured_queries if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 1)
+
+    def test_command_dry_run_deletes_nothing(self):
+        out = io.StringIO()
+        call_command('prune_audit_logs', days=90, dry_run=True, stdout=out)
+        self.assertIn("Would delete 5", out.getvalue())
+        self.assertEqual(AuditLog.objects.count(), 6)
+
+
+class AuditLogPeriodTableTest(TransactionTestCase):
+    def setUp(self):
+        self.company = Company.objects.create(CompanyName="Periods Co")
+        this_month = retention.month_start(timezone.now())
+        self.old_month = retention.add_months(this_month, -6)
+        self.closed_month = retention.add_months(this_month, -2)
+        for month in (self.old_month, self.closed_month, this_month):
+            AuditLog.objects.bulk_create(
+                AuditLog(CompanyID=self.company, ActionType=AuditLog.VIEW, ActionDescription=f"{month:%Y-%m} {i}",
+                         ActionDate=month + timedelta(days=1, hours=i))
+                for i in range(3)
+            )
+
+    def tearDown(self):
+        with connection.schema_editor() as editor:
+            for month in retention.period_tables():
+                editor.delete_model(retention.period_model(month))
+
+    def test_closed_months_move_to_period_tables_and_expire_by_drop(self):
+        """Rotation empties closed months from the live table; expiry drops whole period tables"""
+        moved = retention.rotate_into_period_tables(retention.month_start(timezone.now()), batch_size=2)
+        self.assertEqual(moved, 6)
+        self.assertEqual(AuditLog.objects.count(), 3)
+        self.assertEqual(list(retention.period_tables()), [self.old_month, self.closed_month])
+        self.assertEqual(retention.period_model(self.closed_month).objects.count(), 3)
+
+        rows, tables = retention.drop_period_tables(retention.add_months(self.old_month, 2))
+        self.assertEqual((rows, tables), (3, [retention.period_table_name(self.old_month)]))
+        self.assertEqual(list(retention.period_tables()), [self.closed_month])
+
+
+class AuditStatsTest(TestCase):
+    def setUp(self):
+        clear_all()
+        self.company = Company.objects.create(CompanyName="Stats Co")
+        self.user = User.objects.create_user(username='analyst', first_name='Ana', last_name='Lyst', password='x')
+        today = timezone.localdate()
+        entries = []
+        for days_ago, hour, action, ip in [(0, 9, AuditLog.VIEW, '10.0.0.1'), (1, 9, AuditLog.VIEW, '10.0.0.1'),
+                                           (1, 14, AuditLog.UPDATE, '10.0.0.2'), (3, 14, AuditLog.LOGIN, None)]:
+            when = timezone.make_aware(datetime.combine(today - timedelta(days=days_ago), time(hour, 30)))
+            entries.append(AuditLog(CompanyID=self.company, UserID=self.user, ActionType=action,
+                                    ActionDescription="stat", IPAddress=ip, ActionDate=when))
+        AuditLog.objects.bulk_create(entries)
+
+    def test_stats_are_aggregated_in_the_database(self):
+        """Breakdowns, top lists and the hour histogram come from GROUP BY queries"""
+        with self.assertNumQueries(5):
+            report = audit_stats(7, self.company.pk)
+        self.assertEqual(report['total_logs'], 4)
+        self.assertEqual(report['action_breakdown'][0], {'action': AuditLog.VIEW, 'count': 2})
+        self.assertEqual(report['top_users'], [{'username': 'analyst', 'name': 'Ana Lyst', 'count': 4}])
+        self.assertEqual(report['top_ips'][0], {'ip': '10.0.0.1', 'count': 2})
+        self.assertEqual((report['hourly'][9], report['hourly'][14]), (2, 2))
+
+    def test_finished_days_are_served_from_the_cache(self):
+        """A repeated run only aggregates today"""
+        audit_stats(7, self.company.pk)
+        today = timezone.localdate()
+        self.assertIsNotNone(tier(REPORTS).get(stats_cache_key(self.company.pk, today - timedelta(days=1))))
+        self.assertIsNone(tier(REPORTS).get(stats_cache_key(self.company.pk, today)))
+
+        AuditLog.objects.filter(ActionType=AuditLog.LOGIN).delete()
+        with CaptureQueriesContext(connection) as ctx:
+            report = audit_stats(7, self.company.pk)
+        self.assertEqual(len(ctx.captured_queries), 5)
+        self.assertEqual(report['total_logs'], 4)
+        self.assertEqual(report['daily'][-1]['count'], 1)
+
+        out = io.StringIO()
+        call_command('audit_stats', days=7, company=self.company.pk, stdout=out)
+        self.assertIn("Total audit log entries: 4", out.getvalue())
+
+
+class AuditLogMiddlewareTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(CompanyName="Middleware Co")
+        self.other = Company.objects.create(CompanyName="Other Co")
+        self.user = User.objects.create_user(username='clerk', password='x')
+        UserCompanyRole.objects.create(UserID=self.user, CompanyID=self.company, Role='owner')
+        UserCompanyRole.objects.create(UserID=self.user, CompanyID=self.other, Role='owner')
+        self.factory = RequestFactory()
+        self.middleware = AuditLogMiddleware(self._view)
+
+    def _view(self, request):
+        request.resolver_match = resolve(request.path_info)
+        return HttpResponse(status=201 if request.method == 'POST' else 200)
+
+    def _request(self, path, body=None):
+        """A GET, or a JSON POST when ``body`` is given."""
+        if body is None:
+            request = self.factory.get(path)
+        else:
+            request = self.factory.post(path, data=json.dumps(body), content_type='application/json')
+        request.user = self.user
+        return request
+
+    def test_routes_are_classified_once_from_the_resolver(self):
+        """Policies come from the URLconf: excluded prefixes, auth endpoints and list views"""
+        policies = self.middleware.classifier.policies
+        self.assertFalse(policies['admin/'].audit)
+        self.assertTrue(policies['accounts/auth/login/'].login)
+        self.assertTrue(policies['accounts/auth/logout/'].logout)
+        self.assertTrue(policies[resolve(reverse('generalledger-list')).route].list_view)
+
+    def test_body_is_parsed_only_for_logged_requests(self):
+        """A logged POST takes its company from the JSON body; an unlogged list GET never parses"""
+        listing = self._request(reverse('generalledger-list'))
+        self.middleware(listing)
+        self.assertFalse(hasattr(listing, '_body_data'))
+        self.assertFalse(AuditLog.objects.exists())
+
+        create = self._request(reverse('generalledger-list'), {'company': self.other.pk})
+        self.middleware(create)
+        entry = AuditLog.objects.get()
+        self.assertEqual((entry.ActionType, entry.CompanyID_id), (AuditLog.CREATE, self.other.pk))
+
+
+class AuditLogMiddlewareAsyncTest(TransactionTestCase):
+    def setUp(self):
+        self.company = Company.objects.create(CompanyName="Async Co")
+        self.user = User.objects.create_user(username='async-clerk', password='x')
+        UserCompanyRole.objects.create(UserID=self.user, CompanyID=self.company, Role='owner')
+
+    def test_async_requests_are_logged_off_the_event_loop(self):
+        """Under ASGI the middleware is a coroutine and writes the entry from a worker thread"""
+        loop_thread = []
+
+        async def view(request):
+            loop_thread.append(threading.get_ident())
+            request.resolver_match = resolve(request.path_info)
+            return HttpResponse(status=201)
+
+        middleware = AuditLogMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+
+        request = AsyncRequestFactory().post(
+            reverse('generalledger-list'), data={'company': self.company.pk}, content_type='application/json'
+        )
+        request.user = self.user
+        writer_thread = []
+        original = middleware._log_request
+
+        def log_request(*args):
+            writer_thread.append(threading.get_ident())
+            return original(*args)
+
+        middleware._log_request = log_request
+        response = async_to_sync(middleware)(request)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertNotEqual(writer_thread, loop_thread)
+        self.assertEqual(AuditLog.objects.get().ActionType, AuditLog.CREATE)
@@ -1,5 +1,12 @@
+import json
+
 from django.contrib.contenttypes.models import ContentType
+from django.http.request import RawPostDataException
+from django.core.cache import cache
+from apps.accounts.company_scope import get_company_scope
+from apps.accounts.models import Company
 from .models import AuditLog
+from . import writer
 
 
 def get_client_ip(request):
@@ -58,13 +65,73 @@ def get_client_ip(request):
     return ip, is_routable
 
 
+DEFAULT_COMPANY_CACHE_KEY = 'audit:default-company-id'
+
+
+def _default_company_id():
+    """The lowest company ID, cached; used for requests without a company."""
+    return cache.get_or_set(
+        DEFAULT_COMPANY_CACHE_KEY,
+        lambda: Company.objects.order_by('pk').values_list('pk', flat=True).first(),
+        300,
+    )
+
+
+def request_body_data(request):
+    """
+    The JSON body of ``request``, parsed on first use and cached on the request.
+
+    Returns None for non-JSON, empty or malformed bodies, and when the body
+    stream was consumed before it was buffered.
+    """
+    if not hasattr(request, '_body_data'):
+        data = None
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body) if request.body else None
+            except (ValueError, RawPostDataException):
+                data = None
+        request._body_data = data
+    return request._body_data
+
+
+def resolve_company_id(request):
+    """
+    Determine the company ID an audited request belongs to.
+
+    Uses the company named by the request (body or query ``company`` /
+    ``CompanyID``, or the ``X-Company-ID`` header) when the user has access to
+    it, then the user's first company (from the cached company scope), and
+    finally the default company. Never loads Company rows.
+    """
+    body = request_body_data(request)
+    body = body if isinstance(body, dict) else {}
+    requested = (
+        body.get('company')
+        or body.get('CompanyID')
+        or request.GET.get('company')
+        or request.GET.get('CompanyID')
+        or request.headers.get('X-Company-ID')
+    )
+
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        scope = get_company_scope(request)
+        if requested and scope.has_access(requested):
+            return int(requested)
+        if scope.allowed_company_ids:
+            return scope.allowed_company_ids[0]
+
+    return _default_company_id()
+
+
 def log_action(request, company, action_type, action_description, obj=None, data_before=None, data_after=None, details=None):
     """
     Log an action performed by a user or system.
     
     Args:
         request: The Django request object (can be None for system actions)
-        company: The company instance this action belongs to
+        company: The company instance (or its ID) this action belongs to
         action_type: Type of action (see AuditLog.ACTION_CHOICES)
         action_description: Description of the action
         obj: The object that was affected (optional)
@@ -73,17 +140,23 @@ def log_action(request, company, action_type, action_description, obj=None, data
         details: Additional textual details about the action (optional)
     
     Returns:
-        The created AuditLog instance
+        The AuditLog instance. When the buffered writer is enabled
+        (settings.AUDIT_LOG_WRITER) it is queued for a batched insert and
+        has no primary key yet.
     """
     # Initialize audit log data
     audit_data = {
-        'CompanyID': company,
         'ActionType': action_type,
         'ActionDescription': action_description,
         'Details': details,
         'DataBefore': data_before,
         'DataAfter': data_after,
     }
+    # Accept a primary key so callers need not load the Company row
+    if isinstance(company, Company):
+        audit_data['CompanyID'] = company
+    else:
+        audit_data['CompanyID_id'] = company
     
     # Set user information if a request was provided
     if request:
@@ -104,8 +177,8 @@ def log_action(request, company, action_type, action_description, obj=None, data
         audit_data['ContentType'] = ContentType.objects.get_for_model(obj)
         audit_data['ObjectID'] = str(obj.pk)
     
-    # Create and return the audit log entry
-    return AuditLog.objects.create(**audit_data)
+    # Queue (or save) and return the audit log entry
+    return writer.submit(AuditLog(**audit_data))
 
 
 def get_object_changes(old_instance, new_instance, exclude_fields=None):
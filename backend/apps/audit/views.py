@@ -3,10 +3,22 @@ from django.contrib.contenttypes.models import ContentType
 from django.db.models import Q
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
+from apps.accounts.company_scope import allowed_company_ids
+from lifeline_backend.pagination import AuditLogPagination
 from .models import AuditLog
 from .serializers import AuditLogSerializer, AuditLogDetailSerializer
 
 
+def _audit_logs_for(user):
+    """
+    Superusers see all logs; everyone else the logs of their companies.
+    """
+    queryset = AuditLog.objects.select_related('UserID', 'ContentType')
+    if user.is_superuser:
+        return queryset
+    return queryset.filter(CompanyID__in=allowed_company_ids(user))
+
+
 class AuditLogPermission(permissions.BasePermission):
     """
     Custom permission to allow only company admins and superusers to view audit logs.
@@ -33,32 +45,20 @@ class AuditLogListView(generics.ListAPIView):
     """
     serializer_class = AuditLogSerializer
     permission_classes = [AuditLogPermission]
+    # Unpaginated unless ?cursor= / ?pagination=keyset is passed; keyset pages
+    # always run newest first, so ?ordering only applies without them
+    pagination_class = AuditLogPagination
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['action_type', 'user', 'company']
-    search_fields = ['action_description', 'details', 'user__username', 'user__email', 'ip_address']
-    ordering_fields = ['timestamp', 'user__username', 'action_type']
-    ordering = ['-timestamp']
+    filterset_fields = ['ActionType', 'UserID', 'CompanyID']
+    search_fields = ['ActionDescription', 'Details', 'UserID__username', 'UserID__email', 'IPAddress']
+    ordering_fields = ['ActionDate', 'UserID__username', 'ActionType']
+    ordering = ['-ActionDate', '-AuditID']
     
     def get_queryset(self):
         """
         Filter logs based on the user's access.
         """
-        user = self.request.user
-        
-        # Superusers see all logs
-        if user.is_superuser:
-            return AuditLog.objects.all()
-            
-        # Company admins see only their company's logs
-        if hasattr(user, 'company') and user.company:
-            return AuditLog.objects.filter(company=user.company)
-            
-        # Active company if multi-company user
-        if hasattr(user, 'active_company') and user.active_company:
-            return AuditLog.objects.filter(company=user.active_company)
-            
-        # Fallback - no logs
-        return AuditLog.objects.none()
+        return _audit_logs_for(self.request.user)
         
     def filter_queryset(self, queryset):
         """
@@ -76,7 +76,7 @@ class AuditLogListView(generics.ListAPIView):
                     model=content_type_model,
                     app_label=content_type_app
                 )
-                queryset = queryset.filter(content_type=content_type)
+                queryset = queryset.filter(ContentType=content_type)
             except ContentType.DoesNotExist:
                 pass
         
@@ -85,9 +85,9 @@ class AuditLogListView(generics.ListAPIView):
         end_date = self.request.query_params.get('end_date')
         
         if start_date:
-            queryset = queryset.filter(timestamp__gte=start_date)
+            queryset = queryset.filter(ActionDate__gte=start_date)
         if end_date:
-            queryset = queryset.filter(timestamp__lte=end_date)
+            queryset = queryset.filter(ActionDate__lte=end_date)
         
         return queryset
 
@@ -103,19 +103,4 @@ class AuditLogDetailView(generics.RetrieveAPIView):
         """
         Filter logs based on the user's access.
         """
-        user = self.request.user
-        
-        # Superusers see all logs
-        if user.is_superuser:
-            return AuditLog.objects.all()
-            
-        # Company admins see only their company's logs
-        if hasattr(user, 'company') and user.company:
-            return AuditLog.objects.filter(company=user.company)
-            
-        # Active company if multi-company user
-        if hasattr(user, 'active_company') and user.active_company:
-            return AuditLog.objects.filter(company=user.active_company)
-            
-        # Fallback - no logs
-        return AuditLog.objects.none()
+        return _audit_logs_for(self.request.user)
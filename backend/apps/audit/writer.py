@@ -0,0 +1,310 @@
+"""
+Buffered, batched writer for AuditLog rows.
+
+``log_action`` used to run ``AuditLog.objects.create`` inside every audited
+request. With the writer enabled, entries are queued in-process and a
+background thread flushes them with ``bulk_create`` whenever ``BATCH_SIZE``
+entries are waiting or ``FLUSH_INTERVAL`` seconds have passed. With the
+``celery`` backend the batch is handed to ``apps.audit.tasks.write_audit_batch``
+instead, falling back to a direct insert if the broker is unreachable.
+
+Nothing is lost on shutdown: the queue is flushed from an ``atexit`` hook.
+When the database cannot be reached, batches are appended to a per-process
+NDJSON spill file (``SPILL_PATH.<pid>``) and replayed by the next successful
+flush in any process. A replaying process renames the file it works on to
+``.replaying-<pid>``; if it dies midway, the next flush reclaims the file.
+
+Configured through ``settings.AUDIT_LOG_WRITER``; see ``DEFAULTS``.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, IntegrityError, close_old_connections, transaction
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,          # False writes every entry synchronously
+    'BACKEND': 'thread',      # 'thread' (bulk_create in-process) or 'celery'
+    'BATCH_SIZE': 200,        # flush as soon as this many entries are queued
+    'FLUSH_INTERVAL': 2.0,    # ... or after this many seconds
+    'MAX_QUEUE': 10000,       # beyond this, entries go straight to the spill file
+    'SPILL_PATH': os.path.join(settings.BASE_DIR, 'logs', 'audit_spill.ndjson'),
+}
+
+
+def writer_settings():
+    return {**DEFAULTS, **getattr(settings, 'AUDIT_LOG_WRITER', {})}
+
+
+def entry_to_row(entry):
+    """Serialise an unsaved AuditLog to a JSON-safe dict of column values."""
+    row = {
+        field.attname: getattr(entry, field.attname)
+        for field in entry._meta.concrete_fields
+        if not field.primary_key
+    }
+    return json.loads(json.dumps(row, cls=DjangoJSONEncoder))
+
+
+def row_to_entry(row):
+    """Rebuild an unsaved AuditLog from ``entry_to_row`` output."""
+    from .models import AuditLog
+
+    row = dict(row)
+    if isinstance(row.get('ActionDate'), str):
+        row['ActionDate'] = parse_datetime(row['ActionDate'])
+    return AuditLog(**row)
+
+
+def write_rows(entries, batch_size):
+    """Insert AuditLog instances with ``bulk_create``."""
+    from .models import AuditLog
+
+    AuditLog.objects.bulk_create(entries, batch_size=batch_size)
+
+
+class AuditLogWriter:
+    """In-process queue of AuditLog entries flushed in batches by a daemon thread."""
+
+    def __init__(self, batch_size=200, flush_interval=2.0, max_queue=10000, spill_path=None, backend='thread'):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.spill_path = spill_path
+        self.backend = backend
+        self._queue = deque()
+        self._queue_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    # --- producer side -------------------------------------------------------
+
+    def submit(self, entry):
+        """Queue an unsaved AuditLog; never blocks on the database."""
+        self._ensure_thread()
+        with self._queue_lock:
+            if len(self._queue) >= self.max_queue:
+                overflow = True
+            else:
+                overflow = False
+                self._queue.append(entry)
+                pending = len(self._queue)
+        if overflow:
+            self._spill([entry_to_row(entry)])
+        elif pending >= self.batch_size:
+            self._wakeup.set()
+
+    def pending(self):
+        with self._queue_lock:
+            return len(self._queue)
+
+    # --- consumer side -------------------------------------------------------
+
+    def flush(self):
+        """Write everything queued so far. Returns the number of entries handled."""
+        handled = 0
+        with self._flush_lock:
+            while True:
+                with self._queue_lock:
+                    batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                if not batch:
+                    break
+                handled += len(batch)
+                if not self._write(batch):
+                    # Database is down: spill what is left too rather than retrying in a loop
+                    with self._queue_lock:
+                        rest = list(self._queue)
+                        self._queue.clear()
+                    self._spill([entry_to_row(entry) for entry in rest])
+                    return handled + len(rest)
+            self._replay_spill()
+        return handled
+
+    def close(self):
+        """Stop the flush thread and write out anything still queued."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=max(self.flush_interval * 2, 5))
+        self.flush()
+
+    def _write(self, batch):
+        if self.backend == 'celery':
+            try:
+                from .tasks import write_audit_batch
+
+                write_audit_batch.delay([entry_to_row(entry) for entry in batch])
+                return True
+            except Exception:
+                logger.warning("Audit batch could not be queued on Celery; writing directly", exc_info=True)
+        try:
+            write_rows(batch, self.batch_size)
+            return True
+        except IntegrityError:
+            # One bad row (e.g. a deleted company) must not poison the whole batch
+            close_old_connections()
+            self._write_each(batch)
+            return True
+        except DatabaseError:
+            logger.error("Audit log database write failed; spilling %d entries to disk", len(batch), exc_info=True)
+            self._spill([entry_to_row(entry) for entry in batch])
+            close_old_connections()
+            return False
+
+    def _write_each(self, batch):
+        for entry in batch:
+            try:
+                with transaction.atomic():
+                    write_rows([entry], 1)
+            except IntegrityError:
+                logger.error("Dropping audit entry that violates a constraint: %s", entry_to_row(entry))
+
+    # --- spill file ------------------------------------------------------------
+
+    def _spill(self, rows):
+        if not rows or not self.spill_path:
+            if rows:
+                logger.error("Dropping %d audit entries: no AUDIT_LOG_WRITER SPILL_PATH configured", len(rows))
+            return
+        self._append_spill([json.dumps(row) + '\n' for row in rows])
+
+    def _append_spill(self, lines):
+        os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+        # submit() spills without holding _flush_lock; appends never overwrite each other
+        with self._spill_lock, open(f"{self.spill_path}.{os.getpid()}", 'a', encoding='utf-8') as handle:
+            handle.writelines(lines)
+
+    def _claimable_spills(self):
+        """
+        Spill files ready for replay: every process's spill file, plus files a
+        process was replaying when it died (``.replaying-<pid>`` of a dead pid).
+        """
+        for path in glob.glob(f"{self.spill_path}.*"):
+            base, replaying, owner = path.rpartition('.replaying-')
+            if not replaying:
+                yield path, f"{path}.replaying-{os.getpid()}"
+            elif owner.isdigit() and not _pid_alive(int(owner)):
+                yield path, f"{base}.replaying-{os.getpid()}"
+
+    def _replay_spill(self):
+        if not self.spill_path:
+            return
+        for path, claimed in self._claimable_spills():
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue  # another process claimed it first
+            with open(claimed, encoding='utf-8') as handle:
+                lines = [line for line in handle if line.strip()]
+            entries = [row_to_entry(json.loads(line)) for line in lines]
+            try:
+                write_rows(entries, self.batch_size)
+            except IntegrityError:
+                close_old_connections()
+                self._write_each(entries)
+            except DatabaseError:
+                # Append rather than rename back: this process may have spilled to its own file meanwhile
+                self._append_spill(lines)
+                os.remove(claimed)
+                close_old_connections()
+                return
+            os.remove(claimed)
+            logger.info("Replayed %d spilled audit entries from %s", len(entries), path)
+
+    # --- background thread --------------------------------------------------------
+
+    def _ensure_thread(self):
+        # Threads do not survive fork(); restart in each worker process
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._queue_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Unexpected error flushing audit log entries")
+            finally:
+                close_old_connections()
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        # Replays run under _flush_lock, so a file claimed under our own pid is left over from a dead process
+        return False
+    if os.name == 'nt':
+        return True  # os.kill() would terminate the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by another user
+    return True
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Return the process-wide writer, or None when buffering is disabled."""
+    global _writer
+    config = writer_settings()
+    if not config['ENABLED']:
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditLogWriter(
+                    batch_size=config['BATCH_SIZE'],
+                    flush_interval=config['FLUSH_INTERVAL'],
+                    max_queue=config['MAX_QUEUE'],
+                    spill_path=config['SPILL_PATH'],
+                    backend=config['BACKEND'],
+                )
+                atexit.register(_writer.close)
+    return _writer
+
+
+def submit(entry):
+    """
+    Record an unsaved AuditLog entry.
+
+    Buffers it when the writer is enabled, otherwise saves it immediately.
+    Returns the entry (without a primary key when buffered).
+    """
+    writer = get_writer()
+    if writer is None:
+        entry.save()
+    else:
+        writer.submit(entry)
+    return entry
+
+
+def flush():
+    """Flush the process-wide writer, if any (tests, management commands)."""
+    if _writer is not None:
+        _writer.flush()
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-18 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0002_alter_bankaccount_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bankstatementline',
+            index=models.Index(fields=['BankAccountID', '-TransactionDate', '-BankStatementLineID'], name='bsl_account_date_idx'),
+        ),
+    ]
@@ -43,6 +43,13 @@ class BankStatementLine(models.Model):
         db_table = 'BankStatementLines'
         verbose_name = "Bank Statement Line"
         verbose_name_plural = "Bank Statement Lines"
+        indexes = [
+            # BankStatementLineViewSet: lines of an account, newest first
+            models.Index(
+                fields=['BankAccountID', '-TransactionDate', '-BankStatementLineID'],
+                name='bsl_account_date_idx',
+            ),
+        ]
 
 class ReconciliationEntry(models.Model):
     ReconciliationEntryID = models.AutoField(primary_key=True, verbose_name="Reconciliation Entry ID")
@@ -2,6 +2,9 @@ from django.db.models import Q
 from django.utils.dateparse import parse_date
 from rest_framework import permissions, viewsets
 
+from apps.accounts.company_scope import get_company_scope
+from lifeline_backend.pagination import BankStatementLinePagination
+
 from .models import BankAccount, BankStatementLine, ReconciliationEntry
 from .serializers import (
     BankAccountSerializer,
@@ -27,7 +30,7 @@ class CompanyScopedViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def _allowed_company_ids(self):
-        return list(self.request.user.companies.values_list('CompanyID', flat=True))
+        return get_company_scope(self.request).allowed_company_ids
 
     def _active_company_id(self):
         header_value = self.request.headers.get('X-Company-ID')
@@ -74,6 +77,8 @@ class BankAccountViewSet(CompanyScopedViewSet):
 
 class BankStatementLineViewSet(CompanyScopedViewSet):
     serializer_class = BankStatementLineSerializer
+    # Unpaginated unless ?cursor= / ?pagination=keyset is passed
+    pagination_class = BankStatementLinePagination
 
     def get_queryset(self):
         allowed_company_ids = self._allowed_company_ids()
@@ -11,7 +11,7 @@ class BillViewSet(viewsets.ModelViewSet):
         Filter bills by user's companies
         """
         user = self.request.user
-        return Bill.objects.filter(CompanyID__usercompanyrole__UserID=user)
+        return Bill.objects.filter(CompanyID__usercompanyrole__UserID=user).select_related('VendorID')
 
     def perform_create(self, serializer):
         """
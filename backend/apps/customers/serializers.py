@@ -1,11 +1,8 @@
 from rest_framework import serializers
-from apps.accounts.models import Company
 from .models import Customer
 
 
 class CustomerSerializer(serializers.ModelSerializer):
-    CompanyID = serializers.PrimaryKeyRelatedField(queryset=Company.objects.all())
-
     class Meta:
         model = Customer
         fields = [
@@ -19,4 +16,4 @@ class CustomerSerializer(serializers.ModelSerializer):
             'CustomerNotes',
             'CreatedDate',
         ]
-        read_only_fields = ['CustomerID', 'CreatedDate']
\ No newline at end of file
+        read_only_fields = ['CustomerID', 'CompanyID', 'CreatedDate']
\ No newline at end of file
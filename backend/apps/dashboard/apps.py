@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class DashboardConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.dashboard'
+
+    def ready(self):
+        # Drop cached dashboard figures when ledger entries change
+        import apps.dashboard.signals  # noqa: F401
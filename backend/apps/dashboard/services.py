@@ -0,0 +1,241 @@
+"""
+Pre-aggregated figures behind the accounts dashboard endpoints.
+
+``dashboard_metrics``, ``dashboard_financial_health`` and ``dashboard_charts``
+used to run their own ledger aggregates on every page load (the charts view
+one query per month and per expense account). ``company_figures`` computes
+everything they need for a company with two grouped queries - one ledger pass
+from the earliest window start (the start of the year or six months back)
+with a conditional sum per window, and the all-time balances from the
+snapshot table - and caches the result in the reports cache tier for
+``DASHBOARD_CACHE_TIMEOUT`` seconds. The scalar KPIs are also written to
+``DashboardMetric`` so ``/api/dashboard/metrics/`` serves the same numbers.
+
+The cached figures are dropped by ``apps.dashboard.signals`` whenever a
+GeneralLedger row of the company is saved or deleted. Bulk writes that skip
+model signals should call ``invalidate_dashboard`` themselves.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.reports import engine
+from lifeline_backend.cache import REPORTS, tier
+
+from .models import DashboardMetric
+
+CACHE_KEY = 'dashboard:{company_id}'
+TREND_MONTHS = 6
+
+
+def _cache_timeout():
+    return getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+
+
+def cache_key(company_id):
+    return CACHE_KEY.format(company_id=company_id)
+
+
+def invalidate_dashboard(*company_ids):
+    """Drop the cached dashboard figures of the given companies."""
+    tier(REPORTS).delete_many([cache_key(company_id) for company_id in company_ids if company_id is not None])
+
+
+def _month_start(moment, months_back=0):
+    month_index = moment.year * 12 + moment.month - 1 - months_back
+    return moment.replace(year=month_index // 12, month=month_index % 12 + 1, day=1)
+
+
+def dashboard_windows(now=None):
+    """
+    Return ``(windows, trend)`` for the local date of ``now``.
+
+    ``windows`` maps a name to a ``(start, end)`` range (``end`` exclusive,
+    None for open-ended); ``trend`` lists the ``(start, end)`` of the last
+    ``TREND_MONTHS`` calendar months, oldest first.
+    """
+    now = timezone.localtime(now)
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    month_start = today_start.replace(day=1)
+    year_start = month_start.replace(month=1)
+    windows = {
+        'current_month': (month_start, today_start),
+        'month_to_date': (month_start, None),
+        'last_month': (_month_start(month_start, 1), month_start),
+        'year_to_date': (year_start, today_start),
+        'year_to_now': (year_start, None),
+    }
+    trend = [
+        (_month_start(month_start, back), _month_start(month_start, back - 1))
+        for back in range(TREND_MONTHS - 1, -1, -1)
+    ]
+    return windows, trend
+
+
+def _window_sum(column, start, end):
+    condition = Q(TransactionDate__gte=start)
+    if end is not None:
+        condition &= Q(TransactionDate__lt=end)
+    return Coalesce(
+        Sum(column, filter=condition),
+        Value(engine.ZERO, output_field=DecimalField(max_digits=18, decimal_places=2)),
+    )
+
+
+def compute_company_figures(company_id, now=None):
+    """
+    Aggregate the dashboard figures of one company (two grouped queries).
+
+    Returns a dict with ``windows`` (``{window: {AccountType: AccountBalance}}``,
+    including an ``all_time`` window), ``revenue_trend`` (net revenue per
+    trend month) and ``expense_accounts`` (``[(AccountName, amount)]`` for the
+    month to date).
+    """
+    windows, trend = dashboard_windows(now)
+    ranges = dict(windows)
+    ranges.update({f'month_{index}': bounds for index, bounds in enumerate(trend)})
+    earliest = min(start for start, _ in ranges.values())
+
+    sums = {}
+    for name, (start, end) in ranges.items():
+        sums[f'{name}_debit'] = _window_sum('DebitAmount', start, end)
+        sums[f'{name}_credit'] = _window_sum('CreditAmount', start, end)
+    rows = (
+        engine.ledger_entries(company_id, start_date=earliest)
+        .order_by()
+        .values('AccountID', 'AccountID__AccountType', 'AccountID__AccountName')
+        .annotate(**sums)
+    )
+
+    by_type = {name: {} for name in windows}
+    revenue_trend = [engine.ZERO] * len(trend)
+    expense_accounts = []
+    for row in rows:
+        account_type = row['AccountID__AccountType']
+        lowered = (account_type or '').lower()
+        for name in windows:
+            balance = engine.AccountBalance(row[f'{name}_debit'], row[f'{name}_credit'])
+            by_type[name][account_type] = by_type[name].get(account_type, engine.EMPTY_BALANCE) + balance
+        if 'revenue' in lowered:
+            for index in range(len(trend)):
+                revenue_trend[index] += row[f'month_{index}_credit'] - row[f'month_{index}_debit']
+        if 'expense' in lowered:
+            expense_accounts.append(
+                (row['AccountID__AccountName'], row['month_to_date_debit'] - row['month_to_date_credit'])
+            )
+
+    by_type['all_time'] = engine.account_type_balances(company_id)
+    return {
+        'day': timezone.localdate(now),
+        'trend_months': [start.date() for start, _ in trend],
+        'windows': by_type,
+        'revenue_trend': revenue_trend,
+        'expense_accounts': expense_accounts,
+    }
+
+
+def sum_account_types(type_balances, keyword):
+    """
+    Add up the balances of every account type containing ``keyword`` (case-insensitive).
+    Mirrors the ``AccountType__icontains`` filters the dashboard has always used.
+    """
+    total = engine.EMPTY_BALANCE
+    for account_type, balance in type_balances.items():
+        if keyword in (account_type or '').lower():
+            total = total + balance
+    return total
+
+
+def kpi_values(figures):
+    """The scalar KPIs stored in DashboardMetric, as ``{Name: Decimal}``."""
+    windows = figures['windows']
+    revenue = {name: sum_account_types(windows[name], 'revenue') for name in ('current_month', 'last_month', 'year_to_now')}
+    expenses = {name: sum_account_types(windows[name], 'expense') for name in ('current_month', 'last_month', 'year_to_now')}
+    ytd = sum_account_types(windows['year_to_date'], '')
+    assets = sum_account_types(windows['all_time'], 'asset')
+    liabilities = sum_account_types(windows['all_time'], 'liability')
+    return {
+        'revenue_current_month': revenue['current_month'].credit - revenue['current_month'].debit,
+        'revenue_last_month': revenue['last_month'].credit - revenue['last_month'].debit,
+        'expenses_current_month': expenses['current_month'].debit - expenses['current_month'].credit,
+        'expenses_last_month': expenses['last_month'].debit - expenses['last_month'].credit,
+        'revenue_ytd': revenue['year_to_now'].credit,
+        'expenses_ytd': expenses['year_to_now'].debit,
+        'cash_flow_ytd': ytd.debit - ytd.credit,
+        'total_assets': assets.debit - assets.credit,
+        'total_liabilities': liabilities.credit - liabilities.debit,
+    }
+
+
+def store_metrics(company_id, figures):
+    """Upsert the company's KPI rows in DashboardMetric."""
+    values = kpi_values(figures)
+    existing = {metric.Name: metric for metric in DashboardMetric.objects.filter(CompanyID_id=company_id)}
+    creates, updates = [], []
+    for name, value in values.items():
+        value = Decimal(value).quantize(Decimal('0.01'))
+        metric = existing.get(name)
+        if metric is None:
+            creates.append(DashboardMetric(CompanyID_id=company_id, Name=name, Value=value))
+        elif metric.Value != value:
+            metric.Value = value
+            metric.UpdatedDate = timezone.now()
+            updates.append(metric)
+    if creates:
+        DashboardMetric.objects.bulk_create(creates)
+    if updates:
+        DashboardMetric.objects.bulk_update(updates, ['Value', 'UpdatedDate'])
+
+
+def _is_fresh(figures, now):
+    # Windows are relative to the local date, so figures expire at midnight too
+    return figures is not None and figures['day'] == timezone.localdate(now)
+
+
+def refresh_company_figures(company_id, now=None):
+    """Recompute, store and cache the figures of a company."""
+    figures = compute_company_figures(company_id, now)
+    store_metrics(company_id, figures)
+    tier(REPORTS).set(cache_key(company_id), figures, _cache_timeout())
+    return figures
+
+
+def company_figures(company_id, now=None):
+    """Return the cached figures of a company, recomputing them when stale."""
+    figures = tier(REPORTS).get(cache_key(company_id))
+    if not _is_fresh(figures, now):
+        figures = refresh_company_figures(company_id, now)
+    return figures
+
+
+def dashboard_figures(company_ids, now=None):
+    """
+    Combine the figures of several companies (a user's dashboard).
+
+    Balances and trend values are summed across companies; expense accounts
+    are listed per company.
+    """
+    windows, trend = dashboard_windows(now)
+    combined = {
+        'trend_months': [start.date() for start, _ in trend],
+        'windows': {name: {} for name in list(windows) + ['all_time']},
+        'revenue_trend': [engine.ZERO] * len(trend),
+        'expense_accounts': [],
+    }
+    cached = tier(REPORTS).get_many([cache_key(company_id) for company_id in company_ids])
+    for company_id in company_ids:
+        figures = cached.get(cache_key(company_id))
+        if not _is_fresh(figures, now):
+            figures = refresh_company_figures(company_id, now)
+        for name, type_balances in figures['windows'].items():
+            merged = combined['windows'][name]
+            for account_type, balance in type_balances.items():
+                merged[account_type] = merged.get(account_type, engine.EMPTY_BALANCE) + balance
+        combined['revenue_trend'] = [
+            total + value for total, value in zip(combined['revenue_trend'], figures['revenue_trend'])
+        ]
+        combined['expense_accounts'].extend(figures['expense_accounts'])
+    return combined
@@ -0,0 +1,21 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.accounting.models import GeneralLedger
+
+from .services import invalidate_dashboard
+
+
+@receiver(post_save, sender=GeneralLedger)
+@receiver(post_delete, sender=GeneralLedger)
+def invalidate_dashboard_on_ledger_change(sender, instance, raw=False, **kwargs):
+    """
+    A ledger entry of the company changed; drop its cached dashboard figures
+    once the transaction commits, so a concurrent load cannot re-cache the old
+    totals in between.
+    """
+    if raw:
+        return
+    company_id = instance.CompanyID_id
+    transaction.on_commit(lambda: invalidate_dashboard(company_id))
@@ -0,0 +1,112 @@
+from datetime import datetime
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+
+from apps.accounting.models import ChartOfAccount, GeneralLedger
+from apps.accounts.models import Company, User, UserCompanyRole
+from lifeline_backend.cache import clear_all
+
+from . import services
+from .models import DashboardMetric
+
+
+def _at(year, month, day):
+    return timezone.make_aware(datetime(year, month, day, 12, 0))
+
+
+NOW = _at(2024, 3, 15)
+
+
+class DashboardFiguresTests(APITestCase):
+    """Dashboard KPIs are aggregated once per company and served from the cache."""
+
+    def setUp(self):  # noqa: D401
+        """Create a company with revenue and expenses over a few months."""
+        clear_all()
+        self.user = User.objects.create_user(username="owner", password="pass1234")
+        self.company = Company.objects.create(CompanyName="Acme LLC")
+        UserCompanyRole.objects.create(UserID=self.user, CompanyID=self.company, Role="owner")
+
+        self.cash = ChartOfAccount.objects.create(
+            CompanyID=self.company, AccountCode="1000", AccountName="Cash", AccountType="CURRENT_ASSET"
+        )
+        self.sales = ChartOfAccount.objects.create(
+            CompanyID=self.company, AccountCode="4000", AccountName="Sales", AccountType="REVENUE"
+        )
+        self.rent = ChartOfAccount.objects.create(
+            CompanyID=self.company, AccountCode="5000", AccountName="Rent", AccountType="EXPENSE"
+        )
+        self.power = ChartOfAccount.objects.create(
+            CompanyID=self.company, AccountCode="5100", AccountName="Power", AccountType="EXPENSE"
+        )
+
+        self._post(self.sales, _at(2023, 12, 10), credit="100.00")
+        self._post(self.sales, _at(2024, 2, 10), credit="500.00")
+        self._post(self.sales, _at(2024, 3, 5), credit="800.00")
+        self._post(self.rent, _at(2024, 2, 20), debit="200.00")
+        self._post(self.rent, _at(2024, 3, 6), debit="300.00")
+        self._post(self.power, _at(2024, 3, 7), debit="50.00")
+        self._post(self.cash, _at(2024, 3, 7), debit="1250.00")
+
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+
+    def _post(self, account, when, debit="0.00", credit="0.00"):
+        return GeneralLedger.objects.create(
+            CompanyID=self.company,
+            AccountID=account,
+            TransactionDate=when,
+            DebitAmount=Decimal(debit),
+            CreditAmount=Decimal(credit),
+        )
+
+    def test_figures_take_two_queries_and_fill_dashboard_metrics(self):
+        """One windowed ledger pass plus the snapshot balances; KPIs land in DashboardMetric."""
+        with CaptureQueriesContext(connection) as ctx:
+            figures = services.compute_company_figures(self.company.pk, NOW)
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+        self.assertEqual(
+            [month.strftime("%b") for month in figures["trend_months"]], ["Oct", "Nov", "Dec", "Jan", "Feb", "Mar"]
+        )
+        self.assertEqual(figures["revenue_trend"][2:], [Decimal("100"), 0, Decimal("500"), Decimal("800")])
+        self.assertEqual(dict(figures["expense_accounts"]), {"Rent": Decimal("300"), "Power": Decimal("50")})
+
+        services.store_metrics(self.company.pk, figures)
+        metrics = dict(DashboardMetric.objects.filter(CompanyID=self.company).values_list("Name", "Value"))
+        self.assertEqual(metrics["revenue_current_month"], Decimal("800.00"))
+        self.assertEqual(metrics["expenses_last_month"], Decimal("200.00"))
+        self.assertEqual(metrics["total_assets"], Decimal("1250.00"))
+
+    def test_cached_figures_are_invalidated_by_ledger_changes(self):
+        """A warm dashboard runs no ledger queries until a ledger entry of the company changes."""
+        services.company_figures(self.company.pk, NOW)
+        with CaptureQueriesContext(connection) as ctx:
+            services.company_figures(self.company.pk, NOW)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._post(self.sales, _at(2024, 3, 8), credit="25.00")
+        figures = services.company_figures(self.company.pk, NOW)
+        self.assertEqual(figures["revenue_trend"][-1], Decimal("825"))
+
+    def test_dashboard_endpoints_share_the_cached_figures(self):
+        """Charts, metrics and health are served from one computation."""
+        with mock.patch("django.utils.timezone.now", return_value=NOW):
+            charts = self.api_client.get(reverse("dashboard_charts"))
+            with CaptureQueriesContext(connection) as ctx:
+                metrics = self.api_client.get(reverse("dashboard_metrics"))
+                health = self.api_client.get(reverse("dashboard_health"))
+
+        self.assertFalse([q for q in ctx.captured_queries if "GeneralLedger" in q["sql"]])
+        self.assertEqual(charts.data["revenue_trend"][-1], {"month": "Mar", "value": 800.0})
+        self.assertEqual([item["label"] for item in charts.data["expense_breakdown"]], ["Rent", "Power"])
+        self.assertEqual(metrics.data["revenue"]["value"], 800.0)
+        self.assertEqual(metrics.data["expenses"]["value"], 350.0)
+        self.assertEqual(health.status_code, 200)
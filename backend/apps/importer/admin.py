@@ -1,11 +1,16 @@
 from django.contrib import admin
-from .models import ImportFile, ImportError
+from .models import ImportChunk, ImportFile, ImportError
 
 @admin.register(ImportFile)
 class ImportFileAdmin(admin.ModelAdmin):
-	list_display = ('id', 'CompanyID', 'FileType', 'File', 'UploadedAt', 'Status')
+	list_display = ('id', 'CompanyID', 'FileType', 'File', 'UploadedAt', 'Status', 'RowsProcessed', 'RowsFailed', 'TotalRows')
 	search_fields = ('File', 'Status')
 
+@admin.register(ImportChunk)
+class ImportChunkAdmin(admin.ModelAdmin):
+	list_display = ('ImportChunkID', 'ImportFileID', 'ChunkIndex', 'StartRow', 'RowCount', 'Status', 'RowsFailed', 'Attempts')
+	list_filter = ('Status',)
+
 @admin.register(ImportError)
 class ImportErrorAdmin(admin.ModelAdmin):
 	list_display = ('id', 'ImportFileID', 'RowNumber', 'ErrorMessage')
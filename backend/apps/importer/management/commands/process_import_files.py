@@ -5,14 +5,24 @@ from apps.importer.services import process_import_file
 class Command(BaseCommand):
     help = 'Process all pending import files'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--resume', action='store_true',
+                            help='Also resume failed imports from their last committed chunk')
+        parser.add_argument('--chunk-size', type=int, help='Rows per chunk (default: IMPORT_CHUNK_SIZE)')
+
     def handle(self, *args, **options):
-        pending = ImportFile.objects.filter(status='pending')
+        statuses = ['pending', 'failed'] if options['resume'] else ['pending']
+        pending = ImportFile.objects.filter(Status__in=statuses)
         count = pending.count()
-        self.stdout.write(f"Found {count} pending import files")
+        self.stdout.write(f"Found {count} import files to process")
         for imp in pending:
             # Use pk rather than id for primary key reference
-            self.stdout.write(f"Processing {imp.pk}: {imp.file.name} (type: {imp.file_type})")
-            errors = process_import_file(imp)
+            self.stdout.write(f"Processing {imp.pk}: {imp.File.name} (type: {imp.FileType})")
+            errors = process_import_file(imp, chunk_size=options['chunk_size'], resume=imp.Status == 'failed')
+            self.stdout.write(
+                f"  {imp.RowsProcessed}/{imp.TotalRows or 0} rows, {imp.RowsFailed} failed, "
+                f"{imp.rows_per_second or 0} rows/s"
+            )
             if errors:
                 self.stdout.write(self.style.WARNING(f"Completed with {len(errors)} errors"))
             else:
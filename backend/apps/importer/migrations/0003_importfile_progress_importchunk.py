@@ -0,0 +1,67 @@
+# Generated by Django 4.2.11 on 2026-10-18 09:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importer', '0002_alter_importfile_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importfile',
+            name='CompletedAt',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Completed At'),
+        ),
+        migrations.AddField(
+            model_name='importfile',
+            name='LastProgressAt',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Last Progress At'),
+        ),
+        migrations.AddField(
+            model_name='importfile',
+            name='RowsFailed',
+            field=models.IntegerField(default=0, verbose_name='Rows Failed'),
+        ),
+        migrations.AddField(
+            model_name='importfile',
+            name='RowsProcessed',
+            field=models.IntegerField(default=0, verbose_name='Rows Processed'),
+        ),
+        migrations.AddField(
+            model_name='importfile',
+            name='StartedAt',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Started At'),
+        ),
+        migrations.AddField(
+            model_name='importfile',
+            name='TotalRows',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Total Rows'),
+        ),
+        migrations.CreateModel(
+            name='ImportChunk',
+            fields=[
+                ('ImportChunkID', models.AutoField(primary_key=True, serialize=False, verbose_name='Import Chunk ID')),
+                ('ChunkIndex', models.IntegerField(verbose_name='Chunk Index')),
+                ('StartRow', models.IntegerField(verbose_name='Start Row')),
+                ('RowCount', models.IntegerField(verbose_name='Row Count')),
+                ('ByteOffset', models.BigIntegerField(verbose_name='Byte Offset')),
+                ('Status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20, verbose_name='Status')),
+                ('RowsFailed', models.IntegerField(default=0, verbose_name='Rows Failed')),
+                ('Attempts', models.IntegerField(default=0, verbose_name='Attempts')),
+                ('LastError', models.TextField(blank=True, default='', verbose_name='Last Error')),
+                ('CompletedAt', models.DateTimeField(blank=True, null=True, verbose_name='Completed At')),
+                ('ImportFileID', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='importer.importfile', verbose_name='Import File')),
+            ],
+            options={
+                'verbose_name': 'Import Chunk',
+                'verbose_name_plural': 'Import Chunks',
+                'db_table': 'ImportChunks',
+                'ordering': ['ImportFileID', 'ChunkIndex'],
+                'unique_together': {('ImportFileID', 'ChunkIndex')},
+            },
+        ),
+    ]
@@ -15,15 +15,72 @@ class ImportFile(models.Model):
     File = models.FileField(upload_to='import_files/', verbose_name="File")
     UploadedAt = models.DateTimeField(auto_now_add=True, verbose_name="Uploaded At")
     Status = models.CharField(max_length=20, default='pending', verbose_name="Status")  # pending, processing, completed, failed
+    # Progress, updated as each chunk commits
+    TotalRows = models.IntegerField(null=True, blank=True, verbose_name="Total Rows")
+    RowsProcessed = models.IntegerField(default=0, verbose_name="Rows Processed")
+    RowsFailed = models.IntegerField(default=0, verbose_name="Rows Failed")
+    StartedAt = models.DateTimeField(null=True, blank=True, verbose_name="Started At")
+    LastProgressAt = models.DateTimeField(null=True, blank=True, verbose_name="Last Progress At")
+    CompletedAt = models.DateTimeField(null=True, blank=True, verbose_name="Completed At")
 
     def __str__(self):
         return f'{self.File.name} ({self.Status})'
 
+    @property
+    def rows_per_second(self):
+        """Average throughput between the start of the import and its last committed chunk."""
+        if not self.StartedAt or not self.LastProgressAt:
+            return None
+        elapsed = (self.LastProgressAt - self.StartedAt).total_seconds()
+        return round(self.RowsProcessed / elapsed, 1) if elapsed > 0 else None
+
+    @property
+    def percent_complete(self):
+        if not self.TotalRows:
+            return None
+        return round(100.0 * self.RowsProcessed / self.TotalRows, 1)
+
     class Meta:
         db_table = 'ImportFiles'
         verbose_name = "Import File"
         verbose_name_plural = "Import Files"
 
+class ImportChunk(models.Model):
+    """
+    One offset-based slice of an import file, processed and committed atomically.
+
+    ``ByteOffset`` is the file position of the chunk's first data row, so a
+    worker can seek straight to it instead of re-reading the file.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    ImportChunkID = models.AutoField(primary_key=True, verbose_name="Import Chunk ID")
+    ImportFileID = models.ForeignKey(ImportFile, on_delete=models.CASCADE, related_name='chunks', verbose_name="Import File")
+    ChunkIndex = models.IntegerField(verbose_name="Chunk Index")
+    StartRow = models.IntegerField(verbose_name="Start Row")
+    RowCount = models.IntegerField(verbose_name="Row Count")
+    ByteOffset = models.BigIntegerField(verbose_name="Byte Offset")
+    Status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Status")
+    RowsFailed = models.IntegerField(default=0, verbose_name="Rows Failed")
+    Attempts = models.IntegerField(default=0, verbose_name="Attempts")
+    LastError = models.TextField(blank=True, default='', verbose_name="Last Error")
+    CompletedAt = models.DateTimeField(null=True, blank=True, verbose_name="Completed At")
+
+    class Meta:
+        db_table = 'ImportChunks'
+        verbose_name = 'Import Chunk'
+        verbose_name_plural = 'Import Chunks'
+        unique_together = (('ImportFileID', 'ChunkIndex'),)
+        ordering = ['ImportFileID', 'ChunkIndex']
+
+    def __str__(self):
+        return f'Chunk {self.ChunkIndex} of import {self.ImportFileID_id} ({self.Status})'
+
+
 class ImportError(models.Model):
     """
     Row-level errors for a given import file.
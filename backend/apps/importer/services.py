@@ -1,114 +1,421 @@
 import csv, os
-from .models import ImportFile
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import ImportChunk, ImportFile
 from apps.accounting.models import ChartOfAccount
 from apps.customers.models import Customer
 from apps.vendors.models import Vendor
 from apps.invoices.models import Invoice
 from apps.bills.models import Bill
-from django.conf import settings
 
-def process_import_file(import_file: ImportFile):
+# Rows read from the CSV and committed per transaction
+DEFAULT_CHUNK_SIZE = getattr(settings, 'IMPORT_CHUNK_SIZE', 5000)
+# Rows per bulk_create/bulk_update statement and per prefetch IN (...) list.
+# Keep well under SQL Server's 2100-parameter limit.
+DEFAULT_BATCH_SIZE = getattr(settings, 'IMPORT_BATCH_SIZE', 500)
+
+
+class RowError(Exception):
+    """A row that cannot be imported; recorded as an ImportError."""
+
+
+def process_import_file(import_file: ImportFile, chunk_size=None, batch_size=None, resume=False):
     """
     Process the uploaded import file synchronously.
     Determine file type and parse accordingly.
     Update import_file.status to 'completed' or 'failed'.
+
+    The CSV is split into chunks of ``chunk_size`` rows (see ``plan_import``).
+    Each chunk prefetches the existing keys it needs, writes with
+    bulk_create/bulk_update in batches of ``batch_size`` and commits in its own
+    transaction together with its progress, so a failure only loses the chunk
+    in flight. With ``resume=True`` a failed import carries on from the chunks
+    that have not committed yet.
     """
-    path = import_file.File.path
-    name = os.path.basename(path)
     errors = []
-    from .models import ImportError
-    # Clear previous errors
-    import_file.errors.all().delete()
     try:
-        if not name.lower().endswith('.csv'):
-            raise ValueError('Unsupported file type')
-        # Choose handler based on declared file_type
-        with open(path, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            if import_file.FileType == 'coa':
-                errors = _import_coa(reader, import_file.CompanyID)
-            elif import_file.FileType == 'customers':
-                errors = _import_customers(reader, import_file.CompanyID)
-            elif import_file.FileType == 'vendors':
-                errors = _import_vendors(reader, import_file.CompanyID)
-            elif import_file.FileType == 'invoices':
-                errors = _import_invoices(reader, import_file.CompanyID)
-            elif import_file.FileType == 'bills':
-                errors = _import_bills(reader, import_file.CompanyID)
-            else:
-                raise ValueError(f'Unknown file_type {import_file.FileType}')
-        import_file.Status = 'completed'
+        for chunk in plan_import(import_file, chunk_size, resume=resume):
+            errors.extend(run_chunk(import_file, chunk, batch_size))
     except Exception as e:
-        import_file.Status = 'failed'
-        errors.append({'row': None, 'error': str(e)})
-    # TODO: save or log errors for user review
-    import_file.save()
-    # Persist row-level errors
-    for err in errors:
-        ImportError.objects.create(
-            ImportFileID=import_file,
-            RowNumber=err.get('row'),
-            ErrorMessage=err.get('error')
-        )
+        errors.append(fail_import(import_file, str(e)))
+    else:
+        finalize_import(import_file)
     return errors
 
-def _import_coa(reader, company):
-    errors = []
-    for idx, row in enumerate(reader, start=2):
-        try:
-            ChartOfAccount.objects.update_or_create(
-                CompanyID=company,
-                AccountCode=row['account_code'],
-                defaults={
-                    'AccountName': row.get('account_name', ''),
-                    'AccountType': row.get('account_type', ''),
-                }
+
+def get_importer(file_type):
+    """Return the chunk importer for an ImportFile.FileType."""
+    try:
+        return IMPORTERS[file_type]
+    except KeyError:
+        raise ValueError(f'Unknown file_type {file_type}')
+
+
+def _lines(handle):
+    # csv reads through readline() so handle.tell() stays usable between records
+    return iter(handle.readline, '')
+
+
+def scan_chunks(path, chunk_size, first_row=2):
+    """
+    Return ``[(start_row, row_count, byte_offset)]`` for the data rows of a CSV.
+
+    One pass over the file; ``byte_offset`` is where each chunk's first record
+    starts, so chunks can later be read independently with ``read_chunk``.
+    Blank lines are skipped, as csv.DictReader does.
+    """
+    chunks = []
+    with open(path, newline='', encoding='utf-8') as handle:
+        reader = csv.reader(_lines(handle))
+        next(reader, None)  # header
+        start_row, count, offset = first_row, 0, handle.tell()
+        for row in reader:
+            if not row:
+                continue
+            count += 1
+            if count == chunk_size:
+                chunks.append((start_row, count, offset))
+                start_row, count, offset = start_row + count, 0, handle.tell()
+        if count:
+            chunks.append((start_row, count, offset))
+    return chunks
+
+
+def read_chunk(path, chunk):
+    """Return the ``(row_number, row)`` pairs of an ImportChunk."""
+    with open(path, newline='', encoding='utf-8') as handle:
+        header = next(csv.reader(_lines(handle)), [])
+        handle.seek(chunk.ByteOffset)
+        reader = csv.DictReader(_lines(handle), fieldnames=header)
+        return list(islice(enumerate(reader, start=chunk.StartRow), chunk.RowCount))
+
+
+def plan_import(import_file: ImportFile, chunk_size=None, resume=False):
+    """
+    Split ``import_file`` into ImportChunk rows and mark it as processing.
+
+    Returns the chunks still to run. With ``resume=True`` and an existing plan,
+    committed chunks are kept and failed or interrupted ones are queued again;
+    only resume a job once its workers have stopped. Otherwise previous
+    chunks, errors and counters are cleared and the file is scanned afresh.
+    """
+    path = import_file.File.path
+    if not os.path.basename(path).lower().endswith('.csv'):
+        raise ValueError('Unsupported file type')
+    get_importer(import_file.FileType)
+
+    now = timezone.now()
+    if resume and import_file.chunks.exists():
+        import_file.chunks.filter(Status__in=['running', 'failed']).update(Status='pending')
+        # Drop the file-level error of the failed attempt; row errors of committed chunks stay
+        import_file.errors.filter(RowNumber__isnull=True).delete()
+        import_file.Status = 'processing'
+        import_file.CompletedAt = None
+        if import_file.StartedAt is None:
+            import_file.StartedAt = now
+        import_file.save(update_fields=['Status', 'CompletedAt', 'StartedAt'])
+        return list(import_file.chunks.filter(Status='pending'))
+
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    import_file.errors.all().delete()
+    import_file.chunks.all().delete()
+    planned = scan_chunks(path, chunk_size)
+    ImportChunk.objects.bulk_create(
+        [
+            ImportChunk(ImportFileID=import_file, ChunkIndex=index, StartRow=start_row, RowCount=count,
+                        ByteOffset=offset)
+            for index, (start_row, count, offset) in enumerate(planned)
+        ],
+        batch_size=DEFAULT_BATCH_SIZE,
+    )
+    import_file.TotalRows = sum(count for _, count, _ in planned)
+    import_file.RowsProcessed = 0
+    import_file.RowsFailed = 0
+    import_file.StartedAt = now
+    import_file.LastProgressAt = None
+    import_file.CompletedAt = None
+    import_file.Status = 'processing'
+    import_file.save(update_fields=[
+        'TotalRows', 'RowsProcessed', 'RowsFailed', 'StartedAt', 'LastProgressAt', 'CompletedAt', 'Status',
+    ])
+    return list(import_file.chunks.all())
+
+
+def run_chunk(import_file: ImportFile, chunk: ImportChunk, batch_size=None):
+    """
+    Import one chunk and commit it together with its progress.
+
+    The chunk is claimed first, so a redelivered task for a chunk that is
+    already running or committed does nothing. Returns the row errors; on an
+    unexpected exception the chunk is marked failed and the exception re-raised.
+    """
+    batch_size = batch_size or DEFAULT_BATCH_SIZE
+    claimed = ImportChunk.objects.filter(pk=chunk.pk, Status__in=['pending', 'failed']).update(
+        Status='running', Attempts=F('Attempts') + 1,
+    )
+    if not claimed:
+        return []
+    try:
+        importer = get_importer(import_file.FileType)
+        rows = read_chunk(import_file.File.path, chunk)
+        with transaction.atomic():
+            errors = importer(rows, import_file.CompanyID, batch_size)
+            _save_errors(import_file, errors, batch_size)
+            now = timezone.now()
+            failed_rows = len({err.get('row') for err in errors})
+            ImportChunk.objects.filter(pk=chunk.pk).update(
+                Status='completed', RowsFailed=failed_rows, LastError='', CompletedAt=now,
             )
-        except Exception as e:
-            errors.append({'row': idx, 'error': str(e)})
+            ImportFile.objects.filter(pk=import_file.pk).update(
+                RowsProcessed=F('RowsProcessed') + chunk.RowCount,
+                RowsFailed=F('RowsFailed') + failed_rows,
+                LastProgressAt=now,
+            )
+    except Exception as e:
+        ImportChunk.objects.filter(pk=chunk.pk).update(Status='failed', LastError=str(e))
+        raise
+    chunk.Status = 'completed'
     return errors
 
-def _import_customers(reader, company):
+
+def finalize_import(import_file: ImportFile):
+    """
+    Mark the import completed (or failed) once no chunk is left to run.
+
+    Safe to call after every chunk: the status only changes from 'processing'
+    once, whichever worker gets there first. Returns the final status or None.
+    """
+    statuses = set(import_file.chunks.values_list('Status', flat=True))
+    if statuses & {'pending', 'running'}:
+        return None
+    status = 'failed' if 'failed' in statuses else 'completed'
+    ImportFile.objects.filter(pk=import_file.pk, Status='processing').update(
+        Status=status, CompletedAt=timezone.now(),
+    )
+    import_file.refresh_from_db(fields=[
+        'Status', 'RowsProcessed', 'RowsFailed', 'TotalRows', 'LastProgressAt', 'CompletedAt',
+    ])
+    return import_file.Status
+
+
+def fail_import(import_file: ImportFile, message):
+    """Record a file-level error and mark the import failed. Returns the error."""
+    file_error = {'row': None, 'error': message}
+    _save_errors(import_file, [file_error], DEFAULT_BATCH_SIZE)
+    import_file.Status = 'failed'
+    import_file.CompletedAt = timezone.now()
+    import_file.save(update_fields=['Status', 'CompletedAt'])
+    return file_error
+
+
+def import_progress(import_file: ImportFile):
+    """Progress counters for the API and the management command."""
+    return {
+        'status': import_file.Status,
+        'total_rows': import_file.TotalRows,
+        'rows_processed': import_file.RowsProcessed,
+        'rows_failed': import_file.RowsFailed,
+        'percent_complete': import_file.percent_complete,
+        'rows_per_second': import_file.rows_per_second,
+        'started_at': import_file.StartedAt,
+        'last_progress_at': import_file.LastProgressAt,
+        'completed_at': import_file.CompletedAt,
+        'chunks': dict(
+            import_file.chunks.order_by().values_list('Status').annotate(Count('pk'))
+        ),
+    }
+
+
+def _save_errors(import_file, errors, batch_size):
+    from .models import ImportError
+    if errors:
+        ImportError.objects.bulk_create(
+            [
+                ImportError(ImportFileID=import_file, RowNumber=err.get('row'), ErrorMessage=err.get('error'))
+                for err in errors
+            ],
+            batch_size=batch_size,
+        )
+
+
+def _prefetch(queryset, field, keys, batch_size):
+    """Return ``{key: instance}`` for ``queryset`` rows whose ``field`` is in ``keys``."""
+    found = {}
+    keys = list(keys)
+    for start in range(0, len(keys), batch_size):
+        batch = keys[start:start + batch_size]
+        for obj in queryset.filter(**{f'{field}__in': batch}):
+            found[getattr(obj, field)] = obj
+    return found
+
+
+def _write_chunk(model, creates, updates, update_fields, batch_size):
+    """
+    Persist one chunk: bulk_create ``creates`` and bulk_update ``updates``.
+
+    Both are lists of ``(row_number, instance)``. If a bulk statement fails the
+    chunk is retried row by row (each in a savepoint) so the offending rows are
+    reported and the rest still load. Returns row errors.
+    """
+    try:
+        with transaction.atomic():
+            if creates:
+                model.objects.bulk_create([obj for _, obj in creates], batch_size=batch_size)
+            if updates:
+                model.objects.bulk_update([obj for _, obj in updates], update_fields, batch_size=batch_size)
+        return []
+    except DatabaseError:
+        pass
+
     errors = []
-    for idx, row in enumerate(reader, start=2):
-        try:
-            Customer.objects.update_or_create(
-                CompanyID=company,
-                Name=row.get('customer_name', ''),
-            )
-        except Exception as e:
-            errors.append({'row': idx, 'error': str(e)})
+    with transaction.atomic():
+        for row_number, obj in creates:
+            # bulk_create may have assigned keys before rolling back
+            obj.pk = None
+            obj._state.adding = True
+            try:
+                with transaction.atomic():
+                    obj.save(force_insert=True)
+            except Exception as e:
+                errors.append({'row': row_number, 'error': str(e)})
+        for row_number, obj in updates:
+            try:
+                with transaction.atomic():
+                    obj.save(update_fields=update_fields)
+            except Exception as e:
+                errors.append({'row': row_number, 'error': str(e)})
     return errors
 
-def _import_vendors(reader, company):
+
+def _required(row, column):
+    value = (row.get(column) or '').strip()
+    if not value:
+        raise RowError(f'{column} is required')
+    return value
+
+
+def _date(row, column):
+    value = _required(row, column)
+    parsed = parse_date(value)
+    if parsed is None:
+        raise RowError(f'{column} must be a YYYY-MM-DD date, got {value!r}')
+    return parsed
+
+
+def _decimal(row, column):
+    value = _required(row, column)
+    try:
+        return Decimal(value.replace(',', ''))
+    except InvalidOperation:
+        raise RowError(f'{column} must be a number, got {value!r}')
+
+
+def _import_coa(chunk, company, batch_size=DEFAULT_BATCH_SIZE):
     errors = []
-    for idx, row in enumerate(reader, start=2):
+    parsed = {}
+    for idx, row in chunk:
         try:
-            Vendor.objects.update_or_create(
-                CompanyID=company,
-                Name=row.get('vendor_name', ''),
-            )
-        except Exception as e:
+            code = _required(row, 'account_code')
+        except RowError as e:
             errors.append({'row': idx, 'error': str(e)})
-    return errors
+            continue
+        # Later rows for the same code win, as with sequential update_or_create
+        parsed[code] = (idx, row.get('account_name', ''), row.get('account_type', ''))
+
+    existing = _prefetch(ChartOfAccount.objects.filter(CompanyID=company), 'AccountCode', parsed, batch_size)
+    creates, updates = [], []
+    for code, (idx, account_name, account_type) in parsed.items():
+        account = existing.get(code)
+        if account is None:
+            creates.append((idx, ChartOfAccount(
+                CompanyID=company, AccountCode=code, AccountName=account_name, AccountType=account_type,
+            )))
+        else:
+            account.AccountName = account_name
+            account.AccountType = account_type
+            updates.append((idx, account))
+    return errors + _write_chunk(ChartOfAccount, creates, updates, ['AccountName', 'AccountType'], batch_size)
+
+
+def _import_named(model, column, chunk, company, batch_size):
+    """Create missing ``model`` rows keyed by Name (customers, vendors)."""
+    names = {}
+    for idx, row in chunk:
+        names.setdefault(row.get(column, ''), idx)
+    existing = _prefetch(model.objects.filter(CompanyID=company), 'Name', names, batch_size)
+    creates = [(idx, model(CompanyID=company, Name=name)) for name, idx in names.items() if name not in existing]
+    return _write_chunk(model, creates, [], [], batch_size)
+
+
+def _import_customers(chunk, company, batch_size=DEFAULT_BATCH_SIZE):
+    return _import_named(Customer, 'customer_name', chunk, company, batch_size)
+
 
-def _import_invoices(reader, company):
+def _import_vendors(chunk, company, batch_size=DEFAULT_BATCH_SIZE):
+    return _import_named(Vendor, 'vendor_name', chunk, company, batch_size)
+
+
+def _import_documents(model, party_model, party_column, party_field, number_column, number_field, date_column,
+                      date_field, chunk, company, batch_size):
+    """Create invoices/bills that reference an existing customer/vendor by ID."""
     errors = []
-    for idx, row in enumerate(reader, start=2):
+    party_ids = set()
+    for _, row in chunk:
         try:
-            # Expecting column 'customer_id' referring to existing Customer
-            cust = Customer.objects.get(CompanyID=company, pk=row.get('customer_id'))
-            Invoice.objects.create(CompanyID=company, CustomerID=cust)
-        except Exception as e:
-            errors.append({'row': idx, 'error': str(e)})
-    return errors
+            party_ids.add(int(row.get(party_column)))
+        except (TypeError, ValueError):
+            pass
+    parties = _prefetch(party_model.objects.filter(CompanyID=company), 'pk', party_ids, batch_size)
 
-def _import_bills(reader, company):
-    errors = []
-    for idx, row in enumerate(reader, start=2):
+    creates = []
+    for idx, row in chunk:
         try:
-            vend = Vendor.objects.get(CompanyID=company, pk=row.get('vendor_id'))
-            Bill.objects.create(CompanyID=company, VendorID=vend)
-        except Exception as e:
+            try:
+                party = parties.get(int(row.get(party_column)))
+            except (TypeError, ValueError):
+                party = None
+            if party is None:
+                raise RowError(f'{party_model.__name__} matching query does not exist.')
+            creates.append((idx, model(**{
+                'CompanyID': company,
+                party_field: party,
+                number_field: _required(row, number_column),
+                date_field: _date(row, date_column),
+                'DueDate': _date(row, 'due_date'),
+                'TotalAmount': _decimal(row, 'total_amount'),
+                'Status': (row.get('status') or 'Draft').strip(),
+            })))
+        except RowError as e:
             errors.append({'row': idx, 'error': str(e)})
-    return errors
+    return errors + _write_chunk(model, creates, [], [], batch_size)
+
+
+def _import_invoices(chunk, company, batch_size=DEFAULT_BATCH_SIZE):
+    # Expecting column 'customer_id' referring to existing Customer
+    return _import_documents(
+        Invoice, Customer, 'customer_id', 'CustomerID', 'invoice_number', 'InvoiceNumber',
+        'invoice_date', 'InvoiceDate', chunk, company, batch_size,
+    )
+
+
+def _import_bills(chunk, company, batch_size=DEFAULT_BATCH_SIZE):
+    return _import_documents(
+        Bill, Vendor, 'vendor_id', 'VendorID', 'bill_number', 'BillNumber',
+        'bill_date', 'BillDate', chunk, company, batch_size,
+    )
+
+
+IMPORTERS = {
+    'coa': _import_coa,
+    'customers': _import_customers,
+    'vendors': _import_vendors,
+    'invoices': _import_invoices,
+    'bills': _import_bills,
+}
@@ -1,14 +1,64 @@
+import logging
+
 from celery import shared_task
-from .models import ImportFile
-from .services import process_import_file as sync_process_import_file
+from .models import ImportChunk, ImportFile
+from .services import fail_import, finalize_import, plan_import, run_chunk
+
+logger = logging.getLogger(__name__)
+
 
 @shared_task
-def process_import_file_task(import_file_id):
+def process_import_file_task(import_file_id, resume=False, chunk_size=None):
     """
     Celery task wrapper for processing an import file.
+
+    Plans the file into offset-based chunks and runs them as a chain of
+    ``import_chunk_task`` jobs, one after another. Chunks never run in
+    parallel: each one looks up the existing keys (account codes, names) for
+    its own rows only, so two chunks of the same file running at once would
+    both insert a key they share. Pass ``resume=True`` to continue a failed
+    import from the chunks that have not committed.
     """
     try:
         imp = ImportFile.objects.get(pk=import_file_id)
     except ImportFile.DoesNotExist:
         return {'error': 'ImportFile not found'}
-    return sync_process_import_file(imp)
+    try:
+        chunks = plan_import(imp, chunk_size, resume=resume)
+    except Exception as e:
+        return {'error': fail_import(imp, str(e))['error']}
+
+    if not chunks:
+        return {'import_file': imp.pk, 'chunks': 0, 'status': finalize_import(imp)}
+    import_chunk_task.delay(chunks[0].pk, chain=True)
+    return {'import_file': imp.pk, 'chunks': len(chunks)}
+
+
+@shared_task
+def import_chunk_task(chunk_id, chain=False):
+    """
+    Import one ImportChunk.
+
+    With ``chain=True`` the next pending chunk of the same file is queued once
+    this one commits. A chunk that raises marks the whole import failed; the
+    chunks committed so far are kept for a resume.
+    """
+    try:
+        chunk = ImportChunk.objects.select_related('ImportFileID__CompanyID').get(pk=chunk_id)
+    except ImportChunk.DoesNotExist:
+        return {'error': 'ImportChunk not found'}
+    imp = chunk.ImportFileID
+    try:
+        errors = run_chunk(imp, chunk)
+    except Exception as e:
+        logger.exception("Import %s chunk %s failed", imp.pk, chunk.ChunkIndex)
+        fail_import(imp, f'Chunk {chunk.ChunkIndex} (rows {chunk.StartRow}-{chunk.StartRow + chunk.RowCount - 1}): {e}')
+        return {'error': str(e)}
+
+    if chain:
+        next_chunk = imp.chunks.filter(Status='pending', ChunkIndex__gt=chunk.ChunkIndex).first()
+        if next_chunk is not None:
+            import_chunk_task.delay(next_chunk.pk, chain=True)
+            return {'chunk': chunk.ChunkIndex, 'errors': len(errors)}
+    finalize_import(imp)
+    return {'chunk': chunk.ChunkIndex, 'errors': len(errors)}
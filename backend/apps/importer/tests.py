@@ -0,0 +1,173 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from apps.accounting.models import ChartOfAccount
+from apps.accounts.models import Company
+from apps.customers.models import Customer
+from apps.invoices.models import Invoice
+
+from .models import ImportError, ImportFile
+from . import services, tasks
+from .services import process_import_file
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class BulkImportTests(TestCase):
+    """CSV imports load in chunks with bulk writes."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):  # noqa: D401
+        """Create the company the files are imported into."""
+        self.company = Company.objects.create(CompanyName="Acme LLC")
+
+    def _import_file(self, file_type, content):
+        return ImportFile.objects.create(
+            CompanyID=self.company,
+            FileType=file_type,
+            File=SimpleUploadedFile(f"{file_type}.csv", content.encode("utf-8")),
+        )
+
+    def test_customer_import_query_count_is_per_chunk(self):
+        """Hundreds of rows cost a handful of queries per chunk, not two per row."""
+        Customer.objects.create(CompanyID=self.company, Name="Customer 0")
+        rows = "\n".join(f"Customer {i}" for i in range(300))
+        import_file = self._import_file("customers", "customer_name\n" + rows + "\nCustomer 5\n")
+
+        with CaptureQueriesContext(connection) as ctx:
+            errors = process_import_file(import_file, chunk_size=100, batch_size=50)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Customer.objects.filter(CompanyID=self.company).count(), 300)
+        self.assertLess(len(ctx.captured_queries), 60)
+        import_file.refresh_from_db()
+        self.assertEqual(import_file.Status, "completed")
+        self.assertEqual((import_file.TotalRows, import_file.RowsProcessed, import_file.RowsFailed), (301, 301, 0))
+        self.assertEqual(import_file.chunks.count(), 4)
+
+    def test_coa_import_updates_existing_accounts(self):
+        """Existing account codes are updated in bulk; new ones are created."""
+        ChartOfAccount.objects.create(
+            CompanyID=self.company, AccountCode="1000", AccountName="Old", AccountType="ASSET"
+        )
+        import_file = self._import_file(
+            "coa",
+            "account_code,account_name,account_type\n"
+            "1000,Cash,CURRENT_ASSET\n"
+            "2000,Loan,LIABILITY\n"
+            ",Missing,ASSET\n",
+        )
+        errors = process_import_file(import_file)
+
+        self.assertEqual(errors, [{"row": 4, "error": "account_code is required"}])
+        cash = ChartOfAccount.objects.get(CompanyID=self.company, AccountCode="1000")
+        self.assertEqual((cash.AccountName, cash.AccountType), ("Cash", "CURRENT_ASSET"))
+        self.assertTrue(ChartOfAccount.objects.filter(CompanyID=self.company, AccountCode="2000").exists())
+
+    def test_invoice_row_errors_are_recorded(self):
+        """Bad rows become ImportError records while valid rows still load."""
+        customer = Customer.objects.create(CompanyID=self.company, Name="Acme Customer")
+        import_file = self._import_file(
+            "invoices",
+            "customer_id,invoice_number,invoice_date,due_date,total_amount\n"
+            f"{customer.pk},INV-1,2024-01-01,2024-01-31,100.00\n"
+            "999999,INV-2,2024-01-01,2024-01-31,50.00\n"
+            f"{customer.pk},INV-3,not-a-date,2024-01-31,50.00\n",
+        )
+        process_import_file(import_file)
+
+        self.assertEqual(
+            list(Invoice.objects.filter(CompanyID=self.company).values_list("InvoiceNumber", flat=True)), ["INV-1"]
+        )
+        self.assertEqual(
+            sorted(ImportError.objects.filter(ImportFileID=import_file).values_list("RowNumber", flat=True)), [3, 4]
+        )
+
+    def test_chunks_seek_past_quoted_newlines(self):
+        """Chunk offsets land on record boundaries even when a field spans lines."""
+        import_file = self._import_file(
+            "customers", 'customer_name\n"Multi\nLine"\nSecond\n\nThird\nFourth\n'
+        )
+        process_import_file(import_file, chunk_size=2)
+
+        self.assertEqual(
+            sorted(Customer.objects.filter(CompanyID=self.company).values_list("Name", flat=True)),
+            ["Fourth", "Multi\nLine", "Second", "Third"],
+        )
+        self.assertEqual(list(import_file.chunks.values_list("StartRow", "RowCount")), [(2, 2), (4, 2)])
+
+    def test_failed_import_resumes_from_last_committed_chunk(self):
+        """A crash mid-file keeps committed chunks; resuming only runs the rest."""
+        rows = "\n".join(f"Customer {i}" for i in range(10))
+        import_file = self._import_file("customers", "customer_name\n" + rows + "\n")
+        real_importer = services._import_customers
+        calls = []
+
+        def flaky_importer(chunk, company, batch_size):
+            calls.append(chunk[0][0])
+            if len(calls) == 3:
+                raise RuntimeError("worker lost")
+            return real_importer(chunk, company, batch_size)
+
+        with mock.patch.dict(services.IMPORTERS, {"customers": flaky_importer}):
+            errors = process_import_file(import_file, chunk_size=3)
+        self.assertEqual(errors, [{"row": None, "error": "worker lost"}])
+        import_file.refresh_from_db()
+        self.assertEqual((import_file.Status, import_file.RowsProcessed), ("failed", 6))
+        self.assertEqual(Customer.objects.filter(CompanyID=self.company).count(), 6)
+
+        calls.clear()
+        with mock.patch.dict(services.IMPORTERS, {"customers": flaky_importer}):
+            errors = process_import_file(import_file, resume=True)
+        self.assertEqual(errors, [])
+        self.assertEqual(calls, [8, 11])
+        import_file.refresh_from_db()
+        self.assertEqual((import_file.Status, import_file.RowsProcessed), ("completed", 10))
+        self.assertEqual(Customer.objects.filter(CompanyID=self.company).count(), 10)
+        self.assertFalse(import_file.errors.exists())
+
+    def test_task_chains_chunks_so_keys_repeated_across_chunks_stay_unique(self):
+        """A key in two chunks is created once: chunks run one after another, never in parallel."""
+        ChartOfAccount.objects.create(
+            CompanyID=self.company, AccountCode="1000", AccountName="Cash", AccountType="ASSET"
+        )
+        coa = self._import_file(
+            "coa",
+            "account_code,account_name,account_type\n"
+            "2000,Payables,LIABILITY\n1000,Bank,ASSET\n"
+            "2000,Accounts payable,LIABILITY\n3000,Equity,EQUITY\n",
+        )
+        customers = self._import_file("customers", "customer_name\nAda\nGrace\nAda\nLinus\n")
+        queued = []
+
+        def run_inline(chunk_id, chain=False):
+            queued.append(chain)
+            return tasks.import_chunk_task(chunk_id, chain=chain)
+
+        with mock.patch.object(tasks.import_chunk_task, "delay", side_effect=run_inline):
+            tasks.process_import_file_task(coa.pk, chunk_size=2)
+            tasks.process_import_file_task(customers.pk, chunk_size=2)
+
+        self.assertEqual(queued, [True] * 4)
+        self.assertEqual(
+            sorted(ChartOfAccount.objects.filter(CompanyID=self.company).values_list("AccountCode", "AccountName")),
+            [("1000", "Bank"), ("2000", "Accounts payable"), ("3000", "Equity")],
+        )
+        self.assertEqual(
+            sorted(Customer.objects.filter(CompanyID=self.company).values_list("Name", flat=True)),
+            ["Ada", "Grace", "Linus"],
+        )
+        for import_file in (coa, customers):
+            import_file.refresh_from_db()
+            self.assertEqual(import_file.Status, "completed")
@@ -1,7 +1,9 @@
 from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import ImportFile
 from .serializers import ImportFileSerializer
+from .services import import_progress
 from .tasks import process_import_file_task
 from ..accounts.models import UserCompanyRole
 
@@ -23,3 +25,20 @@ class ImportFileViewSet(viewsets.ModelViewSet):
         )
         # Enqueue background job
         process_import_file_task.delay(import_file.pk)
+
+    @action(detail=True, methods=['get'])
+    def progress(self, request, pk=None):
+        """Rows processed/failed, throughput and chunk states of an import."""
+        return Response(import_progress(self.get_object()))
+
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        """Re-queue a failed import from its last committed chunk."""
+        import_file = self.get_object()
+        if import_file.Status != 'failed':
+            return Response(
+                {'error': f'Only failed imports can be resumed (status is {import_file.Status}).'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        process_import_file_task.delay(import_file.pk, resume=True)
+        return Response(import_progress(import_file), status=status.HTTP_202_ACCEPTED)
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-18 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0002_alter_invoice_options_alter_invoice_companyid_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['CompanyID', '-CreatedDate'], name='invoice_company_created_idx'),
+        ),
+    ]
@@ -24,3 +24,7 @@ class Invoice(models.Model):
         db_table = 'Invoices'
         verbose_name = "Invoice"
         verbose_name_plural = "Invoices"
+        indexes = [
+            # InvoiceViewSet default listing: one company, newest first
+            models.Index(fields=['CompanyID', '-CreatedDate'], name='invoice_company_created_idx'),
+        ]
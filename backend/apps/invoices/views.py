@@ -8,12 +8,12 @@ from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 import traceback
 
-from apps.accounts.models import Company
+from apps.accounts.company_scope import CompanyScopedMixin
 from .models import Invoice
 from .serializers import InvoiceSerializer
 
 
-class InvoiceViewSet(viewsets.ModelViewSet):
+class InvoiceViewSet(CompanyScopedMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     queryset = Invoice.objects.select_related('CompanyID', 'CustomerID')
     serializer_class = InvoiceSerializer
@@ -23,36 +23,11 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     ordering_fields = ['InvoiceDate', 'DueDate', 'TotalAmount', 'CreatedDate']
     ordering = ['-CreatedDate']
 
-    def _company_queryset(self):
-        return Company.objects.filter(usercompanyrole__UserID=self.request.user)
-
-    def _get_active_company(self):
-        companies = self._company_queryset()
-        if not companies.exists():
-            return None
-
-        query_params = getattr(self.request, 'query_params', {})
-        request_data = getattr(self.request, 'data', {})
-
-        company_id = (
-            self.request.headers.get('X-Company-ID')
-            or query_params.get('CompanyID')
-            or request_data.get('CompanyID')
-        )
-
-        if company_id:
-            try:
-                return companies.get(CompanyID=company_id)
-            except (Company.DoesNotExist, ValueError):
-                raise PermissionDenied("You do not have access to this company.")
-
-        return companies.first()
-
     def get_queryset(self):
-        company = self._get_active_company()
-        if not company:
+        company_id = self._active_company_id()
+        if not company_id:
             return Invoice.objects.none()
-        return super().get_queryset().filter(CompanyID=company)
+        return super().get_queryset().filter(CompanyID=company_id)
 
     def perform_create(self, serializer):
         company = self._get_active_company()
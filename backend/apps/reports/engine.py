@@ -0,0 +1,277 @@
+"""
+Shared balance engine for the financial reports and dashboard.
+
+Every balance is computed with a single ``GROUP BY AccountID`` query that sums
+debits and credits together, instead of two ``aggregate()`` queries per
+account. Callers get back a compact in-memory map keyed by account id.
+
+Point-in-time balances (no start date) read the nearest daily snapshot from
+``AccountBalanceSnapshot`` and add only the entries posted on the cutoff day,
+so their cost no longer grows with the age of the ledger.
+
+Time series (``period_type_balances``) group the ledger by a truncated
+transaction date and account type in one query, whatever the number of buckets.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import DecimalField, QuerySet, Sum, Value
+from django.db.models.functions import Coalesce, Trunc
+from django.utils import timezone
+
+from apps.accounting import snapshots
+from apps.accounting.models import GeneralLedger
+
+
+ASSET_TYPES = ('ASSET', 'CURRENT_ASSET', 'FIXED_ASSET')
+LIABILITY_TYPES = ('LIABILITY', 'CURRENT_LIABILITY', 'LONG_TERM_LIABILITY')
+EQUITY_TYPES = ('EQUITY', 'RETAINED_EARNINGS')
+REVENUE_TYPES = ('REVENUE',)
+EXPENSE_TYPES = ('EXPENSE',)
+
+# Account types whose balance grows with debits; every other type grows with credits
+DEBIT_NORMAL_TYPES = frozenset(ASSET_TYPES + EXPENSE_TYPES)
+
+ZERO = Decimal('0')
+
+
+class AccountBalance(namedtuple('AccountBalance', ['debit', 'credit'])):
+    """Summed debit and credit amounts for one account (or account type)."""
+
+    __slots__ = ()
+
+    def normal_balance(self, account_type):
+        """Return the balance signed according to the account type's normal side."""
+        if account_type in DEBIT_NORMAL_TYPES:
+            return self.debit - self.credit
+        return self.credit - self.debit
+
+    def __add__(self, other):
+        return AccountBalance(self.debit + other.debit, self.credit + other.credit)
+
+
+EMPTY_BALANCE = AccountBalance(ZERO, ZERO)
+
+
+def _zero():
+    return Value(ZERO, output_field=DecimalField(max_digits=18, decimal_places=2))
+
+
+def ledger_entries(company, start_date=None, end_date=None, end_exclusive=False):
+    """
+    Build the GeneralLedger queryset for a company (or companies) and date window.
+
+    ``company`` may be a Company instance, a primary key, or a queryset/iterable
+    of either. ``start_date`` is inclusive; ``end_date`` is inclusive unless
+    ``end_exclusive`` is set.
+    """
+    if isinstance(company, (QuerySet, list, tuple, set, frozenset)):
+        entries = GeneralLedger.objects.filter(CompanyID__in=company)
+    else:
+        entries = GeneralLedger.objects.filter(CompanyID=company)
+
+    if start_date is not None:
+        entries = entries.filter(TransactionDate__gte=start_date)
+    if end_date is not None:
+        if end_exclusive:
+            entries = entries.filter(TransactionDate__lt=end_date)
+        else:
+            entries = entries.filter(TransactionDate__lte=end_date)
+    return entries
+
+
+def grouped_totals_query(entries, group_field):
+    """Return the ``(group_field, debit, credit)`` GROUP BY queryset over ``entries``."""
+    return (
+        entries.order_by()
+        .values(group_field)
+        .annotate(
+            debit=Coalesce(Sum('DebitAmount'), _zero()),
+            credit=Coalesce(Sum('CreditAmount'), _zero()),
+        )
+        .values_list(group_field, 'debit', 'credit')
+    )
+
+
+def _grouped_totals(entries, group_field):
+    rows = grouped_totals_query(entries, group_field)
+    return {key: AccountBalance(debit, credit) for key, debit, credit in rows}
+
+
+def _balances_as_of(company, end_date, end_exclusive, group_field, filters):
+    """
+    Snapshot totals before the cutoff day plus the ledger tail on that day.
+
+    Runs one snapshot query, plus one ledger query when ``end_date`` is set.
+    """
+    if end_date is None:
+        latest = snapshots.latest_snapshots(company)
+        tail = None
+    else:
+        cutoff = snapshots.as_cutoff(end_date)
+        cutoff_day = snapshots.snapshot_day(cutoff)
+        latest = snapshots.latest_snapshots(company, before_day=cutoff_day)
+        tail = ledger_entries(company, snapshots.day_start(cutoff_day), cutoff, end_exclusive).filter(**filters)
+
+    totals = {
+        key: AccountBalance(debit, credit)
+        for key, (debit, credit) in snapshots.snapshot_totals(latest.filter(**filters), group_field).items()
+    }
+    if tail is not None:
+        for key, balance in _grouped_totals(tail, group_field).items():
+            totals[key] = totals.get(key, EMPTY_BALANCE) + balance
+    return totals
+
+
+def _balances(company, start_date, end_date, end_exclusive, group_field, filters):
+    if start_date is None and snapshots.snapshots_enabled():
+        return _balances_as_of(company, end_date, end_exclusive, group_field, filters)
+    entries = ledger_entries(company, start_date, end_date, end_exclusive).filter(**filters)
+    return _grouped_totals(entries, group_field)
+
+
+def account_balances(company, start_date=None, end_date=None, account_ids=None, account_types=None,
+                     end_exclusive=False):
+    """
+    Return ``{AccountID: AccountBalance}`` for every account with activity.
+
+    Accounts without ledger entries in the window are absent from the map;
+    use ``balances.get(account_id, EMPTY_BALANCE)`` when reading it.
+    Prefer ``account_types`` over long ``account_ids`` lists so SQL Server is
+    not handed hundreds of IN parameters. A windowed call runs exactly one
+    grouped ledger query; a balance as of ``end_date`` reads the snapshot
+    table plus the entries of the cutoff day (two queries).
+    """
+    filters = {}
+    if account_ids is not None:
+        filters['AccountID__in'] = account_ids
+    if account_types is not None:
+        filters['AccountID__AccountType__in'] = account_types
+    return _balances(company, start_date, end_date, end_exclusive, 'AccountID', filters)
+
+
+def account_type_balances(company, start_date=None, end_date=None, end_exclusive=False):
+    """
+    Return ``{AccountType: AccountBalance}`` summed over all accounts of each type.
+
+    Joined to ChartOfAccounts for the type; see ``account_balances`` for the
+    query count.
+    """
+    return _balances(company, start_date, end_date, end_exclusive, 'AccountID__AccountType', {})
+
+
+def build_report_items(accounts, balances):
+    """
+    Turn accounts and a balance map into report line items.
+
+    Returns ``(items, total)`` where items match FinancialReportItemSerializer.
+    """
+    items = []
+    total = ZERO
+    for account in accounts:
+        balance = balances.get(account.AccountID, EMPTY_BALANCE).normal_balance(account.AccountType)
+        items.append({
+            'account_type': account.AccountType,
+            'account_name': account.AccountName,
+            'balance': balance,
+        })
+        total += balance
+    return items, total
+
+
+# --- time series -------------------------------------------------------------
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter')
+
+
+def period_start(day, granularity):
+    """Return the first day of the ``granularity`` bucket containing ``day`` (weeks start on Monday)."""
+    if granularity == 'day':
+        return day
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'quarter':
+        return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    raise ValueError(f"Unknown granularity '{granularity}'; use one of {', '.join(GRANULARITIES)}")
+
+
+def next_period_start(start, granularity):
+    """Return the first day of the bucket after the one starting on ``start``."""
+    if granularity == 'day':
+        return start + timedelta(days=1)
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    months = 1 if granularity == 'month' else 3
+    month_index = start.year * 12 + start.month - 1 + months
+    return start.replace(year=month_index // 12, month=month_index % 12 + 1, day=1)
+
+
+def period_count(start_date, end_date, granularity):
+    """
+    Return how many buckets ``period_starts`` would list, without building them.
+
+    Raises OverflowError near ``date.min`` (a week starting before year 1).
+    """
+    first, last = period_start(start_date, granularity), period_start(end_date, granularity)
+    if last < first:
+        return 0
+    if granularity == 'day':
+        return (last - first).days + 1
+    if granularity == 'week':
+        return (last - first).days // 7 + 1
+    months = 1 if granularity == 'month' else 3
+    return ((last.year - first.year) * 12 + last.month - first.month) // months + 1
+
+
+def period_starts(start_date, end_date, granularity):
+    """
+    List the bucket start dates covering ``start_date``..``end_date`` (inclusive).
+
+    Check ``period_count`` first for user supplied ranges. Raises
+    OverflowError or ValueError when the bucket after the last one would
+    start after ``date.max``.
+    """
+    starts = []
+    current = period_start(start_date, granularity)
+    while current <= end_date:
+        starts.append(current)
+        current = next_period_start(current, granularity)
+    return starts
+
+
+def period_type_balances(company, start_date, end_date, granularity, account_types=None):
+    """
+    Return ``{(bucket_start, AccountType): AccountBalance}`` for whole buckets.
+
+    ``start_date`` and ``end_date`` are dates; the window is widened to the
+    buckets that contain them. Buckets follow the default time zone, like the
+    date bounds in ``snapshots.as_cutoff``. Runs one
+    ``GROUP BY Trunc(TransactionDate), AccountType`` query; empty buckets are
+    absent from the map (see ``period_starts``).
+    """
+    first = period_start(start_date, granularity)
+    after_last = next_period_start(period_start(end_date, granularity), granularity)
+    entries = ledger_entries(
+        company, snapshots.as_cutoff(first), snapshots.as_cutoff(after_last), end_exclusive=True
+    )
+    if account_types is not None:
+        entries = entries.filter(AccountID__AccountType__in=account_types)
+    tz = timezone.get_default_timezone()
+    rows = (
+        entries.order_by()
+        .annotate(period=Trunc('TransactionDate', granularity, tzinfo=tz))
+        .values('period', 'AccountID__AccountType')
+        .annotate(
+            debit=Coalesce(Sum('DebitAmount'), _zero()),
+            credit=Coalesce(Sum('CreditAmount'), _zero()),
+        )
+        .values_list('period', 'AccountID__AccountType', 'debit', 'credit')
+    )
+    totals = {}
+    for period, account_type, debit, credit in rows:
+        key = (timezone.localtime(period, tz).date(), account_type)
+        totals[key] = totals.get(key, EMPTY_BALANCE) + AccountBalance(debit, credit)
+    return totals
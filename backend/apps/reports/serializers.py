@@ -44,3 +44,19 @@ class CashFlowSerializer(serializers.Serializer):
     net_cash_change = serializers.DecimalField(max_digits=18, decimal_places=2)
     beginning_cash_balance = serializers.DecimalField(max_digits=18, decimal_places=2)
     ending_cash_balance = serializers.DecimalField(max_digits=18, decimal_places=2)
+
+class TimeSeriesPointSerializer(serializers.Serializer):
+    """Serializer for one bucket of a revenue/expense time series"""
+    period = serializers.DateField()
+    revenue = serializers.DecimalField(max_digits=18, decimal_places=2)
+    expenses = serializers.DecimalField(max_digits=18, decimal_places=2)
+    net = serializers.DecimalField(max_digits=18, decimal_places=2)
+    by_type = serializers.DictField(child=serializers.DecimalField(max_digits=18, decimal_places=2))
+
+class TimeSeriesSerializer(serializers.Serializer):
+    """Serializer for time series report data"""
+    granularity = serializers.CharField()
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    account_types = serializers.ListField(child=serializers.CharField())
+    points = TimeSeriesPointSerializer(many=True)
@@ -0,0 +1,212 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from apps.accounting.models import ChartOfAccount, GeneralLedger
+from apps.accounts.models import Company, User, UserCompanyRole
+
+from . import engine
+
+
+def _at(year, month, day):
+    return timezone.make_aware(datetime(year, month, day, 12, 0))
+
+
+class ReportEngineTests(APITestCase):
+    """Balances for every report come from one grouped ledger query."""
+
+    def setUp(self):  # noqa: D401
+        """Create a company with a small chart of accounts and ledger."""
+        self.user = User.objects.create_user(username="owner", password="pass1234")
+        self.company = Company.objects.create(CompanyName="Acme LLC")
+        UserCompanyRole.objects.create(UserID=self.user, CompanyID=self.company, Role="owner")
+
+        self.cash = ChartOfAccount.objects.create(
+            CompanyID=self.company, AccountCode="1000", AccountName="Cash", AccountType="CURRENT_ASSET"
+        )
+        self.loan = ChartOfAccount.objects.create(
+            CompanyID=self.company, AccountCode="2000", AccountName="Loan", AccountType="LIABILITY"
+        )
+        self.sales = ChartOfAccount.objects.create(
+            CompanyID=self.company, AccountCode="4000", AccountName="Sales", AccountType="REVENUE"
+        )
+        self.rent = ChartOfAccount.objects.create(
+            CompanyID=self.company, AccountCode="5000", AccountName="Rent", AccountType="EXPENSE"
+        )
+
+        self._post(self.cash, _at(2024, 1, 5), debit="1000.00")
+        self._post(self.loan, _at(2024, 1, 5), credit="1000.00")
+        self._post(self.cash, _at(2024, 2, 10), debit="500.00")
+        self._post(self.sales, _at(2024, 2, 10), credit="500.00")
+        self._post(self.rent, _at(2024, 2, 20), debit="200.00")
+        self._post(self.cash, _at(2024, 2, 20), credit="200.00")
+
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+
+    def _post(self, account, when, debit="0.00", credit="0.00"):
+        GeneralLedger.objects.create(
+            CompanyID=self.company,
+            AccountID=account,
+            TransactionDate=when,
+            DebitAmount=Decimal(debit),
+            CreditAmount=Decimal(credit),
+        )
+
+    def test_account_balances_runs_constant_queries(self):
+        """A balance as of a date reads one snapshot query plus one cutoff-day ledger query."""
+        with CaptureQueriesContext(connection) as ctx:
+            balances = engine.account_balances(self.company, end_date=_at(2024, 12, 31))
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual(balances[self.cash.AccountID], engine.AccountBalance(Decimal("1500.00"), Decimal("200.00")))
+        self.assertEqual(balances[self.loan.AccountID].normal_balance("LIABILITY"), Decimal("1000.00"))
+
+    def test_account_balances_respects_date_window(self):
+        """Entries outside the window are excluded from the map."""
+        balances = engine.account_balances(
+            self.company, start_date=_at(2024, 2, 1), end_date=_at(2024, 2, 15)
+        )
+        self.assertNotIn(self.loan.AccountID, balances)
+        self.assertNotIn(self.rent.AccountID, balances)
+        self.assertEqual(balances[self.sales.AccountID].normal_balance("REVENUE"), Decimal("500.00"))
+
+    def test_balance_sheet_query_count_is_constant(self):
+        """The balance sheet no longer issues two queries per account or scans the ledger history."""
+        for code in range(6000, 6020):
+            ChartOfAccount.objects.create(
+                CompanyID=self.company, AccountCode=str(code), AccountName=f"Asset {code}", AccountType="ASSET"
+            )
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api_client.get(reverse("balance-sheet"), {"end_date": "2024-12-31"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ledger_queries = [q for q in ctx.captured_queries if '"GeneralLedger"' in q["sql"]]
+        snapshot_queries = [q for q in ctx.captured_queries if 'FROM "AccountBalanceSnapshots"' in q["sql"]]
+        account_queries = [q for q in ctx.captured_queries if 'FROM "ChartOfAccounts"' in q["sql"]]
+        self.assertEqual(len(ledger_queries), 1)
+        self.assertEqual(len(snapshot_queries), 1)
+        self.assertEqual(len(account_queries), 1)
+        self.assertEqual(Decimal(response.json()["total_assets"]), Decimal("1300.00"))
+        self.assertEqual(Decimal(response.json()["total_liabilities"]), Decimal("1000.00"))
+
+    def test_income_statement_totals(self):
+        """Revenue and expense totals are signed by their normal side."""
+        response = self.api_client.get(
+            reverse("income-statement"), {"start_date": "2024-02-01", "end_date": "2024-02-28"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        payload = response.json()
+        self.assertEqual(Decimal(payload["total_revenue"]), Decimal("500.00"))
+        self.assertEqual(Decimal(payload["total_expenses"]), Decimal("200.00"))
+        self.assertEqual(Decimal(payload["net_income"]), Decimal("300.00"))
+
+    def test_cash_flow_balances(self):
+        """Beginning and ending cash come from the shared engine."""
+        response = self.api_client.get(
+            reverse("cash-flow"), {"start_date": "2024-02-01", "end_date": "2024-02-28"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        payload = response.json()
+        self.assertEqual(Decimal(payload["beginning_cash_balance"]), Decimal("1000.00"))
+        self.assertEqual(Decimal(payload["ending_cash_balance"]), Decimal("1300.00"))
+        self.assertEqual(Decimal(payload["operating_activities"][0]["balance"]), Decimal("300.00"))
+
+    def test_time_series_fills_empty_buckets_with_one_query(self):
+        """Every month is returned, empty ones as zero, from a single grouped ledger query."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api_client.get(
+                reverse("time-series"), {"start_date": "2023-12-15", "end_date": "2024-03-10"}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ledger_queries = [q for q in ctx.captured_queries if '"GeneralLedger"' in q["sql"]]
+        self.assertEqual(len(ledger_queries), 1)
+
+        payload = response.json()
+        self.assertEqual((payload["start_date"], payload["end_date"]), ("2023-12-01", "2024-03-31"))
+        points = {point["period"]: point for point in payload["points"]}
+        self.assertEqual(list(points), ["2023-12-01", "2024-01-01", "2024-02-01", "2024-03-01"])
+        self.assertEqual(Decimal(points["2024-01-01"]["net"]), Decimal("0"))
+        self.assertEqual(Decimal(points["2024-02-01"]["revenue"]), Decimal("500.00"))
+        self.assertEqual(Decimal(points["2024-02-01"]["expenses"]), Decimal("200.00"))
+        self.assertEqual(Decimal(points["2024-02-01"]["net"]), Decimal("300.00"))
+
+    def test_time_series_granularity_and_account_types(self):
+        """Quarterly buckets for any account type; unknown granularities are rejected."""
+        response = self.api_client.get(
+            reverse("time-series"),
+            {"start_date": "2024-01-01", "end_date": "2024-06-30", "granularity": "quarter",
+             "account_type": "current_asset,liability"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first_quarter = response.json()["points"][0]
+        self.assertEqual(first_quarter["period"], "2024-01-01")
+        self.assertEqual(Decimal(first_quarter["by_type"]["CURRENT_ASSET"]), Decimal("1300.00"))
+        self.assertEqual(Decimal(first_quarter["by_type"]["LIABILITY"]), Decimal("1000.00"))
+        self.assertEqual(len(response.json()["points"]), 2)
+
+        weekly = engine.period_type_balances(self.company, _at(2024, 2, 10).date(), _at(2024, 2, 20).date(), "week")
+        self.assertEqual(weekly[(_at(2024, 2, 5).date(), "REVENUE")].credit, Decimal("500.00"))
+        self.assertEqual(weekly[(_at(2024, 2, 19).date(), "EXPENSE")].debit, Decimal("200.00"))
+
+        response = self.api_client.get(reverse("time-series"), {"granularity": "hour"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_time_series_rejects_huge_and_out_of_range_windows(self):
+        """The bucket limit is checked before any bucket is built; ranges ending near date.max are a 400."""
+        with mock.patch.object(engine, "period_starts", wraps=engine.period_starts) as period_starts:
+            for params in (
+                {"start_date": "0001-01-01", "end_date": "9999-12-31", "granularity": "day"},
+                {"start_date": "2020-01-01", "end_date": "9999-12-31", "granularity": "month"},
+            ):
+                response = self.api_client.get(reverse("time-series"), params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn("Too many", response.json()["error"])
+        period_starts.assert_not_called()
+        self.assertEqual(engine.period_count(date(1, 1, 1), date(9999, 12, 31), "day"), 3652059)
+        self.assertEqual(engine.period_count(date(2020, 1, 1), date(9999, 12, 31), "month"), 95760)
+
+        for granularity in engine.GRANULARITIES:
+            response = self.api_client.get(
+                reverse("time-series"),
+                {"start_date": "9999-12-01", "end_date": "9999-12-31", "granularity": granularity},
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, granularity)
+            self.assertIn("out of range", response.json()["error"])
+
+    def test_general_ledger_export_streams_csv_and_ndjson(self):
+        """?export streams every filtered entry from one ledger query, without pagination."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api_client.get(
+                reverse("general-ledger"),
+                {"export": "csv", "start_date": "2024-02-01", "company_id": self.company.pk},
+            )
+            body = b"".join(response.streaming_content).decode("utf-8")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertIn("attachment;", response["Content-Disposition"])
+        ledger_queries = [q for q in ctx.captured_queries if '"GeneralLedger"' in q["sql"]]
+        self.assertEqual(len(ledger_queries), 1)
+
+        lines = body.strip().splitlines()
+        self.assertTrue(lines[0].startswith("id,transaction_date,company_id,account_id,account_code"))
+        self.assertEqual(len(lines), 1 + 4)
+        self.assertIn(",Sales,", lines[1] + lines[2])
+
+        response = self.api_client.get(reverse("general-ledger"), {"export": "ndjson"})
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode("utf-8").splitlines()]
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]["account_name"], "Cash")
+        self.assertEqual(Decimal(rows[0]["debit_amount"]), Decimal("1000.00"))
+
+        response = self.api_client.get(reverse("general-ledger"), {"export": "xlsx"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        other = Company.objects.create(CompanyName="Other LLC")
+        response = self.api_client.get(reverse("general-ledger"), {"export": "csv", "company_id": other.pk})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
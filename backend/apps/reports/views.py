@@ -2,21 +2,22 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
-from django.db.models import Sum, F, ExpressionWrapper, DecimalField, Q, Value, CharField
-from django.db.models.functions import Coalesce
 from django.utils import timezone
 from apps.accounting.models import GeneralLedger, ChartOfAccount
 from apps.accounts.models import UserCompanyRole
-from decimal import Decimal
+from apps.accounts.company_scope import get_company_scope
+from . import engine
 from .serializers import (
     ReportPeriodSerializer, 
     BalanceSheetSerializer, 
     IncomeStatementSerializer, 
     CashFlowSerializer,
-    FinancialReportItemSerializer
+    FinancialReportItemSerializer,
+    TimeSeriesSerializer
 )
-from datetime import datetime
-from rest_framework.pagination import PageNumberPagination
+from datetime import datetime, timedelta
+from lifeline_backend.exports import EXPORT_FORMATS, streaming_export
+from lifeline_backend.pagination import LedgerReportPagination
 from apps.accounting.serializers import GeneralLedgerSerializer
 
 
@@ -59,62 +60,22 @@ class BalanceSheetView(APIView):
                     status=status.HTTP_403_FORBIDDEN
                 )
         
-        # Get asset accounts
-        asset_accounts = ChartOfAccount.objects.filter(
-            CompanyID=company,
-            AccountType__in=['ASSET', 'CURRENT_ASSET', 'FIXED_ASSET']
+        # One query for the accounts, one grouped query for every balance
+        account_types = engine.ASSET_TYPES + engine.LIABILITY_TYPES + engine.EQUITY_TYPES
+        accounts = list(
+            ChartOfAccount.objects.filter(CompanyID=company, AccountType__in=account_types).order_by('AccountID')
         )
-        
-        # Get liability accounts
-        liability_accounts = ChartOfAccount.objects.filter(
-            CompanyID=company,
-            AccountType__in=['LIABILITY', 'CURRENT_LIABILITY', 'LONG_TERM_LIABILITY']
+        balances = engine.account_balances(company, end_date=end_date, account_types=account_types)
+
+        asset_items, total_assets = engine.build_report_items(
+            [a for a in accounts if a.AccountType in engine.ASSET_TYPES], balances
         )
-        
-        # Get equity accounts
-        equity_accounts = ChartOfAccount.objects.filter(
-            CompanyID=company,
-            AccountType__in=['EQUITY', 'RETAINED_EARNINGS']
+        liability_items, total_liabilities = engine.build_report_items(
+            [a for a in accounts if a.AccountType in engine.LIABILITY_TYPES], balances
+        )
+        equity_items, total_equity = engine.build_report_items(
+            [a for a in accounts if a.AccountType in engine.EQUITY_TYPES], balances
         )
-        
-        # Calculate balances for each account type
-        asset_items = []
-        liability_items = []
-        equity_items = []
-        
-        total_assets = Decimal('0')
-        total_liabilities = Decimal('0')
-        total_equity = Decimal('0')
-        
-        # Process asset accounts
-        for account in asset_accounts:
-            balance = self._calculate_account_balance(account, end_date)
-            asset_items.append({
-                'account_type': account.AccountType,
-                'account_name': account.AccountName,
-                'balance': balance
-            })
-            total_assets += balance
-            
-        # Process liability accounts
-        for account in liability_accounts:
-            balance = self._calculate_account_balance(account, end_date)
-            liability_items.append({
-                'account_type': account.AccountType,
-                'account_name': account.AccountName,
-                'balance': balance
-            })
-            total_liabilities += balance
-            
-        # Process equity accounts
-        for account in equity_accounts:
-            balance = self._calculate_account_balance(account, end_date)
-            equity_items.append({
-                'account_type': account.AccountType,
-                'account_name': account.AccountName,
-                'balance': balance
-            })
-            total_equity += balance
             
         # Prepare response data
         data = {
@@ -128,25 +89,6 @@ class BalanceSheetView(APIView):
         
         serializer = BalanceSheetSerializer(data)
         return Response(serializer.data)
-    
-    def _calculate_account_balance(self, account, end_date):
-        """Helper method to calculate account balance up to a specific date"""
-        gl_entries = GeneralLedger.objects.filter(
-            AccountID=account,
-            TransactionDate__lte=end_date
-        )
-        
-        debits = gl_entries.aggregate(total=Coalesce(Sum('DebitAmount'), Value(Decimal('0'), output_field=DecimalField())))['total']
-        credits = gl_entries.aggregate(total=Coalesce(Sum('CreditAmount'), Value(Decimal('0'), output_field=DecimalField())))['total']
-        
-        if account.AccountType in ['ASSET', 'CURRENT_ASSET', 'FIXED_ASSET', 'EXPENSE']:
-            # Debit accounts: debit increases, credit decreases
-            balance = debits - credits
-        else:
-            # Credit accounts: credit increases, debit decreases
-            balance = credits - debits
-            
-        return balance
 
 
 class IncomeStatementView(APIView):
@@ -196,44 +138,21 @@ class IncomeStatementView(APIView):
                     status=status.HTTP_403_FORBIDDEN
                 )
         
-        # Get revenue accounts
-        revenue_accounts = ChartOfAccount.objects.filter(
-            CompanyID=company,
-            AccountType='REVENUE'
+        # One query for the accounts, one grouped query for every balance
+        account_types = engine.REVENUE_TYPES + engine.EXPENSE_TYPES
+        accounts = list(
+            ChartOfAccount.objects.filter(CompanyID=company, AccountType__in=account_types).order_by('AccountID')
         )
-        
-        # Get expense accounts
-        expense_accounts = ChartOfAccount.objects.filter(
-            CompanyID=company,
-            AccountType='EXPENSE'
+        balances = engine.account_balances(
+            company, start_date=start_date, end_date=end_date, account_types=account_types
+        )
+
+        revenue_items, total_revenue = engine.build_report_items(
+            [a for a in accounts if a.AccountType in engine.REVENUE_TYPES], balances
+        )
+        expense_items, total_expenses = engine.build_report_items(
+            [a for a in accounts if a.AccountType in engine.EXPENSE_TYPES], balances
         )
-        
-        # Calculate balances for each account type
-        revenue_items = []
-        expense_items = []
-        
-        total_revenue = Decimal('0')
-        total_expenses = Decimal('0')
-        
-        # Process revenue accounts
-        for account in revenue_accounts:
-            balance = self._calculate_account_balance(account, start_date, end_date)
-            revenue_items.append({
-                'account_type': account.AccountType,
-                'account_name': account.AccountName,
-                'balance': balance
-            })
-            total_revenue += balance
-            
-        # Process expense accounts
-        for account in expense_accounts:
-            balance = self._calculate_account_balance(account, start_date, end_date)
-            expense_items.append({
-                'account_type': account.AccountType,
-                'account_name': account.AccountName,
-                'balance': balance
-            })
-            total_expenses += balance
             
         # Calculate net income
         net_income = total_revenue - total_expenses
@@ -249,26 +168,6 @@ class IncomeStatementView(APIView):
         
         serializer = IncomeStatementSerializer(data)
         return Response(serializer.data)
-    
-    def _calculate_account_balance(self, account, start_date, end_date):
-        """Helper method to calculate account balance between dates"""
-        gl_entries = GeneralLedger.objects.filter(
-            AccountID=account,
-            TransactionDate__gte=start_date,
-            TransactionDate__lte=end_date
-        )
-        
-        debits = gl_entries.aggregate(total=Coalesce(Sum('DebitAmount'), Value(Decimal('0'), output_field=DecimalField())))['total']
-        credits = gl_entries.aggregate(total=Coalesce(Sum('CreditAmount'), Value(Decimal('0'), output_field=DecimalField())))['total']
-        
-        if account.AccountType == 'REVENUE':
-            # Revenue is a credit account
-            balance = credits - debits
-        else:
-            # Expense is a debit account
-            balance = debits - credits
-            
-        return balance
 
 
 class CashFlowView(APIView):
@@ -319,23 +218,24 @@ class CashFlowView(APIView):
                 )
         
         # Get cash accounts
-        cash_accounts = ChartOfAccount.objects.filter(
-            CompanyID=company,
-            AccountType='CURRENT_ASSET',
-            AccountName__icontains='cash'
+        cash_account_ids = list(
+            ChartOfAccount.objects.filter(
+                CompanyID=company,
+                AccountType='CURRENT_ASSET',
+                AccountName__icontains='cash'
+            ).values_list('AccountID', flat=True)
         )
         
-        if not cash_accounts.exists():
+        if not cash_account_ids:
             return Response(
                 {"error": "No cash accounts found for cash flow analysis"},
                 status=status.HTTP_404_NOT_FOUND
             )
             
         # Calculate beginning cash balance
-        beginning_cash_balance = Decimal('0')
-        for account in cash_accounts:
-            beginning_balance = self._calculate_account_balance(account, None, start_date - timezone.timedelta(days=1))
-            beginning_cash_balance += beginning_balance
+        beginning_cash_balance = self._cash_balance(
+            company, cash_account_ids, start_date - timezone.timedelta(days=1)
+        )
             
         # Simplified cash flow categories
         operating_activities = [
@@ -351,10 +251,7 @@ class CashFlowView(APIView):
         financing_activities = []
         
         # Calculate ending cash balance
-        ending_cash_balance = Decimal('0')
-        for account in cash_accounts:
-            ending_balance = self._calculate_account_balance(account, None, end_date)
-            ending_cash_balance += ending_balance
+        ending_cash_balance = self._cash_balance(company, cash_account_ids, end_date)
             
         # Net cash change
         net_cash_change = ending_cash_balance - beginning_cash_balance
@@ -372,63 +269,49 @@ class CashFlowView(APIView):
         serializer = CashFlowSerializer(data)
         return Response(serializer.data)
     
-    def _calculate_account_balance(self, account, start_date=None, end_date=None):
-        """Helper method to calculate account balance between dates"""
-        gl_entries = GeneralLedger.objects.filter(AccountID=account)
-        
-        if start_date:
-            gl_entries = gl_entries.filter(TransactionDate__gte=start_date)
-            
-        if end_date:
-            gl_entries = gl_entries.filter(TransactionDate__lte=end_date)
-        
-        debits = gl_entries.aggregate(total=Coalesce(Sum('DebitAmount'), Value(Decimal('0'), output_field=DecimalField())))['total']
-        credits = gl_entries.aggregate(total=Coalesce(Sum('CreditAmount'), Value(Decimal('0'), output_field=DecimalField())))['total']
-        
+    def _cash_balance(self, company, cash_account_ids, end_date):
+        """Helper method to total the cash accounts as of a date"""
+        balances = engine.account_balances(company, end_date=end_date, account_ids=cash_account_ids)
         # Cash is an asset account
-        balance = debits - credits
-        return balance
+        return sum(
+            (balance.normal_balance('CURRENT_ASSET') for balance in balances.values()),
+            engine.ZERO
+        )
     
     def _calculate_net_income(self, company, start_date, end_date):
         """Helper method to calculate net income for the period"""
-        # Get revenue entries
-        revenue_accounts = ChartOfAccount.objects.filter(
-            CompanyID=company,
-            AccountType='REVENUE'
-        )
-        
-        revenue_entries = GeneralLedger.objects.filter(
-            AccountID__in=revenue_accounts,
-            TransactionDate__gte=start_date,
-            TransactionDate__lte=end_date
-        )
-        
-        # Get expense entries
-        expense_accounts = ChartOfAccount.objects.filter(
-            CompanyID=company,
-            AccountType='EXPENSE'
-        )
-        
-        expense_entries = GeneralLedger.objects.filter(
-            AccountID__in=expense_accounts,
-            TransactionDate__gte=start_date,
-            TransactionDate__lte=end_date
-        )
-        
-        # Calculate net income
-        revenue = revenue_entries.aggregate(
-            total=Coalesce(Sum(F('CreditAmount') - F('DebitAmount')), Value(Decimal('0'), output_field=DecimalField()))
-        )['total']
-        
-        expenses = expense_entries.aggregate(
-            total=Coalesce(Sum(F('DebitAmount') - F('CreditAmount')), Value(Decimal('0'), output_field=DecimalField()))
-        )['total']
-        
+        by_type = engine.account_type_balances(company, start_date=start_date, end_date=end_date)
+        revenue = by_type.get('REVENUE', engine.EMPTY_BALANCE).normal_balance('REVENUE')
+        expenses = by_type.get('EXPENSE', engine.EMPTY_BALANCE).normal_balance('EXPENSE')
         return revenue - expenses
 
 
 class GeneralLedgerReportView(APIView):
+    """
+    General ledger entries of the user's companies, newest first.
+
+    Filters: ``start_date``, ``end_date`` and ``company_id``. Pages of 50 by
+    default (``?cursor=`` for keyset paging). ``?export=csv`` or
+    ``?export=ndjson`` streams every matching entry instead, oldest first,
+    straight from a server-side cursor in constant memory.
+    """
     permission_classes = [IsAuthenticated]
+    export_fields = (
+        ('id', 'TransactionID'),
+        ('transaction_date', 'TransactionDate'),
+        ('company_id', 'CompanyID'),
+        ('account_id', 'AccountID'),
+        ('account_code', 'AccountID__AccountCode'),
+        ('account_name', 'AccountID__AccountName'),
+        ('description', 'Description'),
+        ('debit_amount', 'DebitAmount'),
+        ('credit_amount', 'CreditAmount'),
+        ('currency_code', 'CurrencyCode'),
+        ('exchange_rate', 'ExchangeRate'),
+        ('user_id', 'UserID'),
+        ('created_date', 'CreatedDate'),
+    )
+    export_chunk_size = 2000
 
     def get(self, request):
         try:
@@ -436,7 +319,25 @@ class GeneralLedgerReportView(APIView):
             start_date = request.query_params.get('start_date')
             end_date = request.query_params.get('end_date')
 
-            entries = GeneralLedger.objects.filter(CompanyID__usercompanyrole__UserID=request.user)
+            export_format = request.query_params.get('export')
+            if export_format and export_format not in EXPORT_FORMATS:
+                return Response(
+                    {'error': f"Invalid export format. Use one of: {', '.join(EXPORT_FORMATS)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # Company ids come from the cached scope rather than a join on UserCompanyRole
+            scope = get_company_scope(request)
+            company_id = request.query_params.get('company_id')
+            if company_id:
+                if not scope.has_access(company_id):
+                    return Response(
+                        {"error": "Access denied to requested company"},
+                        status=status.HTTP_403_FORBIDDEN
+                    )
+                entries = GeneralLedger.objects.filter(CompanyID=int(company_id))
+            else:
+                entries = GeneralLedger.objects.filter(CompanyID__in=scope.allowed_company_ids)
 
             if start_date:
                 try:
@@ -452,10 +353,15 @@ class GeneralLedgerReportView(APIView):
                 except ValueError:
                     return Response({'error': 'Invalid end_date format'}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Paginate
-            paginator = PageNumberPagination()
-            paginator.page_size = 50
-            page = paginator.paginate_queryset(entries.order_by('-TransactionDate'), request)
+            if export_format:
+                return self._export(entries, export_format)
+
+            # Page numbers by default; ?cursor= switches to keyset paging on
+            # (TransactionDate, TransactionID) and ?count=false skips the COUNT(*)
+            paginator = LedgerReportPagination()
+            page = paginator.paginate_queryset(
+                entries.select_related('AccountID').order_by('-TransactionDate', '-TransactionID'), request
+            )
             serializer = GeneralLedgerSerializer(page, many=True)
             return paginator.get_paginated_response(serializer.data)
         except Exception as exc:
@@ -463,3 +369,111 @@ class GeneralLedgerReportView(APIView):
             tb = traceback.format_exc()
             # Return traceback in JSON for easier local debugging (do not enable in production)
             return Response({'error': str(exc), 'traceback': tb}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def _export(self, entries, export_format):
+        # Plain tuples from a server-side cursor: no model instances, no serializers
+        rows = (
+            entries.order_by('TransactionDate', 'TransactionID')
+            .values_list(*[column for _, column in self.export_fields])
+            .iterator(chunk_size=self.export_chunk_size)
+        )
+        header = [name for name, _ in self.export_fields]
+        filename = f"general-ledger-{timezone.localdate():%Y%m%d}"
+        return streaming_export(export_format, header, rows, filename)
+
+
+class TimeSeriesView(APIView):
+    """
+    Revenue, expenses and net per day, week, month or quarter.
+
+    Query parameters: ``granularity`` (day|week|month|quarter, default month),
+    ``start_date``/``end_date`` (ISO dates, default the last 12 months),
+    ``account_type`` (repeatable or comma separated, default revenue and
+    expense types) and ``company_id``. The window is widened to whole buckets,
+    every bucket is returned (empty ones as zero) and the whole series costs
+    a single grouped ledger query.
+    """
+    permission_classes = [IsAuthenticated]
+    max_buckets = 1000
+
+    def get(self, request):
+        granularity = request.query_params.get('granularity', 'month')
+        if granularity not in engine.GRANULARITIES:
+            return Response(
+                {"error": f"Invalid granularity. Use one of: {', '.join(engine.GRANULARITIES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            end_date = request.query_params.get('end_date')
+            end_date = datetime.fromisoformat(end_date).date() if end_date else timezone.localdate()
+            start_date = request.query_params.get('start_date')
+            if start_date:
+                start_date = datetime.fromisoformat(start_date).date()
+            else:
+                month_index = end_date.year * 12 + end_date.month - 12
+                start_date = end_date.replace(year=month_index // 12, month=month_index % 12 + 1, day=1)
+        except ValueError:
+            return Response(
+                {"error": "Invalid date format. Use ISO format (YYYY-MM-DD)"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if start_date > end_date:
+            return Response({"error": "End date must be after start date"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            count = engine.period_count(start_date, end_date, granularity)
+            if count > self.max_buckets:
+                return Response(
+                    {"error": f"Too many {granularity} buckets ({count}); the limit is {self.max_buckets}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            buckets = engine.period_starts(start_date, end_date, granularity)
+            period_end = engine.next_period_start(buckets[-1], granularity) - timedelta(days=1)
+        except (OverflowError, ValueError):
+            # The bucket after the last one (the exclusive bound of the ledger query) is past date.max
+            return Response(
+                {"error": f"Dates out of range for {granularity} buckets"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        scope = get_company_scope(request)
+        company_id = request.query_params.get('company_id') or scope.active_company_id
+        if company_id is None:
+            return Response({"error": "User has no company access"}, status=status.HTTP_403_FORBIDDEN)
+        if not scope.has_access(company_id):
+            return Response({"error": "Access denied to requested company"}, status=status.HTTP_403_FORBIDDEN)
+
+        account_types = [
+            account_type.strip().upper()
+            for value in request.query_params.getlist('account_type')
+            for account_type in value.split(',')
+            if account_type.strip()
+        ] or list(engine.REVENUE_TYPES + engine.EXPENSE_TYPES)
+
+        totals = engine.period_type_balances(int(company_id), start_date, end_date, granularity, account_types)
+
+        points = []
+        for bucket in buckets:
+            by_type = {
+                account_type: totals.get((bucket, account_type), engine.EMPTY_BALANCE).normal_balance(account_type)
+                for account_type in account_types
+            }
+            revenue = sum((by_type[t] for t in account_types if t in engine.REVENUE_TYPES), engine.ZERO)
+            expenses = sum((by_type[t] for t in account_types if t in engine.EXPENSE_TYPES), engine.ZERO)
+            points.append({
+                'period': bucket,
+                'revenue': revenue,
+                'expenses': expenses,
+                'net': revenue - expenses,
+                'by_type': by_type,
+            })
+
+        serializer = TimeSeriesSerializer({
+            'granularity': granularity,
+            'start_date': buckets[0],
+            'end_date': period_end,
+            'account_types': account_types,
+            'points': points,
+        })
+        return Response(serializer.data)
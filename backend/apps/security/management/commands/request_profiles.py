@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.security.profiling import diff_stats, format_stats, get_store, profiling_settings, sign_header
+
+
+class Command(BaseCommand):
+    help = 'List, dump and diff stored request profiles, or sign a header value that enables profiling'
+
+    def add_arguments(self, parser):
+        subcommands = parser.add_subparsers(dest='subcommand', required=True)
+
+        listing = subcommands.add_parser('list', help='List stored profiles, newest first')
+        listing.add_argument('--route', type=str, help='Only profiles of this URL name')
+        listing.add_argument('--limit', type=int, default=50, help='Show at most N profiles')
+
+        dump = subcommands.add_parser('dump', help='Print one profile')
+        dump.add_argument('profile_id')
+        dump.add_argument('--sort', default='cumulative', help='pstats sort key (cumulative, tottime, calls...)')
+        dump.add_argument('--limit', type=int, default=40, help='Functions to print')
+
+        diff = subcommands.add_parser('diff', help='Functions whose cumulative time changed most between two profiles')
+        diff.add_argument('before')
+        diff.add_argument('after')
+        diff.add_argument('--limit', type=int, default=30, help='Functions to print')
+
+        sign = subcommands.add_parser('sign', help='Print a header value that enables profiling')
+        sign.add_argument('--label', default='manual', help='Free text recorded in the signature')
+
+    def handle(self, *args, **options):
+        handler = getattr(self, f"handle_{options['subcommand']}")
+        try:
+            handler(get_store(), options)
+        except KeyError as exc:
+            raise CommandError(f'Profile {exc.args[0]} not found')
+
+    def handle_list(self, store, options):
+        profiles = [meta for meta in store.list() if not options['route'] or meta['route'] == options['route']]
+        if not profiles:
+            self.stdout.write('No profiles stored')
+            return
+        self.stdout.write(f"{'id':<26} {'route':<32} {'status':>6} {'ms':>9} {'queries':>8} {'db ms':>8} user")
+        for meta in profiles[:options['limit']]:
+            self.stdout.write(
+                f"{meta['id']:<26} {meta['method'] + ' ' + meta['route']:<32.32} {meta['status']:>6} "
+                f"{meta['duration_ms']:>9.1f} {meta['queries']:>8} {meta['db_ms']:>8.1f} {meta['user_id'] or '-'}"
+            )
+
+    def handle_dump(self, store, options):
+        meta = store.meta(options['profile_id'])
+        path = store.path(options['profile_id'])
+        self.stdout.write(
+            f"{meta['method']} {meta['path']} ({meta['route']}) -> {meta['status']} in {meta['duration_ms']} ms, "
+            f"{meta['queries']} queries / {meta['db_ms']} ms in the database"
+        )
+        if meta['format'] == 'prof':
+            self.stdout.write(format_stats(path, options['sort'], options['limit']))
+        else:
+            with open(path) as fh:
+                self.stdout.write(fh.read())
+
+    def handle_diff(self, store, options):
+        for profile_id in (options['before'], options['after']):
+            if store.meta(profile_id)['format'] != 'prof':
+                raise CommandError(f'Profile {profile_id} is not a cProfile profile; only those can be diffed')
+        rows = diff_stats(store.path(options['before']), store.path(options['after']), options['limit'])
+        self.stdout.write(f"{'before s':>10} {'after s':>10} {'change':>10}  function")
+        for func, before, after in rows:
+            self.stdout.write(f'{before:>10.4f} {after:>10.4f} {after - before:>+10.4f}  {func}')
+
+    def handle_sign(self, store, options):
+        config = profiling_settings()
+        self.stdout.write(f"{config['HEADER']}: {sign_header(options['label'])}")
+        self.stdout.write(f"(valid for {config['HEADER_MAX_AGE']} seconds)")
@@ -0,0 +1,231 @@
+"""
+Per-route latency and database metrics, exposed in the Prometheus text format.
+
+``RequestMetricsMiddleware`` times every request and, through
+``connection.execute_wrapper``, counts the SQL it sends: number of queries,
+time spent in the database, and repeats - the same statement with the same
+parameters (``duplicate``) or with different ones (``similar``, the shape of
+an N+1). Requests are labelled with their resolved URL name (``view_name``,
+including the namespace), never the raw path, and with their method, any
+non-standard one counted as ``OTHER``, so the label set stays small.
+
+``metrics_view`` serves the numbers at ``/api/metrics/`` to staff users.
+The registry is per process: with several workers, each reports its own
+counters, as with any Prometheus client without a shared store.
+
+Configured by ``settings.REQUEST_METRICS``; see ``DEFAULTS``.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.permissions import IsAdminUser
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Upper bounds (seconds) of the latency histogram buckets
+    'LATENCY_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    # Upper bounds of the queries-per-request histogram buckets
+    'QUERY_BUCKETS': (0, 1, 2, 5, 10, 20, 50, 100, 200),
+}
+
+UNRESOLVED = '<unresolved>'
+# Any other request method is labelled OTHER, so clients cannot add series
+METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE', 'CONNECT'))
+OTHER_METHOD = 'OTHER'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def metrics_settings():
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_METRICS', {})}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.values = {}
+
+    def inc(self, labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in sorted(self.values.items()):
+            yield f'{self.name}{_labels(self.labels, labels)} {_number(value)}'
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, labels, value):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 1) + [0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, series in sorted(self.values.items()):
+            cumulative = 0
+            for bound, observed in zip(self.buckets + ('+Inf',), series):
+                cumulative += observed
+                le = 'le="%s"' % bound
+                yield f'{self.name}_bucket{_labels(self.labels, labels, le)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labels, labels)} {_number(series[-1])}'
+            yield f'{self.name}_count{_labels(self.labels, labels)} {cumulative}'
+
+
+class MetricsRegistry:
+    """The process-wide request metrics; ``record`` and ``render`` are thread safe."""
+
+    def __init__(self, latency_buckets=DEFAULTS['LATENCY_BUCKETS'], query_buckets=DEFAULTS['QUERY_BUCKETS']):
+        self._lock = threading.Lock()
+        self.requests = Counter(
+            'lifeline_http_requests_total', 'Requests by route, method and status.', ('route', 'method', 'status'),
+        )
+        self.latency = Histogram(
+            'lifeline_http_request_duration_seconds', 'Request latency by route.', ('route', 'method'),
+            latency_buckets,
+        )
+        self.queries = Histogram(
+            'lifeline_db_queries_per_request', 'Database queries per request by route.', ('route', 'method'),
+            query_buckets,
+        )
+        self.db_time = Counter(
+            'lifeline_db_query_duration_seconds_total', 'Seconds spent in database queries by route.',
+            ('route', 'method'),
+        )
+        self.duplicates = Counter(
+            'lifeline_db_duplicate_queries_total',
+            'Queries repeating an earlier statement of the same request with the same parameters.',
+            ('route', 'method'),
+        )
+        self.similar = Counter(
+            'lifeline_db_similar_queries_total',
+            'Queries repeating an earlier statement of the same request with other parameters (N+1).',
+            ('route', 'method'),
+        )
+
+    def record(self, route, method, status, duration, recorder):
+        labels = (route, method)
+        with self._lock:
+            self.requests.inc((route, method, str(status)))
+            self.latency.observe(labels, duration)
+            self.queries.observe(labels, recorder.count)
+            self.db_time.inc(labels, recorder.duration)
+            if recorder.duplicates:
+                self.duplicates.inc(labels, recorder.duplicates)
+            if recorder.similar:
+                self.similar.inc(labels, recorder.similar)
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.latency, self.queries, self.db_time, self.duplicates, self.similar):
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` hook counting and timing one request's queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.duplicates = 0
+        self.similar = 0
+        self._seen = set()
+        self._statements = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            try:
+                key = (sql, repr(params))
+            except Exception:
+                key = (sql, id(params))
+            if key in self._seen:
+                self.duplicates += 1
+            elif sql in self._statements:
+                self.similar += 1
+            self._seen.add(key)
+            self._statements.add(sql)
+
+
+registry = MetricsRegistry(metrics_settings()['LATENCY_BUCKETS'], metrics_settings()['QUERY_BUCKETS'])
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return (match.view_name or match.route or UNRESOLVED) if match else UNRESOLVED
+
+
+def method_label(request):
+    return request.method if request.method in METHODS else OTHER_METHOD
+
+
+class RequestMetricsMiddleware:
+    """
+    Record latency and database activity per resolved route into ``registry``.
+
+    Goes near the top of MIDDLEWARE so the latency covers the rest of the stack.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metrics_settings()['ENABLED']:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        registry.record(route_name(request), method_label(request), response.status_code, duration, recorder)
+        return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@throttle_classes([])
+def metrics_view(request):
+    """Prometheus scrape endpoint (staff only)."""
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
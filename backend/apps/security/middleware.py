@@ -1,7 +1,8 @@
 import logging
 from django.http import JsonResponse
-from django.core.cache import cache
+from lifeline_backend.cache import THROTTLING, tier
 import time
+from .ratelimit import get_limiter, rate_limit_settings, route_budget
 
 logger = logging.getLogger(__name__)
 
@@ -25,9 +26,12 @@ class FedRAMPSecurityMiddleware:
             return JsonResponse({'error': 'Access temporarily restricted'}, status=429)
         
         # Rate limiting check
-        if self.is_rate_limited(client_ip):
+        decision = self.is_rate_limited(client_ip, request.path)
+        if decision:
             logger.warning(f"Rate limit exceeded for {client_ip}")
-            return JsonResponse({'error': 'Too many requests'}, status=429)
+            response = JsonResponse({'error': 'Too many requests'}, status=429)
+            response['Retry-After'] = str(decision.retry_after)
+            return response
         
         response = self.get_response(request)
         
@@ -52,16 +56,20 @@ class FedRAMPSecurityMiddleware:
 
     def is_ip_blocked(self, ip):
         """Check if IP is temporarily blocked due to failed attempts"""
-        return cache.get(f"blocked_ip_{ip}", False)
+        return tier(THROTTLING).get(f"blocked_ip_{ip}", False)
 
-    def is_rate_limited(self, ip):
-        """Basic rate limiting - 100 requests per minute"""
-        cache_key = f"rate_limit_{ip}"
-        requests = cache.get(cache_key, 0)
-        if requests > 100:
-            return True
-        cache.set(cache_key, requests + 1, 60)  # 1 minute window
-        return False
+    def is_rate_limited(self, ip, path='/'):
+        """
+        Count the request against the IP's budget for ``path`` (one atomic cache hit).
+
+        Returns the rejecting ``ratelimit.Decision``, or None when the request may proceed.
+        """
+        config = rate_limit_settings()
+        if not config['ENABLED']:
+            return None
+        scope, limit, window = route_budget(path, config)
+        decision = get_limiter(config).hit(scope, ip, limit, window)
+        return None if decision.allowed else decision
 
     def add_security_headers(self, response):
         """Add FedRAMP-compliant security headers"""
@@ -77,7 +85,7 @@ class FedRAMPSecurityMiddleware:
 
     def block_ip(self, ip, duration=900):
         """Block an IP address for specified duration"""
-        cache.set(f"blocked_ip_{ip}", True, duration)
+        tier(THROTTLING).set(f"blocked_ip_{ip}", True, duration)
         logger.critical(f"IP {ip} blocked for {duration} seconds due to security violation")
 
 class AuditLoggingMiddleware:
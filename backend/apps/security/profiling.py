@@ -0,0 +1,294 @@
+"""
+Opt-in profiling of single requests, stored on disk for later diagnosis.
+
+A request is profiled when it carries a valid signed ``X-Lifeline-Profile``
+header (``python manage.py request_profiles sign``; the signature expires
+after ``HEADER_MAX_AGE`` seconds) or when its user is listed in
+``USER_IDS``. The user is taken from the session or, without one, from the
+``user_id`` claim of the JWT access token (header or cookie), verified but
+without a database lookup.
+
+The whole request is profiled - middleware below ``RequestProfilingMiddleware``,
+authentication, the view, serialization and the ORM - with cProfile or, when
+``ENGINE`` is ``'pyinstrument'`` and it is installed, the pyinstrument
+sampling profiler. Each profile goes to ``ProfileStore`` with its route,
+user, latency and query count, and its id is returned in the
+``X-Profile-ID`` response header so a slow report can point at it.
+
+The store is bounded by ``MAX_PROFILES`` and ``MAX_BYTES``; reading a
+profile marks it used, and the least recently used profiles are evicted
+first. ``request_profiles list|dump|diff`` reads it.
+
+Configured by ``settings.REQUEST_PROFILING``; see ``DEFAULTS``.
+"""
+import cProfile
+import io
+import json
+import logging
+import marshal
+import os
+import pstats
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.utils import timezone
+
+from .metrics import QueryRecorder, route_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ENGINE': 'cprofile',           # or 'pyinstrument' (sampling, must be installed)
+    'HEADER': 'X-Lifeline-Profile',
+    'HEADER_MAX_AGE': 3600,         # seconds a signed header value stays valid
+    'USER_IDS': [],                 # profile every request of these users
+    'DIRECTORY': os.path.join(settings.BASE_DIR, 'logs', 'profiles'),
+    'MAX_PROFILES': 200,
+    'MAX_BYTES': 200 * 1024 * 1024,
+}
+
+SIGNING_SALT = 'lifeline.request-profile'
+
+
+def profiling_settings():
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_PROFILING', {})}
+
+
+def sign_header(label='manual'):
+    """A header value enabling profiling for ``HEADER_MAX_AGE`` seconds."""
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(label)
+
+
+def header_label(value, max_age):
+    """The label of a valid signed header value, else None."""
+    try:
+        return signing.TimestampSigner(salt=SIGNING_SALT).unsign(value, max_age=max_age)
+    except signing.BadSignature:
+        return None
+
+
+class ProfileStore:
+    """
+    Profiles as ``<id>.prof`` (cProfile stats) or ``<id>.txt`` (pyinstrument
+    report) next to ``<id>.json`` metadata. A file's mtime is its last use.
+    """
+
+    def __init__(self, directory, max_profiles=200, max_bytes=200 * 1024 * 1024):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, profile_id, suffix):
+        if not profile_id or os.sep in profile_id or profile_id.startswith('.'):
+            raise KeyError(profile_id)
+        return os.path.join(self.directory, f'{profile_id}{suffix}')
+
+    def save(self, data, suffix, meta):
+        """Store one profile; returns its id."""
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = f"{timezone.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        with self._lock:
+            with open(self._path(profile_id, suffix), 'wb') as fh:
+                fh.write(data)
+            with open(self._path(profile_id, '.json'), 'w') as fh:
+                json.dump({**meta, 'id': profile_id, 'format': suffix[1:], 'bytes': len(data)}, fh)
+            self._evict()
+        return profile_id
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory) if os.path.isdir(self.directory) else ():
+            if name.endswith('.json'):
+                path = os.path.join(self.directory, name)
+                with open(path) as fh:
+                    meta = json.load(fh)
+                meta['last_used'] = os.path.getmtime(path)
+                entries.append(meta)
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda meta: meta['last_used'])
+        total = sum(meta['bytes'] for meta in entries)
+        while entries and (len(entries) > self.max_profiles or total > self.max_bytes):
+            oldest = entries.pop(0)
+            total -= oldest['bytes']
+            self.delete(oldest['id'])
+
+    def list(self):
+        """Metadata of every stored profile, newest first."""
+        return sorted(self._entries(), key=lambda meta: meta['id'], reverse=True)
+
+    def meta(self, profile_id):
+        try:
+            with open(self._path(profile_id, '.json')) as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            raise KeyError(profile_id) from None
+
+    def path(self, profile_id):
+        """The profile's data file, marking the profile as used."""
+        meta = self.meta(profile_id)
+        data_path = self._path(profile_id, f".{meta['format']}")
+        now = time.time()
+        for path in (data_path, self._path(profile_id, '.json')):
+            os.utime(path, (now, now))
+        return data_path
+
+    def delete(self, profile_id):
+        for suffix in ('.json', '.prof', '.txt'):
+            try:
+                os.remove(self._path(profile_id, suffix))
+            except FileNotFoundError:
+                pass
+
+
+def get_store(config=None):
+    config = config or profiling_settings()
+    return ProfileStore(config['DIRECTORY'], config['MAX_PROFILES'], config['MAX_BYTES'])
+
+
+class CProfileEngine:
+    suffix = '.prof'
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.profiler.create_stats()
+        # The format of pstats.Stats.dump_stats, which only writes to a path
+        return marshal.dumps(self.profiler.stats)
+
+
+class PyinstrumentEngine:
+    suffix = '.txt'
+
+    def __init__(self):
+        try:
+            from pyinstrument import Profiler
+        except ImportError as exc:
+            raise ImproperlyConfigured("REQUEST_PROFILING['ENGINE'] = 'pyinstrument' needs pyinstrument") from exc
+        self.profiler = Profiler(async_mode='disabled')
+
+    def start(self):
+        self.profiler.start()
+
+    def stop(self):
+        self.profiler.stop()
+        return self.profiler.output_text(unicode=True, show_all=False).encode()
+
+
+ENGINES = {'cprofile': CProfileEngine, 'pyinstrument': PyinstrumentEngine}
+
+
+def format_stats(path, sort='cumulative', limit=30):
+    """
+    The pstats report of a cProfile profile as one string. pstats writes in
+    small fragments, which a line-oriented stream such as a management
+    command's ``OutputWrapper`` would break onto separate lines.
+    """
+    stream = io.StringIO()
+    pstats.Stats(path, stream=stream).sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+def diff_stats(before_path, after_path, limit=30):
+    """
+    ``(function, before seconds, after seconds)`` rows ordered by the largest
+    change in cumulative time, for two cProfile profiles.
+    """
+    def cumulative(path):
+        stats = pstats.Stats(path, stream=io.StringIO()).stats
+        return {pstats.func_std_string(func): row[3] for func, row in stats.items()}
+
+    before, after = cumulative(before_path), cumulative(after_path)
+    rows = [(func, before.get(func, 0.0), after.get(func, 0.0)) for func in set(before) | set(after)]
+    rows.sort(key=lambda row: abs(row[2] - row[1]), reverse=True)
+    return rows[:limit]
+
+
+class RequestProfilingMiddleware:
+    """
+    Profile opted-in requests into the profile store (see module docstring).
+
+    Goes right after SessionMiddleware, so the session user is known and the
+    rest of the stack is profiled. Requests that are not opted in cost a
+    header lookup, plus a token check while ``USER_IDS`` is set.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._jwt = None
+
+    def __call__(self, request):
+        config = profiling_settings()
+        if not config['ENABLED'] or not self.should_profile(request, config):
+            return self.get_response(request)
+
+        engine = ENGINES[config['ENGINE']]()
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            engine.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                data = engine.stop()
+        duration = time.perf_counter() - started
+
+        user = getattr(request, 'user', None)
+        meta = {
+            'created': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.path,
+            'route': route_name(request),
+            'status': response.status_code,
+            'user_id': user.pk if user is not None and user.is_authenticated else None,
+            'duration_ms': round(duration * 1000, 2),
+            'queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 2),
+        }
+        try:
+            response['X-Profile-ID'] = get_store(config).save(data, engine.suffix, meta)
+        except OSError:
+            logger.exception("Could not store the profile of %s %s", request.method, request.path)
+        return response
+
+    def should_profile(self, request, config):
+        value = request.headers.get(config['HEADER'])
+        if value and header_label(value, config['HEADER_MAX_AGE']) is not None:
+            return True
+        return bool(config['USER_IDS']) and self.user_id(request) in config['USER_IDS']
+
+    def user_id(self, request):
+        """The requesting user's id from the session or the access token, without a query."""
+        session = getattr(request, 'session', None)
+        if session is not None and session.get('_auth_user_id'):
+            return int(session['_auth_user_id'])
+
+        from rest_framework_simplejwt.settings import api_settings
+        if self._jwt is None:
+            from apps.accounts.authentication import CachedJWTAuthentication
+            self._jwt = CachedJWTAuthentication()
+        header = self._jwt.get_header(request)
+        raw = self._jwt.get_raw_token(header) if header else None
+        raw = raw or request.COOKIES.get(settings.SIMPLE_JWT.get('ACCESS_TOKEN_COOKIE', 'access_token'))
+        if not raw:
+            return None
+        try:
+            return int(self._jwt.get_validated_token(raw)[api_settings.USER_ID_CLAIM])
+        except Exception:
+            return None
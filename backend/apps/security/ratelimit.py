@@ -0,0 +1,178 @@
+"""
+Fixed and sliding window rate limiting on atomic cache counters.
+
+Every budget is a counter per client (IP or user) and window, advanced with
+one atomic increment - ``cache.incr`` on Django caches (LocMemCache takes a
+lock, memcached and the database cache are atomic server side) or a single
+``MULTI``/``EXEC`` pipeline on Redis. The counters live in the shared cache,
+so every worker process enforces the same budget, and nothing is ever
+written back with ``cache.set`` (which raced and restarted the window).
+
+The sliding window is the two-counter approximation: the previous window's
+count is weighted by how much of it still overlaps the last ``window``
+seconds, which is smooth at window boundaries and needs no per-request log.
+
+Configured by ``settings.SECURITY_RATE_LIMITS``; see ``DEFAULTS``.
+"""
+import math
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'ALGORITHM': 'sliding',     # 'sliding' or 'fixed'
+    'DEFAULT': '100/m',         # per client IP, every request
+    'ROUTES': {},               # path prefix -> per-IP budget, replaces DEFAULT
+    'USER': None,               # per authenticated user (DRF throttle), e.g. '600/m'
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# ``count`` is the (estimated) number of requests in the window, this one included
+Decision = namedtuple('Decision', 'allowed count limit retry_after')
+
+
+def rate_limit_settings():
+    return {**DEFAULTS, **getattr(settings, 'SECURITY_RATE_LIMITS', {})}
+
+
+def parse_rate(rate):
+    """``'100/m'`` or ``'10/5s'`` -> ``(100, 60)`` / ``(10, 5)`` requests per seconds."""
+    count, period = rate.split('/')
+    multiplier = period[:-1] or '1'
+    return int(count), int(multiplier) * PERIODS[period[-1]]
+
+
+class CacheCounter:
+    """Window counters on any Django cache backend."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def incr(self, key, ttl, previous_key=None):
+        """
+        Atomically add one to ``key`` (created with ``ttl``) and return
+        ``(count, previous_count)``; ``previous_count`` is None without ``previous_key``.
+        """
+        try:
+            count = self.cache.incr(key)
+        except ValueError:
+            # First hit of the window; if another process created it meanwhile, count on it
+            count = 1 if self.cache.add(key, 1, ttl) else self.cache.incr(key)
+        previous = self.cache.get(previous_key, 0) if previous_key else None
+        return count, previous
+
+
+class RedisCounter:
+    """Window counters on a Redis client: one pipelined round trip per hit."""
+
+    def __init__(self, client, make_key=str):
+        self.client = client
+        self.make_key = make_key
+
+    def incr(self, key, ttl, previous_key=None):
+        key = self.make_key(key)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.incr(key)
+        pipe.expire(key, ttl)
+        if previous_key:
+            pipe.get(self.make_key(previous_key))
+        results = pipe.execute()
+        previous = int(results[2] or 0) if previous_key else None
+        return int(results[0]), previous
+
+
+def counter_for(cache):
+    """The Redis counter for Redis-backed caches, the generic cache counter otherwise."""
+    # lifeline_backend.cache.TieredCache: counters live in its shared L2 only
+    cache = getattr(cache, 'shared', cache)
+    redis_cache = getattr(cache, '_cache', None)
+    if redis_cache is not None and hasattr(redis_cache, 'get_client'):
+        # django.core.cache.backends.redis.RedisCache
+        return RedisCounter(redis_cache.get_client(write=True), cache.make_key)
+    client = getattr(cache, 'client', None)
+    if client is not None and hasattr(client, 'get_client'):
+        # django-redis
+        return RedisCounter(client.get_client(write=True), cache.make_key)
+    return CacheCounter(cache)
+
+
+class RateLimiter:
+    """Count hits per ``(scope, ident)`` against ``limit`` requests per ``window`` seconds."""
+
+    def __init__(self, counter, algorithm='sliding', clock=time.time):
+        if algorithm not in ('sliding', 'fixed'):
+            raise ValueError(f"Unknown rate limit algorithm '{algorithm}'")
+        self.counter = counter
+        self.algorithm = algorithm
+        self.clock = clock
+
+    def hit(self, scope, ident, limit, window):
+        """Record one request and return its ``Decision``."""
+        now = self.clock()
+        index = int(now // window)
+        elapsed = now - index * window
+        key = f'ratelimit:{scope}:{ident}:{window}:{index}'
+
+        if self.algorithm == 'fixed':
+            count, _ = self.counter.incr(key, window)
+            retry_after = window - elapsed
+            return Decision(count <= limit, count, limit, math.ceil(retry_after) if count > limit else 0)
+
+        count, previous = self.counter.incr(key, 2 * window, f'ratelimit:{scope}:{ident}:{window}:{index - 1}')
+        weight = 1 - elapsed / window
+        estimate = previous * weight + count
+        if estimate <= limit:
+            return Decision(True, math.ceil(estimate), limit, 0)
+        return Decision(False, math.ceil(estimate), limit, self._retry_after(count, previous, limit, window, elapsed))
+
+    @staticmethod
+    def _retry_after(count, previous, limit, window, elapsed):
+        """Seconds until the weighted estimate drops back to ``limit``."""
+        if count < limit and previous:
+            # Still inside this window: wait for the previous window to fade
+            wait = window * (1 - (limit - count) / previous) - elapsed
+        else:
+            # This window alone is over budget: wait until it has faded enough in the next one
+            wait = (window - elapsed) + window * (1 - limit / count)
+        return max(1, math.ceil(round(wait, 6)))
+
+
+def get_limiter(config=None):
+    config = config or rate_limit_settings()
+    return RateLimiter(counter_for(caches[config['CACHE']]), config['ALGORITHM'])
+
+
+def route_budget(path, config=None):
+    """``(scope, limit, window)`` for ``path``: the longest matching route prefix, else the default."""
+    config = config or rate_limit_settings()
+    prefixes = [prefix for prefix in config['ROUTES'] if path.startswith(prefix)]
+    if prefixes:
+        prefix = max(prefixes, key=len)
+        return (f'route:{prefix}', *parse_rate(config['ROUTES'][prefix]))
+    return ('ip', *parse_rate(config['DEFAULT']))
+
+
+class UserRateLimitThrottle(BaseThrottle):
+    """
+    DRF throttle for the per-user budget (``SECURITY_RATE_LIMITS['USER']``).
+
+    Runs after authentication, which the IP budgets in
+    ``FedRAMPSecurityMiddleware`` cannot; DRF turns ``wait()`` into Retry-After.
+    """
+
+    def allow_request(self, request, view):
+        config = rate_limit_settings()
+        user = getattr(request, 'user', None)
+        if not config['ENABLED'] or not config['USER'] or user is None or not user.is_authenticated:
+            return True
+        self.decision = get_limiter(config).hit('user', user.pk, *parse_rate(config['USER']))
+        return self.decision.allowed
+
+    def wait(self):
+        return self.decision.retry_after
@@ -0,0 +1,227 @@
+import io
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from lifeline_backend.cache import clear_all
+
+from .metrics import MetricsRegistry, QueryRecorder
+from .profiling import ProfileStore, sign_header
+from .middleware import FedRAMPSecurityMiddleware
+from .ratelimit import CacheCounter, RateLimiter, RedisCounter, parse_rate
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """The slice of the redis-py client the rate limiter uses; counts round trips."""
+
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def incr(self, key):
+        self.commands.append(('incr', key))
+
+    def expire(self, key, ttl):
+        self.commands.append(('expire', key))
+
+    def get(self, key):
+        self.commands.append(('get', key))
+
+    def execute(self):
+        self.redis.round_trips += 1
+        results = []
+        for command, key in self.commands:
+            if command == 'incr':
+                self.redis.data[key] = self.redis.data.get(key, 0) + 1
+                results.append(self.redis.data[key])
+            elif command == 'expire':
+                results.append(True)
+            else:
+                value = self.redis.data.get(key)
+                results.append(None if value is None else str(value).encode())
+        return results
+
+
+class RateLimiterTest(TestCase):
+    def setUp(self):  # noqa: D401
+        """Start every test with empty counters and a clock at the start of a minute."""
+        clear_all()
+        self.clock = FakeClock(60 * 20_000)
+
+    def test_fixed_window_counts_atomically_and_resets_per_window(self):
+        """Hits past the limit are refused until the next window, which starts from zero"""
+        limiter = RateLimiter(CacheCounter(cache), 'fixed', self.clock)
+        results = [limiter.hit('ip', '10.0.0.1', 3, 60).allowed for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+
+        self.clock.now += 45
+        self.assertEqual(limiter.hit('ip', '10.0.0.1', 3, 60).retry_after, 15)
+        self.clock.now += 15
+        self.assertTrue(limiter.hit('ip', '10.0.0.1', 3, 60).allowed)
+
+    def test_sliding_window_weights_the_previous_window(self):
+        """Right after a full window the previous count still applies, fading over the window"""
+        limiter = RateLimiter(CacheCounter(cache), 'sliding', self.clock)
+        for _ in range(10):
+            limiter.hit('ip', 'a', 10, 60)
+
+        self.clock.now += 60 + 15  # a quarter into the next window: 7.5 of 10 still count
+        decisions = [limiter.hit('ip', 'a', 10, 60) for _ in range(3)]
+        self.assertEqual([d.allowed for d in decisions], [True, True, False])
+        self.assertEqual(decisions[-1].retry_after, 3)  # 10 * 42/60 + 3 <= 10 at 18s in
+
+    def test_redis_counter_takes_one_round_trip_per_hit(self):
+        redis = FakeRedis()
+        limiter = RateLimiter(RedisCounter(redis), 'sliding', self.clock)
+        decisions = [limiter.hit('user', 7, *parse_rate('2/m')) for _ in range(3)]
+        self.assertEqual([d.allowed for d in decisions], [True, True, False])
+        self.assertEqual(redis.round_trips, 3)
+
+
+@override_settings(SECURITY_RATE_LIMITS={
+    'ENABLED': True, 'ALGORITHM': 'fixed', 'DEFAULT': '3/m', 'ROUTES': {'/token/': '1/m'},
+})
+class SecurityMiddlewareRateLimitTest(TestCase):
+    def setUp(self):  # noqa: D401
+        """A middleware around a view that always succeeds."""
+        clear_all()
+        self.factory = RequestFactory()
+        self.middleware = FedRAMPSecurityMiddleware(lambda request: HttpResponse('ok'))
+
+    def test_route_budget_replaces_the_default_and_sets_retry_after(self):
+        """Login-style routes get their own, smaller budget per IP; refusals carry Retry-After"""
+        first = self.middleware(self.factory.post('/token/'))
+        second = self.middleware(self.factory.post('/token/'))
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 429)
+        self.assertGreaterEqual(int(second['Retry-After']), 1)
+
+        statuses = [self.middleware(self.factory.get('/accounting/general-ledger/')).status_code for _ in range(4)]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+
+
+class RequestMetricsTest(TestCase):
+    def setUp(self):  # noqa: D401
+        """A fresh registry and a staff user to scrape it."""
+        clear_all()
+        self.registry = MetricsRegistry()
+        patcher = mock.patch('apps.security.metrics.registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.staff = User.objects.create_user(username='ops', password='pass1234', is_staff=True)
+
+    def test_requests_are_recorded_per_route_with_queries_and_repeats(self):
+        """Routes are labelled by URL name; repeated statements count as duplicate or similar"""
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for pk in (1, 1, 2):
+                User.objects.filter(pk=pk).first()
+        self.assertEqual((recorder.count, recorder.duplicates, recorder.similar), (3, 1, 1))
+
+        self.client.get(reverse('health_check'))
+        text = self.registry.render()
+        self.assertIn('lifeline_http_requests_total{route="health_check",method="GET",status="200"} 1', text)
+        self.assertIn('lifeline_db_queries_per_request_bucket{route="health_check",method="GET",le="1"} 1', text)
+        self.assertIn('lifeline_http_request_duration_seconds_count{route="health_check",method="GET"} 1', text)
+
+    def test_unknown_methods_share_one_label(self):
+        """Arbitrary verbs from clients cannot grow the label set"""
+        for method in ('PURGE', 'X-SCAN-1', 'X-SCAN-2'):
+            self.client.generic(method, reverse('health_check'))
+        self.client.get(reverse('health_check'))
+        text = self.registry.render()
+        self.assertIn('lifeline_http_request_duration_seconds_count{route="health_check",method="OTHER"} 3', text)
+        self.assertIn('lifeline_http_request_duration_seconds_count{route="health_check",method="GET"} 1', text)
+        self.assertNotIn('X-SCAN', text)
+
+    def test_metrics_endpoint_is_staff_only_prometheus_text(self):
+        client = APIClient()
+        self.assertIn(client.get('/api/metrics/').status_code, (401, 403))
+
+        client.force_authenticate(User.objects.create_user(username='clerk', password='pass1234'))
+        self.assertEqual(client.get('/api/metrics/').status_code, 403)
+
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        response = client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE lifeline_http_request_duration_seconds histogram', response.content.decode())
+
+
+class RequestProfilingTest(TestCase):
+    def setUp(self):  # noqa: D401
+        """Profiles go to a temporary directory."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.config = {'DIRECTORY': directory.name, 'USER_IDS': []}
+        self.store = ProfileStore(directory.name)
+
+    def get(self, **headers):
+        with override_settings(REQUEST_PROFILING=self.config):
+            return self.client.get(reverse('health_check'), **headers)
+
+    def command(self, *args):
+        out = io.StringIO()
+        with override_settings(REQUEST_PROFILING=self.config):
+            call_command('request_profiles', *args, stdout=out)
+        return out.getvalue()
+
+    def test_only_signed_header_requests_are_profiled(self):
+        self.assertNotIn('X-Profile-ID', self.get())
+        self.assertNotIn('X-Profile-ID', self.get(HTTP_X_LIFELINE_PROFILE='forged:value'))
+
+        response = self.get(HTTP_X_LIFELINE_PROFILE=sign_header('ticket-42'))
+        [meta] = self.store.list()
+        self.assertEqual(meta['id'], response['X-Profile-ID'])
+        self.assertEqual((meta['route'], meta['status'], meta['format']), ('health_check', 200, 'prof'))
+        self.assertGreaterEqual(meta['queries'], 1)
+
+        out = self.command('dump', meta['id'], '--limit', '5')
+        self.assertIn('health_check', out)
+        self.assertRegex(out, r'\d+ function calls .* in [\d.]+ seconds\n')
+        self.assertRegex(out, r'\n +ncalls +tottime +percall +cumtime +percall filename:lineno\(function\)\n')
+
+    def test_listed_users_are_profiled_and_profiles_can_be_diffed(self):
+        user = User.objects.create_user(username='slow', password='pass1234')
+        self.config['USER_IDS'] = [user.pk]
+        self.client.force_login(user)
+        first, second = self.get()['X-Profile-ID'], self.get()['X-Profile-ID']
+
+        self.assertIn('django/db/models/query.py', self.command('diff', first, second))
+        self.assertIn(first, self.command('list', '--route', 'health_check'))
+
+    def test_least_recently_used_profiles_are_evicted(self):
+        store = ProfileStore(self.store.directory, max_profiles=2)
+        first = store.save(b'a', '.txt', {})
+        second = store.save(b'b', '.txt', {})
+        store.path(first)  # reading marks it used
+        third = store.save(b'c', '.txt', {})
+        self.assertEqual({meta['id'] for meta in store.list()}, {first, third})
+        with self.assertRaises(KeyError):
+            store.meta(second)
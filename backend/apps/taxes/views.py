@@ -1,45 +1,20 @@
 from rest_framework import viewsets, permissions
 from rest_framework.exceptions import PermissionDenied
 
-from apps.accounts.models import Company
+from apps.accounts.company_scope import CompanyScopedMixin
 from .models import TaxRate, TaxTransaction
 from .serializers import TaxRateSerializer, TaxTransactionSerializer
 
 
-class _CompanyScopedViewSet(viewsets.ModelViewSet):
+class _CompanyScopedViewSet(CompanyScopedMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
-    def _company_queryset(self):
-        return Company.objects.filter(usercompanyrole__UserID=self.request.user)
-
-    def _get_active_company(self):
-        companies = self._company_queryset()
-        if not companies.exists():
-            return None
-
-        query_params = getattr(self.request, 'query_params', {})
-        request_data = getattr(self.request, 'data', {})
-
-        company_id = (
-            self.request.headers.get('X-Company-ID')
-            or query_params.get('CompanyID')
-            or request_data.get('CompanyID')
-        )
-
-        if company_id:
-            try:
-                return companies.get(CompanyID=company_id)
-            except (Company.DoesNotExist, ValueError):
-                raise PermissionDenied("You do not have access to this company.")
-
-        return companies.first()
-
     def get_queryset(self):
         queryset = super().get_queryset()
-        company = self._get_active_company()
-        if not company:
+        company_id = self._active_company_id()
+        if not company_id:
             return queryset.none()
-        return queryset.filter(CompanyID=company)
+        return queryset.filter(CompanyID=company_id)
 
     def _save_with_company(self, serializer):
         company = self._get_active_company()
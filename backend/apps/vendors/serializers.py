@@ -9,4 +9,4 @@ class VendorSerializer(serializers.ModelSerializer):
             'VendorID', 'CompanyID', 'Name', 'Email', 'Phone',
             'Address', 'PaymentTerms', 'VendorNotes', 'CreatedDate'
         ]
-        read_only_fields = ['VendorID', 'CreatedDate']
\ No newline at end of file
+        read_only_fields = ['VendorID', 'CompanyID', 'CreatedDate']
\ No newline at end of file
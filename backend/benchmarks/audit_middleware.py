@@ -0,0 +1,126 @@
+"""
+Microbenchmark of the per-request overhead of AuditLogMiddleware.
+
+Each scenario runs a request through a trivial view (which only resolves the
+URL, as Django's handler would) with and without the middleware and prints
+the difference per request. Entries are not written: the benchmark sink
+replaces ``_log_request`` with the JSON body parse the real one triggers, so
+the numbers are the cost of classifying the request and reading its body.
+
+``legacy`` is the previous per-request work for comparison: matching every
+excluded-URL regex and ``json.loads`` of every JSON body, logged or not.
+
+Usage (from the backend directory):
+    python -m benchmarks.audit_middleware --iterations 20000
+"""
+import argparse
+import gc
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.urls import resolve  # noqa: E402
+
+from apps.audit.middleware import AuditLogMiddleware  # noqa: E402
+from apps.audit.utils import request_body_data  # noqa: E402
+
+LEGACY_EXCLUDED_URLS = [r'^/admin/jsi18n/', r'^/static/', r'^/media/', r'^/favicon\.ico$']
+
+
+def view(request):
+    request.resolver_match = resolve(request.path_info)
+    return HttpResponse()
+
+
+class SinkMiddleware(AuditLogMiddleware):
+    """Decides like the real middleware but only parses the body instead of writing."""
+
+    logged = 0
+
+    def _log_request(self, request, response, action_type, action_description):
+        request_body_data(request)
+        SinkMiddleware.logged += 1
+
+
+def legacy_middleware(request):
+    """The old per-request work: parse every JSON body, then match each exclusion regex."""
+    if request.content_type == 'application/json' and request.body:
+        try:
+            request._body_data = json.loads(request.body)
+        except json.JSONDecodeError:
+            request._body_data = None
+    response = view(request)
+    for pattern in LEGACY_EXCLUDED_URLS:
+        if re.match(pattern, request.path):
+            break
+    return response
+
+
+def scenarios(factory, payload):
+    body = json.dumps(payload)
+    return [
+        ('media file', lambda: factory.get('/media/logo.png')),
+        ('list GET', lambda: factory.get('/accounting/general-ledger/')),
+        ('detail GET', lambda: factory.get('/accounting/general-ledger/1/')),
+        ('list POST', lambda: factory.post('/accounting/general-ledger/', body, content_type='application/json')),
+        ('admin POST', lambda: factory.post('/admin/login/', body, content_type='application/json')),
+    ]
+
+
+def per_request(handler, make_request, iterations, repeat):
+    """Best-of-``repeat`` seconds per request, with the garbage collector paused."""
+    best = None
+    for _ in range(repeat):
+        requests = [make_request() for _ in range(iterations)]
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            for request in requests:
+                handler(request)
+            elapsed = (time.perf_counter() - started) / iterations
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20_000, help='Requests per scenario and handler')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement; the fastest is reported')
+    parser.add_argument('--payload-lines', type=int, default=50, help='Lines in the JSON body of POST requests')
+    args = parser.parse_args()
+
+    factory = RequestFactory()
+    payload = {
+        'company': 1,
+        'lines': [{'account': i, 'debit': '10.00', 'memo': 'x' * 40} for i in range(args.payload_lines)],
+    }
+    middleware = SinkMiddleware(view)
+    middleware.classifier  # build the route table outside the timings
+    for _, make_request in scenarios(factory, payload):
+        view(make_request())  # warm the resolver caches
+
+    print(f"{'scenario':<12} {'view':>10} {'middleware':>12} {'legacy':>10}   (overhead per request)")
+    for label, make_request in scenarios(factory, payload):
+        base = per_request(view, make_request, args.iterations, args.repeat)
+        current = per_request(middleware, make_request, args.iterations, args.repeat)
+        legacy = per_request(legacy_middleware, make_request, args.iterations, args.repeat)
+        print(
+            f'{label:<12} {base * 1e6:8.1f} us {(current - base) * 1e6:10.1f} us {(legacy - base) * 1e6:8.1f} us'
+        )
+
+
+if __name__ == '__main__':
+    main()
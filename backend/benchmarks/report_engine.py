@@ -0,0 +1,157 @@
+"""
+Benchmark the shared report engine against the legacy per-account loop.
+
+Builds a synthetic company ledger in a local SQLite database and reports the
+query count and wall time for a balance sheet computed both ways. The engine
+is measured twice: summing the full ledger history and reading the daily
+balance snapshots (LEDGER_SNAPSHOTS_ENABLED).
+
+Usage (from the backend directory):
+    python -m benchmarks.report_engine --accounts 500 --rows 2000000
+    python -m benchmarks.report_engine --accounts 500 --rows 200000 --reuse
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.db.models import DecimalField, Sum, Value  # noqa: E402
+from django.db.models.functions import Coalesce  # noqa: E402
+from django.test.utils import CaptureQueriesContext, override_settings  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from apps.accounting.models import ChartOfAccount, GeneralLedger  # noqa: E402
+from apps.accounting.snapshots import rebuild_snapshots  # noqa: E402
+from apps.accounts.models import Company  # noqa: E402
+from apps.reports import engine  # noqa: E402
+
+ACCOUNT_TYPES = engine.ASSET_TYPES + engine.LIABILITY_TYPES + engine.EQUITY_TYPES + ('REVENUE', 'EXPENSE')
+BENCH_COMPANY = 'Benchmark Co'
+
+
+def build_ledger(accounts, rows, batch_size, seed):
+    """Create one company with ``accounts`` accounts and ``rows`` ledger lines."""
+    rng = random.Random(seed)
+    Company.objects.filter(CompanyName=BENCH_COMPANY).delete()
+    company = Company.objects.create(CompanyName=BENCH_COMPANY)
+
+    ChartOfAccount.objects.bulk_create(
+        [
+            ChartOfAccount(
+                CompanyID=company,
+                AccountCode=str(1000 + i),
+                AccountName=f'Account {i}',
+                AccountType=ACCOUNT_TYPES[i % len(ACCOUNT_TYPES)],
+            )
+            for i in range(accounts)
+        ],
+        batch_size=batch_size,
+    )
+    account_ids = list(ChartOfAccount.objects.filter(CompanyID=company).values_list('AccountID', flat=True))
+
+    start = timezone.make_aware(datetime(2020, 1, 1))
+    span_seconds = int(timedelta(days=5 * 365).total_seconds())
+    created = 0
+    while created < rows:
+        count = min(batch_size, rows - created)
+        batch = []
+        for _ in range(count):
+            amount = Decimal(rng.randrange(100, 1000000)) / 100
+            is_debit = rng.random() < 0.5
+            batch.append(GeneralLedger(
+                CompanyID=company,
+                AccountID_id=rng.choice(account_ids),
+                TransactionDate=start + timedelta(seconds=rng.randrange(span_seconds)),
+                DebitAmount=amount if is_debit else Decimal('0.00'),
+                CreditAmount=Decimal('0.00') if is_debit else amount,
+            ))
+        with transaction.atomic():
+            GeneralLedger.objects.bulk_create(batch, batch_size=batch_size)
+        created += count
+        print(f'  generated {created}/{rows} ledger rows', end='\r', flush=True)
+    print()
+    # bulk_create bypasses the snapshot signal handlers
+    print(f'  wrote {rebuild_snapshots([company.pk], batch_size=batch_size)} balance snapshots')
+    return company
+
+
+def legacy_balance_sheet(company, end_date):
+    """The pre-engine implementation: two aggregate queries per account."""
+    zero = Value(Decimal('0'), output_field=DecimalField())
+    total = Decimal('0')
+    accounts = ChartOfAccount.objects.filter(
+        CompanyID=company,
+        AccountType__in=engine.ASSET_TYPES + engine.LIABILITY_TYPES + engine.EQUITY_TYPES,
+    )
+    for account in accounts:
+        entries = GeneralLedger.objects.filter(AccountID=account, TransactionDate__lte=end_date)
+        debits = entries.aggregate(total=Coalesce(Sum('DebitAmount'), zero))['total']
+        credits = entries.aggregate(total=Coalesce(Sum('CreditAmount'), zero))['total']
+        total += engine.AccountBalance(debits, credits).normal_balance(account.AccountType)
+    return total
+
+
+def engine_balance_sheet(company, end_date):
+    """The shared engine: one account query plus one grouped balance query."""
+    account_types = engine.ASSET_TYPES + engine.LIABILITY_TYPES + engine.EQUITY_TYPES
+    accounts = list(ChartOfAccount.objects.filter(CompanyID=company, AccountType__in=account_types))
+    balances = engine.account_balances(company, end_date=end_date, account_types=account_types)
+    return engine.build_report_items(accounts, balances)[1]
+
+
+def engine_full_scan_balance_sheet(company, end_date):
+    """The shared engine with snapshots disabled: one grouped scan of the history."""
+    with override_settings(LEDGER_SNAPSHOTS_ENABLED=False):
+        return engine_balance_sheet(company, end_date)
+
+
+def measure(label, func, *args):
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+    print(f'{label:<10} queries={len(ctx.captured_queries):<6} wall={elapsed * 1000:10.1f} ms  total={result}')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--accounts', type=int, default=500, help='Accounts in the synthetic chart')
+    parser.add_argument('--rows', type=int, default=2_000_000, help='General ledger rows to generate')
+    parser.add_argument('--batch-size', type=int, default=10_000, help='bulk_create batch size')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible data')
+    parser.add_argument('--reuse', action='store_true', help='Reuse an existing benchmark ledger if present')
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+
+    company = Company.objects.filter(CompanyName=BENCH_COMPANY).first() if args.reuse else None
+    if company is None:
+        print(f'Building ledger: {args.accounts} accounts / {args.rows} rows')
+        company = build_ledger(args.accounts, args.rows, args.batch_size, args.seed)
+
+    end_date = timezone.make_aware(datetime(2030, 1, 1))
+    legacy_total = measure('legacy', legacy_balance_sheet, company, end_date)
+    scan_total = measure('scan', engine_full_scan_balance_sheet, company, end_date)
+    engine_total = measure('snapshot', engine_balance_sheet, company, end_date)
+    # SQLite sums decimals as floats, so compare to the cent
+    cents = Decimal('0.01')
+    if not legacy_total.quantize(cents) == scan_total.quantize(cents) == engine_total.quantize(cents):
+        print('WARNING: totals differ between legacy and engine implementations')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
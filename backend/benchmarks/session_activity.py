@@ -0,0 +1,77 @@
+"""
+Queries per request spent on the session by SessionSecurityMiddleware.
+
+A logged-in client makes ``--requests`` calls to the health check, spread
+over ``--span`` simulated seconds, once with the previous behaviour (the
+session saved on every request and ``last_activity`` rewritten each time)
+and once with activity tracking throttled to
+``SESSION_SECURITY_ACTIVITY_INTERVAL``, for each session engine. Reported
+are all queries per request and the writes to ``django_session``.
+
+Usage (from the backend directory):
+    python -m benchmarks.session_activity --requests 500 --span 600
+"""
+import argparse
+import os
+import sys
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext, override_settings  # noqa: E402
+
+from apps.accounts.models import User  # noqa: E402
+from lifeline_backend.cache import clear_all  # noqa: E402
+
+ENGINES = ['db', 'cached_db', 'cache', 'signed_cookies']
+START = 1_700_000_000.0
+
+
+def run(user, engine, requests, span, legacy):
+    overrides = {
+        'SESSION_ENGINE': f'django.contrib.sessions.backends.{engine}',
+        'SESSION_SAVE_EVERY_REQUEST': legacy,
+        'SESSION_SECURITY_ACTIVITY_INTERVAL': 0 if legacy else 60,
+        'SECURITY_RATE_LIMITS': {'ENABLED': False},
+        'ALLOWED_HOSTS': ['*'],
+    }
+    with override_settings(**overrides), mock.patch('apps.accounts.middleware.time.time') as clock:
+        clear_all()
+        clock.return_value = START
+        client = Client()
+        client.force_login(user)
+        client.get('/api/health/')
+        with CaptureQueriesContext(connection) as ctx:
+            for i in range(requests):
+                clock.return_value = START + span * (i + 1) / requests
+                client.get('/api/health/')
+    writes = [q for q in ctx.captured_queries if 'django_session' in q['sql'] and not q['sql'].startswith('SELECT')]
+    return len(ctx.captured_queries) / requests, len(writes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500, help='Requests per run')
+    parser.add_argument('--span', type=int, default=600, help='Simulated seconds the requests are spread over')
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    user, _ = User.objects.get_or_create(username='bench-session')
+
+    print(f"{'engine':<16} {'before q/req':>13} {'writes':>7} {'after q/req':>12} {'writes':>7}")
+    for engine in ENGINES:
+        before = run(user, engine, args.requests, args.span, legacy=True)
+        after = run(user, engine, args.requests, args.span, legacy=False)
+        print(f'{engine:<16} {before[0]:13.2f} {before[1]:7d} {after[0]:12.2f} {after[1]:7d}')
+
+
+if __name__ == '__main__':
+    main()
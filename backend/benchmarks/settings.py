@@ -0,0 +1,25 @@
+"""
+Settings for the standalone benchmarks.
+
+Reuses the application settings but points the default database at a local
+SQLite file so benchmarks never touch the shared SQL Server instance.
+"""
+import os
+import tempfile
+
+from lifeline_backend.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get(
+            'LIFELINE_BENCH_DB',
+            os.path.join(tempfile.gettempdir(), 'lifeline_bench.sqlite3'),
+        ),
+    }
+}
+
+# Keep benchmark output readable
+LOGGING['root']['level'] = 'WARNING'  # noqa: F405
+LOGGING['loggers']['django']['level'] = 'WARNING'  # noqa: F405
+LOGGING['loggers']['apps.security.middleware']['level'] = 'WARNING'  # noqa: F405
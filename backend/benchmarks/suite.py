@@ -0,0 +1,289 @@
+"""
+End-to-end benchmark scenarios on a generated dataset, recorded as JSON.
+
+Generates companies with lifeline_backend.datagen (bulk_create, so large
+datasets build quickly) in a local SQLite database, then times each
+scenario through the full request stack or service call, with the cache
+tiers cleared before every run:
+
+    balance_sheet      GET reports/balance-sheet/
+    income_statement   GET reports/income-statement/ for the last year
+    dashboard          GET accounts/dashboard/{metrics,activity,pending}/
+    invoice_list       GET invoices/
+    csv_import         process_import_file on an invoices CSV of --import-rows rows
+    audit_export       export_audit_logs of the company's audit log to CSV
+    gl_paging          --gl-pages keyset pages of accounting/general-ledger/
+
+Each scenario reports its median and fastest wall time over --repeat runs,
+after one untimed warm-up run, and the queries of one run. --output writes
+the results to JSON; with --baseline an earlier result file is compared
+scenario by scenario, and --max-regression fails the run when a scenario
+got slower by more than the given percentage or issues more queries.
+
+Usage (from the backend directory):
+    python -m benchmarks.suite --output /tmp/base.json
+    python -m benchmarks.suite --baseline /tmp/base.json --max-regression 20
+    python -m benchmarks.suite --gl-rows 1000000 --audit-rows 500000 --reuse --scenario gl_paging
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.files.base import ContentFile  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext, override_settings  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from apps.accounts.models import Company, User  # noqa: E402
+from apps.audit.exporters import export_audit_logs, filtered_audit_logs  # noqa: E402
+from apps.customers.models import Customer  # noqa: E402
+from apps.importer.models import ImportFile  # noqa: E402
+from apps.importer.services import process_import_file  # noqa: E402
+from apps.invoices.models import Invoice  # noqa: E402
+from lifeline_backend import datagen  # noqa: E402
+from lifeline_backend.cache import clear_all  # noqa: E402
+
+USERNAME = 'bench'
+PREFIX = 'Bench Company'
+
+
+class Context:
+    """What the scenarios share: an authenticated client, the first company and a scratch directory."""
+
+    def __init__(self, user, company, workdir, args):
+        self.company = company
+        self.workdir = workdir
+        self.args = args
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+        self.client.credentials(HTTP_X_COMPANY_ID=str(company.pk))
+        self.runs = 0
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params or {})
+        if response.status_code != 200:
+            raise RuntimeError(f'GET {url} returned {response.status_code}')
+        return response
+
+
+def balance_sheet(ctx):
+    ctx.get(reverse('balance-sheet'), {'company_id': ctx.company.pk})
+
+
+def income_statement(ctx):
+    today = timezone.now().date()
+    ctx.get(reverse('income-statement'), {
+        'company_id': ctx.company.pk,
+        'start_date': (today - timedelta(days=365)).isoformat(),
+        'end_date': today.isoformat(),
+    })
+
+
+def dashboard(ctx):
+    for name in ('dashboard_metrics', 'dashboard_activity', 'dashboard_pending'):
+        ctx.get(reverse(name))
+
+
+def invoice_list(ctx):
+    ctx.get(reverse('invoices-list'))
+
+
+def csv_import(ctx):
+    ctx.runs += 1
+    customer_ids = list(Customer.objects.filter(CompanyID=ctx.company).values_list('CustomerID', flat=True)[:100])
+    today = timezone.now().date()
+    lines = ['customer_id,invoice_number,invoice_date,due_date,total_amount,status']
+    for i in range(ctx.args.import_rows):
+        lines.append(
+            f'{customer_ids[i % len(customer_ids)]},IMP-{ctx.runs}-{i:07d},{today},{today + timedelta(days=30)},'
+            f'{(i % 1000) + 0.5},Sent'
+        )
+    import_file = ImportFile.objects.create(
+        CompanyID=ctx.company, FileType='invoices', File=ContentFile('\n'.join(lines).encode(), name='bench.csv'),
+    )
+    errors = process_import_file(import_file)
+    if errors:
+        raise RuntimeError(f'CSV import failed: {errors[:3]}')
+
+
+def audit_export(ctx):
+    export_audit_logs(filtered_audit_logs(company_id=ctx.company.pk), os.path.join(ctx.workdir, 'audit.csv'))
+
+
+def gl_paging(ctx):
+    response = ctx.get(reverse('generalledger-list'), {'pagination': 'keyset', 'page_size': 100, 'count': 'false'})
+    for _ in range(ctx.args.gl_pages - 1):
+        if not response.data['next']:
+            break
+        response = ctx.get(response.data['next'])
+
+
+def cleanup_imports(ctx):
+    """Drop what csv_import created, so the dataset stays the same across runs."""
+    Invoice.objects.filter(CompanyID=ctx.company, InvoiceNumber__startswith='IMP-').delete()
+    ImportFile.objects.filter(CompanyID=ctx.company).delete()
+
+
+def cleanup_export(ctx):
+    """export_audit_logs refuses to overwrite an earlier run's file."""
+    os.remove(os.path.join(ctx.workdir, 'audit.csv'))
+
+
+SCENARIOS = {
+    'balance_sheet': balance_sheet,
+    'income_statement': income_statement,
+    'dashboard': dashboard,
+    'invoice_list': invoice_list,
+    'csv_import': csv_import,
+    'audit_export': audit_export,
+    'gl_paging': gl_paging,
+}
+CLEANUP = {'csv_import': cleanup_imports, 'audit_export': cleanup_export}
+
+
+def measure(ctx, name, repeat):
+    """
+    Run one scenario ``repeat`` times on cold caches, after an untimed
+    warm-up run (imports, URL resolution); returns its result entry.
+    """
+    timings, queries = [], 0
+    for run in range(repeat + 1):
+        clear_all()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            SCENARIOS[name](ctx)
+            elapsed = time.perf_counter() - started
+        if run:
+            timings.append(elapsed)
+            queries = len(captured.captured_queries)
+        if name in CLEANUP:
+            CLEANUP[name](ctx)
+    return {
+        'wall_ms': round(statistics.median(timings) * 1000, 2),
+        'min_ms': round(min(timings) * 1000, 2),
+        'queries': queries,
+        'runs': repeat,
+    }
+
+
+def compare(results, baseline, max_regression=None):
+    """Print each scenario against ``baseline``; returns the names of the regressed scenarios."""
+    regressed = []
+    print(f"\n{'scenario':<18}{'baseline ms':>13}{'now ms':>11}{'change':>9}{'queries':>14}")
+    for name, now in results['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            print(f"{name:<18}{'-':>13}{now['wall_ms']:>11.1f}{'new':>9}{now['queries']:>14}")
+            continue
+        change = (now['wall_ms'] - before['wall_ms']) / before['wall_ms'] * 100 if before['wall_ms'] else 0.0
+        query_text = f"{before['queries']} -> {now['queries']}"
+        print(f"{name:<18}{before['wall_ms']:>13.1f}{now['wall_ms']:>11.1f}{change:>+8.1f}%{query_text:>14}")
+        if max_regression is not None and (change > max_regression or now['queries'] > before['queries']):
+            regressed.append(name)
+    if baseline.get('params') != results['params']:
+        print('WARNING: the baseline was recorded with different dataset parameters')
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--companies', type=int, default=1, help='Companies to generate')
+    parser.add_argument('--accounts', type=int, default=100, help='Accounts per company')
+    parser.add_argument('--gl-rows', type=int, default=100_000, help='General ledger rows (split across companies)')
+    parser.add_argument('--invoices', type=int, default=2_000, help='Invoices (split across companies)')
+    parser.add_argument('--bank-lines', type=int, default=10_000, help='Bank statement lines (split across companies)')
+    parser.add_argument('--audit-rows', type=int, default=50_000, help='Audit log rows (split across companies)')
+    parser.add_argument('--import-rows', type=int, default=2_000, help='Rows of the csv_import CSV')
+    parser.add_argument('--gl-pages', type=int, default=10, help='Keyset pages read by gl_paging')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per scenario')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='Run only this scenario (repeatable)')
+    parser.add_argument('--batch-size', type=int, default=5_000, help='bulk_create batch size')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible data')
+    parser.add_argument('--reuse', action='store_true', help='Reuse an existing benchmark dataset if present')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare against this earlier JSON result file')
+    parser.add_argument('--max-regression', type=float,
+                        help='With --baseline, exit 1 when a scenario is this many percent slower or runs more queries')
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+
+    params = {
+        'companies': args.companies, 'accounts': args.accounts, 'gl_rows': args.gl_rows,
+        'invoices': args.invoices, 'bank_lines': args.bank_lines, 'audit_rows': args.audit_rows,
+        'seed': args.seed,
+    }
+    user = User.objects.filter(username=USERNAME).first()
+    company = Company.objects.filter(CompanyName=f'{PREFIX} 1').first() if args.reuse else None
+    if user is None or company is None:
+        print('Generating: ' + ', '.join(f'{key}={value}' for key, value in params.items()))
+        started = time.perf_counter()
+        dataset = datagen.generate(
+            companies=args.companies, accounts=args.accounts, gl_rows=args.gl_rows, invoices=args.invoices,
+            bank_lines=args.bank_lines, audit_rows=args.audit_rows, username=USERNAME, prefix=PREFIX,
+            seed=args.seed, batch_size=args.batch_size,
+            progress=lambda company, counts: print(f'  {company.CompanyName}: {counts}', flush=True),
+        )
+        print(f'  generated in {time.perf_counter() - started:.1f}s: {dataset.counts}')
+        user, company = dataset.user, dataset.companies[0]
+
+    results = {
+        'created': timezone.now().isoformat(),
+        'params': {**params, 'import_rows': args.import_rows, 'gl_pages': args.gl_pages},
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+        },
+        'scenarios': {},
+    }
+    workdir = tempfile.mkdtemp(prefix='lifeline-bench-')
+    overrides = {
+        'ALLOWED_HOSTS': ['*'],
+        'MEDIA_ROOT': workdir,
+        'SECURITY_RATE_LIMITS': {'ENABLED': False},
+    }
+    try:
+        with override_settings(**overrides):
+            ctx = Context(user, company, workdir, args)
+            for name in args.scenario or SCENARIOS:
+                entry = results['scenarios'][name] = measure(ctx, name, args.repeat)
+                print(f"{name:<18} queries={entry['queries']:<6} wall={entry['wall_ms']:10.1f} ms  "
+                      f"min={entry['min_ms']:10.1f} ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+        print(f'Results written to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        regressed = compare(results, baseline, args.max_regression)
+        if regressed:
+            print(f"REGRESSED: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""
+Named cache tiers with an optional in-process L1 in front of a shared Redis L2.
+
+Every kind of hot data has its own cache alias (tier) with its own TTL and
+eviction settings, declared once in ``settings.CACHE_TIERS``:
+
+    sessions        session data behind the cached_db session engine
+    throttling      rate-limit counters and blocked IPs (must be shared, no L1)
+    reports         dashboard figures, audit statistics and other report results
+    company-scope   the company ids each user may access
+    auth            per-user version stamps invalidating cached token users (no L1)
+
+``build_caches`` turns the tiers into ``CACHES``. Without a Redis URL each
+tier is a per-process LocMemCache. With one, each tier is a RedisCache (the
+L2, shared by every worker and surviving restarts), fronted by a small
+LocMemCache L1 when the tier sets ``L1_TIMEOUT``. The L1 serves repeated
+reads without a network round trip; writes and deletes go to both levels,
+so another process sees a change after at most ``L1_TIMEOUT`` seconds.
+
+Code reads a tier with ``tier(REPORTS)`` etc., which falls back to the
+default cache when ``CACHES`` has no such alias (e.g. overridden settings).
+"""
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.module_loading import import_string
+
+SESSIONS = 'sessions'
+THROTTLING = 'throttling'
+REPORTS = 'reports'
+COMPANY_SCOPE = 'company-scope'
+AUTH = 'auth'
+
+LOCMEM_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+REDIS_BACKEND = 'django.core.cache.backends.redis.RedisCache'
+TIERED_BACKEND = 'lifeline_backend.cache.TieredCache'
+
+_MISSING = object()
+
+
+def build_caches(tiers, redis_url=None):
+    """
+    ``CACHES`` for ``tiers`` (``{alias: {TIMEOUT, MAX_ENTRIES, L1_TIMEOUT, L1_MAX_ENTRIES}}``).
+
+    ``MAX_ENTRIES`` bounds the in-process cache when there is no Redis;
+    ``L1_*`` configure the per-process layer in front of Redis.
+    """
+    configured = {}
+    for alias, tier in tiers.items():
+        common = {'TIMEOUT': tier.get('TIMEOUT', 300), 'KEY_PREFIX': tier.get('KEY_PREFIX', alias)}
+        if not redis_url:
+            configured[alias] = {
+                'BACKEND': LOCMEM_BACKEND,
+                'LOCATION': f'lifeline-{alias}',
+                'OPTIONS': {'MAX_ENTRIES': tier.get('MAX_ENTRIES', 10000)},
+                **common,
+            }
+        elif tier.get('L1_TIMEOUT'):
+            configured[alias] = {
+                'BACKEND': TIERED_BACKEND,
+                'LOCATION': alias,
+                'OPTIONS': {
+                    'L1_TIMEOUT': tier['L1_TIMEOUT'],
+                    'L1_MAX_ENTRIES': tier.get('L1_MAX_ENTRIES', 1000),
+                    'L2': {'BACKEND': REDIS_BACKEND, 'LOCATION': redis_url},
+                },
+                **common,
+            }
+        else:
+            configured[alias] = {'BACKEND': REDIS_BACKEND, 'LOCATION': redis_url, **common}
+    return configured
+
+
+def tier(alias):
+    """The cache of tier ``alias``, or the default cache when it is not configured."""
+    try:
+        return caches[alias]
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def clear_all():
+    """
+    Clear every configured cache (tests and deploy scripts).
+
+    On Redis clearing any one tier flushes the whole database, so tiers that
+    share a Redis database cannot be cleared separately.
+    """
+    for cache in caches.all():
+        cache.clear()
+
+
+class TieredCache(BaseCache):
+    """
+    A per-process LocMemCache L1 in front of a shared L2 backend.
+
+    ``OPTIONS``: ``L2`` (a cache config dict, normally RedisCache),
+    ``L1_TIMEOUT`` (seconds a value may be served from L1) and
+    ``L1_MAX_ENTRIES`` (L1 size before culling). Counters (``incr``) live in
+    L2 only, so they stay atomic across processes.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        l2 = dict(options['L2'])
+        backend = l2.pop('BACKEND')
+        l2_params = {
+            **l2,
+            'TIMEOUT': params.get('TIMEOUT', 300),
+            'KEY_PREFIX': params.get('KEY_PREFIX', ''),
+            'VERSION': params.get('VERSION', 1),
+        }
+        self.shared = import_string(backend)(l2.get('LOCATION', ''), l2_params)
+        self.l1_timeout = options.get('L1_TIMEOUT', 5)
+        self.local = LocMemCache(f'tiered-l1-{location}', {
+            'TIMEOUT': self.l1_timeout,
+            'KEY_PREFIX': params.get('KEY_PREFIX', ''),
+            'VERSION': params.get('VERSION', 1),
+            'OPTIONS': {'MAX_ENTRIES': options.get('L1_MAX_ENTRIES', 1000)},
+        })
+
+    def _l1_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self.l1_timeout
+        return min(timeout, self.l1_timeout)
+
+    def get(self, key, default=None, version=None):
+        value = self.local.get(key, _MISSING, version=version)
+        if value is not _MISSING:
+            return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        self.local.set(key, value, self.l1_timeout, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = self.local.get_many(keys, version=version)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            shared = self.shared.get_many(missing, version=version)
+            if shared:
+                self.local.set_many(shared, self.l1_timeout, version=version)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self.local.set(key, value, self._l1_timeout(timeout), version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        self.local.set_many(data, self._l1_timeout(timeout), version=version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self.local.set(key, value, self._l1_timeout(timeout), version=version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.delete(key, version=version)
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.local.delete(key, version=version)
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        self.local.delete_many(keys, version=version)
+        self.shared.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        return self.local.has_key(key, version=version) or self.shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self.local.delete(key, version=version)
+        return self.shared.incr(key, delta, version=version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
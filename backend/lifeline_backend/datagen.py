@@ -0,0 +1,294 @@
+"""
+Fast synthetic data for benchmarks and large sample datasets.
+
+``generate`` builds each table in memory one batch at a time - every column
+of a batch drawn with a single ``random.choices`` call - and writes it with
+``bulk_create``, one transaction per ``batch_size`` rows. Row totals are
+split across the companies by a distribution (``'even'``, ``'zipf'`` or
+explicit weights). Every company has its own random stream derived from
+``seed`` and its position, so the data is reproducible for a seed whatever
+the number of worker processes, and companies can be written in parallel
+(``workers``; not on SQLite, which has a single writer).
+
+Dates are spread over the ``days`` days up to now so the dashboard windows
+and report periods all have activity. ``bulk_create`` skips signals: the
+balance snapshots are rebuilt per company and the cache tiers are cleared,
+as the signal handlers would have done.
+"""
+import random
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from apps.accounting.models import ChartOfAccount, GeneralLedger
+from apps.accounting.snapshots import rebuild_snapshots
+from apps.accounts.models import Company, User, UserCompanyRole
+from apps.audit.models import AuditLog
+from apps.banking.models import BankAccount, BankStatementLine
+from apps.customers.models import Customer
+from apps.invoices.models import Invoice
+from apps.reports import engine
+from apps.vendors.models import Vendor
+
+from .cache import clear_all
+
+ACCOUNT_TYPES = (
+    engine.ASSET_TYPES + engine.LIABILITY_TYPES + engine.EQUITY_TYPES + engine.REVENUE_TYPES + engine.EXPENSE_TYPES
+)
+INVOICE_STATUSES = ('Draft', 'Sent', 'Paid', 'Overdue')
+AUDIT_ACTIONS = (AuditLog.CREATE, AuditLog.UPDATE, AuditLog.VIEW, AuditLog.DELETE, AuditLog.LOGIN)
+# One customer and one vendor per this many invoices (at least one of each)
+INVOICES_PER_PARTY = 20
+# Tables whose row totals are split across the companies
+DISTRIBUTED = ('gl_rows', 'invoices', 'bank_lines', 'audit_rows')
+SIDES = (True, False)
+
+Dataset = namedtuple('Dataset', 'user companies counts')
+
+
+def distribution_weights(distribution, companies):
+    """
+    Relative share of each company: ``'even'``, ``'zipf'`` (the n-th company
+    gets 1/n) or a comma separated list with one weight per company.
+    """
+    if distribution == 'even':
+        return [1.0] * companies
+    if distribution == 'zipf':
+        return [1.0 / (i + 1) for i in range(companies)]
+    try:
+        weights = [float(weight) for weight in str(distribution).split(',')]
+    except ValueError:
+        raise ValueError(f"Unknown distribution '{distribution}'; use even, zipf or comma separated weights")
+    if len(weights) != companies or min(weights) < 0 or not sum(weights):
+        raise ValueError(f'Expected {companies} non-negative weights, got {distribution!r}')
+    return weights
+
+
+def split(total, weights):
+    """Split ``total`` rows by ``weights`` into integers that add up to ``total`` (largest remainder)."""
+    scale = total / sum(weights)
+    shares = [weight * scale for weight in weights]
+    counts = [int(share) for share in shares]
+    by_remainder = sorted(range(len(weights)), key=lambda i: shares[i] - counts[i], reverse=True)
+    for i in by_remainder[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def _batches(total, batch_size):
+    while total > 0:
+        count = min(batch_size, total)
+        yield count
+        total -= count
+
+
+def _insert(model, objects):
+    with transaction.atomic():
+        model.objects.bulk_create(objects, batch_size=len(objects))
+    return len(objects)
+
+
+def _amounts(rng, count, high=1000000):
+    return [Decimal(cents).scaleb(-2) for cents in rng.choices(range(100, high), k=count)]
+
+
+def populate_company(company_id, user_id, plan, seed, start, span, batch_size):
+    """
+    Write one company's accounts, ledger, invoices, customers, vendors, bank
+    lines and audit log as given by ``plan`` (rows per table); returns the
+    rows written per table. Runs in a worker process when ``generate`` has
+    several ``workers``.
+    """
+    rng = random.Random(seed)
+    counts = {}
+    zero = Decimal('0.00')
+
+    def moments(count):
+        return [start + timedelta(seconds=second) for second in rng.choices(range(span), k=count)]
+
+    counts['accounts'] = _insert(ChartOfAccount, [
+        ChartOfAccount(
+            CompanyID_id=company_id,
+            AccountCode=str(1000 + i),
+            AccountName=f'Account {i}',
+            AccountType=ACCOUNT_TYPES[i % len(ACCOUNT_TYPES)],
+        )
+        for i in range(plan['accounts'])
+    ]) if plan['accounts'] else 0
+    account_ids = list(ChartOfAccount.objects.filter(CompanyID=company_id).values_list('AccountID', flat=True))
+
+    counts['general_ledger'] = 0
+    for count in _batches(plan['gl_rows'] if account_ids else 0, batch_size):
+        counts['general_ledger'] += _insert(GeneralLedger, [
+            GeneralLedger(
+                CompanyID_id=company_id,
+                AccountID_id=account_id,
+                TransactionDate=moment,
+                Description='Synthetic entry',
+                DebitAmount=amount if is_debit else zero,
+                CreditAmount=zero if is_debit else amount,
+                UserID_id=user_id,
+            )
+            for account_id, moment, amount, is_debit in zip(
+                rng.choices(account_ids, k=count), moments(count), _amounts(rng, count), rng.choices(SIDES, k=count),
+            )
+        ])
+
+    parties = max(1, plan['invoices'] // INVOICES_PER_PARTY)
+    counts['customers'] = _insert(Customer, [
+        Customer(CompanyID_id=company_id, Name=f'Customer {i + 1}', Email=f'customer{i + 1}@example.com')
+        for i in range(parties)
+    ])
+    counts['vendors'] = _insert(Vendor, [
+        Vendor(CompanyID_id=company_id, Name=f'Vendor {i + 1}', Email=f'vendor{i + 1}@example.com')
+        for i in range(parties)
+    ])
+    customer_ids = list(Customer.objects.filter(CompanyID=company_id).values_list('CustomerID', flat=True))
+
+    counts['invoices'] = 0
+    for count in _batches(plan['invoices'], batch_size):
+        first = counts['invoices']
+        counts['invoices'] += _insert(Invoice, [
+            Invoice(
+                CompanyID_id=company_id,
+                CustomerID_id=customer_id,
+                InvoiceNumber=f'INV-{first + i + 1:07d}',
+                InvoiceDate=moment.date(),
+                DueDate=moment.date() + timedelta(days=30),
+                TotalAmount=amount,
+                Status=status,
+                UserID_id=user_id,
+            )
+            for i, (customer_id, moment, amount, status) in enumerate(zip(
+                rng.choices(customer_ids, k=count), moments(count), _amounts(rng, count),
+                rng.choices(INVOICE_STATUSES, k=count),
+            ))
+        ])
+
+    bank_account = BankAccount.objects.create(
+        CompanyID_id=company_id, AccountNumber=f'{company_id:04d}-0001', BankName='Bench Bank', AccountType='Checking',
+    )
+    counts['bank_accounts'] = 1
+    counts['bank_lines'] = 0
+    for count in _batches(plan['bank_lines'], batch_size):
+        first = counts['bank_lines']
+        counts['bank_lines'] += _insert(BankStatementLine, [
+            BankStatementLine(
+                BankAccountID=bank_account,
+                TransactionDate=moment,
+                TransactionNumber=f'TX-{first + i + 1:08d}',
+                Description='Synthetic deposit' if is_credit else 'Synthetic payment',
+                Amount=amount if is_credit else -amount,
+                TransactionType='CREDIT' if is_credit else 'DEBIT',
+                IsImported=True,
+            )
+            for i, (moment, amount, is_credit) in enumerate(zip(
+                moments(count), _amounts(rng, count, high=500000), rng.choices(SIDES, k=count),
+            ))
+        ])
+
+    counts['audit_logs'] = 0
+    record_ids = range(1, plan['invoices'] + 1) if plan['invoices'] else range(1)
+    for count in _batches(plan['audit_rows'], batch_size):
+        counts['audit_logs'] += _insert(AuditLog, [
+            AuditLog(
+                UserID_id=user_id,
+                CompanyID_id=company_id,
+                ActionType=action,
+                ActionDescription=f'{action} invoice',
+                Action=action,
+                TableName='invoices_invoice',
+                RecordID=record_id,
+                IPAddress='127.0.0.1',
+                UserAgent='datagen',
+                ActionDate=moment,
+            )
+            for action, record_id, moment in zip(
+                rng.choices(AUDIT_ACTIONS, k=count), rng.choices(record_ids, k=count), moments(count),
+            )
+        ])
+
+    # bulk_create bypasses the snapshot signal handlers
+    counts['balance_snapshots'] = rebuild_snapshots([company_id], batch_size=min(batch_size, 10000))
+    return counts
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+
+
+def delete_dataset(prefix):
+    """Remove the companies (and everything under them) of an earlier ``generate`` run."""
+    Company.objects.filter(CompanyName__startswith=f'{prefix} ').delete()
+
+
+def generate(companies=1, accounts=50, gl_rows=10000, invoices=1000, bank_lines=1000, audit_rows=1000,
+             distribution='even', username='bench', password='bench-password', prefix='Bench Company', seed=42,
+             batch_size=5000, days=730, workers=1, progress=None):
+    """
+    Create ``companies`` companies owned by ``username``, each with
+    ``accounts`` accounts, sharing ``gl_rows`` ledger lines, ``invoices``
+    invoices (with their customers and vendors), ``bank_lines`` statement
+    lines on one bank account per company and ``audit_rows`` audit entries
+    according to ``distribution`` (see ``distribution_weights``).
+
+    Companies from an earlier run with the same ``prefix`` are deleted first.
+    ``progress(company, counts)`` is called as each company is done. Returns
+    a ``Dataset`` of the user, the companies and the rows written per table.
+    """
+    weights = distribution_weights(distribution, companies)
+    totals = {'gl_rows': gl_rows, 'invoices': invoices, 'bank_lines': bank_lines, 'audit_rows': audit_rows}
+    shares = {table: split(total, weights) for table, total in totals.items()}
+    plans = [
+        {'accounts': accounts, **{table: shares[table][i] for table in DISTRIBUTED}}
+        for i in range(companies)
+    ]
+
+    delete_dataset(prefix)
+    user = User.objects.filter(username=username).first()
+    if user is None:
+        user = User.objects.create_user(username=username, password=password, email=f'{username}@example.com')
+
+    Company.objects.bulk_create(
+        [Company(CompanyName=f'{prefix} {i + 1}', AdminUserID=user) for i in range(companies)]
+    )
+    # SQL Server does not return bulk inserted keys
+    company_list = list(Company.objects.filter(CompanyName__startswith=f'{prefix} ').order_by('CompanyID'))
+    UserCompanyRole.objects.bulk_create(
+        [UserCompanyRole(UserID=user, CompanyID=company, Role='owner') for company in company_list]
+    )
+    counts = {'companies': len(company_list), 'roles': len(company_list)}
+
+    end = timezone.now()
+    start = end - timedelta(days=days)
+    span = int((end - start).total_seconds())
+    jobs = [
+        (company, (company.pk, user.pk, plans[i], f'{seed}-{i}', start, span, batch_size))
+        for i, company in enumerate(company_list)
+    ]
+
+    def done(company, company_counts):
+        for table, rows in company_counts.items():
+            counts[table] = counts.get(table, 0) + rows
+        if progress is not None:
+            progress(company, company_counts)
+
+    if workers > 1 and len(jobs) > 1 and connection.vendor != 'sqlite':
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = {pool.submit(populate_company, *job): company for company, job in jobs}
+            for future in as_completed(futures):
+                done(futures[future], future.result())
+    else:
+        for company, job in jobs:
+            done(company, populate_company(*job))
+
+    clear_all()
+    return Dataset(user, company_list, counts)
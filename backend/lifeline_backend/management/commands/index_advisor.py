@@ -0,0 +1,188 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from apps.accounting import snapshots
+from apps.accounting.models import GeneralLedger
+from apps.accounting.views import GeneralLedgerViewSet
+from apps.accounts.company_scope import allowed_company_ids
+from apps.accounts.models import Company, User, UserCompanyRole
+from apps.audit.models import AuditLog
+from apps.banking.models import BankAccount
+from apps.banking.views import BankStatementLineViewSet
+from apps.invoices.views import InvoiceViewSet
+from apps.reports import engine
+
+# (pattern, label, is_full_scan) per database vendor
+PLAN_FLAGS = {
+    'sqlite': [
+        (re.compile(r'^SCAN (?!CONSTANT ROW)(?!.*\bUSING\b)'), 'full scan', True),
+        (re.compile(r'USE TEMP B-TREE'), 'sort', False),
+    ],
+    'microsoft': [
+        (re.compile(r'\b(Table Scan|Clustered Index Scan)\b'), 'full scan', True),
+        (re.compile(r'\|--Sort\('), 'sort', False),
+    ],
+}
+
+
+def _viewset_queryset(viewset_class, user, params=None, headers=None):
+    """Build the list queryset a viewset would run for ``user`` with ``params``."""
+    django_request = APIRequestFactory().get('/', params or {}, **(headers or {}))
+    view = viewset_class(action_map={'get': 'list'}, args=(), kwargs={}, format_kwarg=None)
+    request = view.initialize_request(django_request)
+    request.user = user
+    view.request = request
+    view.headers = {}
+    return view.filter_queryset(view.get_queryset())
+
+
+def _scenarios(company, user, since):
+    """Yield ``(name, description, queryset)`` for the hot company-scoped queries."""
+    yield (
+        'gl-viewset', 'GeneralLedgerViewSet list',
+        _viewset_queryset(GeneralLedgerViewSet, user),
+    )
+    yield (
+        'gl-report', 'General ledger report page (company entries by date, newest first)',
+        GeneralLedger.objects.filter(CompanyID__in=allowed_company_ids(user), TransactionDate__gte=since)
+        .order_by('-TransactionDate', '-TransactionID')[:50],
+    )
+    yield (
+        'report-window', 'Income statement balances (grouped ledger window)',
+        engine.grouped_totals_query(engine.ledger_entries(company, since, timezone.now()), 'AccountID'),
+    )
+    yield (
+        'balance-snapshots', 'Balance sheet: latest snapshot per account before the cutoff day',
+        snapshots.latest_snapshots(company, before_day=timezone.localdate()),
+    )
+    yield (
+        'balance-tail', 'Balance sheet: cutoff-day ledger tail',
+        engine.grouped_totals_query(
+            engine.ledger_entries(company, snapshots.day_start(timezone.localdate()), timezone.now()), 'AccountID'
+        ),
+    )
+    yield (
+        'invoice-viewset', 'InvoiceViewSet list (newest first)',
+        _viewset_queryset(InvoiceViewSet, user, {'CompanyID': company.pk}),
+    )
+    bank_params = {'company': company.pk}
+    bank_account = BankAccount.objects.filter(CompanyID=company).values_list('pk', flat=True).first()
+    if bank_account:
+        bank_params['account'] = bank_account
+    yield (
+        'bank-lines-viewset', 'BankStatementLineViewSet list for one account',
+        _viewset_queryset(BankStatementLineViewSet, user, bank_params),
+    )
+    yield (
+        'audit-company', 'Company audit trail since a date (newest first)',
+        AuditLog.objects.filter(CompanyID=company, ActionDate__gte=since),
+    )
+
+
+def explain(queryset):
+    """Return the database's query plan for ``queryset`` as a list of lines."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+        if connection.vendor == 'microsoft':
+            cursor.execute('SET SHOWPLAN_TEXT ON')
+            try:
+                cursor.execute(sql, params)
+                lines = []
+                while True:
+                    if cursor.description:
+                        lines.extend(row[0].rstrip() for row in cursor.fetchall())
+                    if not cursor.nextset():
+                        break
+                return [line for line in lines if line]
+            finally:
+                cursor.execute('SET SHOWPLAN_TEXT OFF')
+
+    raise CommandError(f"index_advisor does not support the '{connection.vendor}' backend")
+
+
+def classify(plan_lines):
+    """Return ``[(label, is_full_scan, line)]`` for every plan step worth flagging."""
+    flags = []
+    for line in plan_lines:
+        for pattern, label, is_full_scan in PLAN_FLAGS.get(connection.vendor, []):
+            if pattern.search(line.strip()):
+                flags.append((label, is_full_scan, line.strip()))
+    return flags
+
+
+class Command(BaseCommand):
+    help = 'Explain the ORM queries behind the hot list views and reports and flag full table scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Company ID to replay the queries for')
+        parser.add_argument('--user', help='Username to replay the viewsets as (default: a user of the company)')
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help='Only run this scenario (repeatable)')
+        parser.add_argument('--days', type=int, default=90, help='Date window for the range queries')
+        parser.add_argument('--show-sql', action='store_true', help='Print the SQL of every query')
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help='Exit with an error when any query performs a full scan')
+
+    def handle(self, *args, **options):
+        company = self._company(options['company'])
+        user = self._user(company, options['user'])
+        since = timezone.now() - timedelta(days=options['days'])
+
+        self.stdout.write(f"Database: {connection.vendor} | Company: {company.pk} | User: {user.username}")
+        scanned = []
+        for name, description, queryset in _scenarios(company, user, since):
+            if options['scenarios'] and name not in options['scenarios']:
+                continue
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name}: {description}"))
+            if options['show_sql']:
+                self.stdout.write(f"  SQL: {queryset.query}")
+            plan = explain(queryset)
+            for line in plan:
+                self.stdout.write(f"  {line}")
+            for label, is_full_scan, line in classify(plan):
+                style = self.style.ERROR if is_full_scan else self.style.WARNING
+                self.stdout.write(style(f"  ! {label}: {line}"))
+                if is_full_scan:
+                    scanned.append(name)
+
+        self.stdout.write('')
+        if scanned:
+            summary = f"Full scans in: {', '.join(sorted(set(scanned)))}"
+            if options['fail_on_scan']:
+                raise CommandError(summary)
+            self.stdout.write(self.style.WARNING(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS("No full table scans detected"))
+
+    def _company(self, company_id):
+        if company_id:
+            company = Company.objects.filter(pk=company_id).first()
+            if company is None:
+                raise CommandError(f"Company {company_id} does not exist")
+            return company
+        company_id = GeneralLedger.objects.order_by().values_list('CompanyID', flat=True).first()
+        company = Company.objects.filter(pk=company_id).first() if company_id else Company.objects.first()
+        if company is None:
+            raise CommandError("No company found; load data first (e.g. manage.py populate_sample_data)")
+        return company
+
+    def _user(self, company, username):
+        if username:
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                raise CommandError(f"User {username} does not exist")
+            return user
+        role = UserCompanyRole.objects.filter(CompanyID=company).select_related('UserID').first()
+        if role is None:
+            raise CommandError(f"No user has a role in company {company.pk}; pass --user")
+        return role.UserID
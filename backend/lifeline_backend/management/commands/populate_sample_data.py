@@ -1,5 +1,8 @@
 
-from django.core.management.base import BaseCommand
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
 from django.utils import timezone
 from decimal import Decimal
 from datetime import date
@@ -15,11 +18,38 @@ from apps.inventory.models import Inventory, InventoryLocation, InvoiceLineItem,
 from apps.payroll.models import Employee, Payroll, PayrollDeduction, TimeEntry
 from apps.subscriptions.models import Subscription
 from apps.banking.models import BankAccount
+from lifeline_backend import datagen
 
 class Command(BaseCommand):
-    help = 'Populate database with minimal sample data for testing'
+    help = (
+        'Populate database with minimal sample data for testing, or with --scale '
+        'a large generated dataset for load testing'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', action='store_true',
+                            help='Bulk generate a load-testing dataset (lifeline_backend.datagen) instead')
+        parser.add_argument('--companies', type=int, default=10, help='Companies to generate')
+        parser.add_argument('--accounts', type=int, default=100, help='Accounts per company')
+        parser.add_argument('--gl-rows', type=int, default=1_000_000, help='General ledger rows in total')
+        parser.add_argument('--invoices', type=int, default=100_000, help='Invoices in total')
+        parser.add_argument('--bank-lines', type=int, default=100_000, help='Bank statement lines in total')
+        parser.add_argument('--audit-rows', type=int, default=100_000, help='Audit log rows in total')
+        parser.add_argument('--distribution', default='even',
+                            help="Split of the totals across companies: even, zipf or weights like '5,3,1'")
+        parser.add_argument('--days', type=int, default=730, help='Days of history up to today')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--batch-size', type=int, default=50_000, help='Rows built and inserted per transaction')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes writing companies in parallel (ignored on SQLite)')
+        parser.add_argument('--username', default='loadtest', help='Owner of the generated companies')
+        parser.add_argument('--prefix', default='Load Test Company',
+                            help='Company name prefix; companies of an earlier run with it are replaced')
 
     def handle(self, *args, **options):
+        if options['scale']:
+            return self._scale(options)
+
         # Clear all data
         self.stdout.write('Clearing all data...')
         TimeEntry.objects.all().delete()
@@ -314,4 +344,33 @@ class Command(BaseCommand):
             Status='Active'
         )
 
-        self.stdout.write(self.style.SUCCESS('Successfully populated database with minimal sample data!'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS('Successfully populated database with minimal sample data!'))
+
+    def _scale(self, options):
+        if options['workers'] > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('SQLite has a single writer; using one process'))
+        self.stdout.write(
+            f"Generating {options['companies']} companies ({options['distribution']}): "
+            f"{options['gl_rows']} ledger rows, {options['invoices']} invoices, "
+            f"{options['bank_lines']} bank lines, {options['audit_rows']} audit rows"
+        )
+        started = time.perf_counter()
+        try:
+            dataset = datagen.generate(
+                companies=options['companies'], accounts=options['accounts'], gl_rows=options['gl_rows'],
+                invoices=options['invoices'], bank_lines=options['bank_lines'], audit_rows=options['audit_rows'],
+                distribution=options['distribution'], username=options['username'], password='password123',
+                prefix=options['prefix'], seed=options['seed'], batch_size=options['batch_size'],
+                days=options['days'], workers=options['workers'],
+                progress=lambda company, counts: self.stdout.write(
+                    f"  {company.CompanyName}: {counts['general_ledger']} ledger rows"
+                ),
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+        for table, rows in dataset.counts.items():
+            self.stdout.write(f'  {table:<18} {rows}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated in {elapsed:.1f}s; log in as {options['username']} / password123"
+        ))
@@ -0,0 +1,209 @@
+"""
+Keyset (seek) pagination for large, append-mostly tables.
+
+``PageNumberPagination`` runs ``OFFSET n`` plus a ``COUNT(*)`` for every page,
+so deep pages of the general ledger, bank statement lines or audit log cost
+as much as scanning everything before them. ``KeysetPagination`` instead
+orders by a unique key - e.g. ``(-TransactionDate, -TransactionID)`` - and
+asks for the rows after the last one served::
+
+    WHERE TransactionDate < %s OR (TransactionDate = %s AND TransactionID < %s)
+
+which an index on the ordering columns answers in O(page size) at any depth.
+
+Keyset mode is opt-in per request so existing clients keep their response
+shape: pass ``?cursor=`` (empty for the first page) or ``?pagination=keyset``.
+Follow the ``next``/``previous`` links from then on. ``?count=false`` skips
+the total count. Without those parameters the ``fallback_class`` paginator is
+used, or no pagination at all when it is None.
+"""
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+FALSE_VALUES = ('0', 'false', 'no', 'off')
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate on the unique, non-null ``ordering`` fields of the queryset.
+
+    Subclasses set ``ordering`` (field names, ``-`` for descending, ending
+    with a unique column such as the primary key) and optionally
+    ``fallback_class``.
+    """
+
+    ordering = ('-pk',)
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    mode_query_param = 'pagination'
+    fallback_class = None
+
+    def __init__(self):
+        self._fallback = None
+        self._model = None
+
+    # --- mode selection ---------------------------------------------------------
+
+    def is_requested(self, request):
+        return (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == 'keyset'
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            if self.fallback_class is None:
+                return None
+            self._fallback = self.fallback_class()
+            return self._fallback.paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self._model = queryset.model
+        self.page_size = self.get_page_size(request)
+        reverse, position = self.decode_cursor(request)
+
+        ordering = self._ordering(reverse)
+        queryset = queryset.order_by(*ordering)
+        self.count = None
+        if request.query_params.get(self.count_query_param, 'true').lower() not in FALSE_VALUES:
+            self.count = queryset.order_by().count()
+        if position is not None:
+            queryset = queryset.filter(self._seek(ordering, position))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Moving forward there is a previous page whenever we came from a cursor, and vice versa
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else has_more
+        self.first, self.last = (rows[0], rows[-1]) if rows else (None, None)
+        return rows
+
+    def get_paginated_response(self, data):
+        if self._fallback is not None:
+            return self._fallback.get_paginated_response(data)
+        payload = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+    # --- cursors ----------------------------------------------------------------
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _field_names(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def _ordering(self, reverse):
+        if not reverse:
+            return list(self.ordering)
+        return [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+
+    def _seek(self, ordering, position):
+        """``(a, b) > (x, y)`` in the given ordering, expanded for SQL Server (no row values)."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def encode_cursor(self, instance, reverse):
+        values = [getattr(instance, self._attname(name)) for name in self._field_names()]
+        payload = json.dumps({'r': int(reverse), 'p': [None if v is None else str(v) for v in values]})
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        """Return ``(reverse, position)``; position is None for the first page."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            names = self._field_names()
+            if len(payload['p']) != len(names):
+                raise ValueError('cursor does not match the ordering')
+            position = [self._to_python(name, value) for name, value in zip(names, payload['p'])]
+            return bool(payload['r']), position
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound('Invalid cursor')
+
+    def _model_field(self, name):
+        model = self._model
+        return model._meta.pk if name == 'pk' else model._meta.get_field(name)
+
+    def _attname(self, name):
+        return self._model_field(name).attname
+
+    def _to_python(self, name, value):
+        if value is None:
+            return None
+        return self._model_field(name).to_python(value)
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self._link(self.encode_cursor(self.last, reverse=False))
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first is None:
+            return None
+        return self._link(self.encode_cursor(self.first, reverse=True))
+
+    def _link(self, cursor):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.mode_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+
+class GeneralLedgerKeysetPagination(KeysetPagination):
+    """Newest ledger entries first; matches the (CompanyID, -TransactionDate) index."""
+
+    ordering = ('-TransactionDate', '-TransactionID')
+
+
+class LedgerReportPagination(GeneralLedgerKeysetPagination):
+    """The general ledger report: page numbers by default, keyset on request."""
+
+    class fallback_class(PageNumberPagination):
+        page_size = 50
+
+
+class BankStatementLinePagination(KeysetPagination):
+    ordering = ('-TransactionDate', '-BankStatementLineID')
+
+
+class AuditLogPagination(KeysetPagination):
+    ordering = ('-ActionDate', '-AuditID')
@@ -2,6 +2,7 @@ from pathlib import Path
 from datetime import timedelta
 import sys
 import os
+from lifeline_backend.cache import build_caches
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -68,8 +69,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'apps.security.metrics.RequestMetricsMiddleware',  # Per-route latency and query metrics (/api/metrics/)
     'apps.security.middleware.FedRAMPSecurityMiddleware',  # FedRAMP security headers and rate limiting
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'apps.security.profiling.RequestProfilingMiddleware',  # Opt-in request profiles (request_profiles command)
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -108,7 +111,9 @@ CSRF_COOKIE_SECURE = False
 # Session security settings
 SESSION_COOKIE_AGE = 3600  # 1 hour in seconds
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
-SESSION_SAVE_EVERY_REQUEST = True  # Update session expiry on each request
+# Save sessions only when modified; SessionSecurityMiddleware refreshes
+# last_activity (and so the expiry) at most every ACTIVITY_INTERVAL seconds
+SESSION_SAVE_EVERY_REQUEST = False
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SECURE = False  # True for HTTPS in production
 SESSION_COOKIE_SAMESITE = 'Lax'
@@ -116,16 +121,40 @@ SESSION_COOKIE_SAMESITE = 'Lax'
 # Force logout after inactivity
 SESSION_SECURITY_WARN_AFTER = 1800  # 30 minutes
 SESSION_SECURITY_EXPIRE_AFTER = 3600  # 1 hour
+SESSION_SECURITY_ACTIVITY_INTERVAL = 60  # Seconds before last_activity is rewritten
 
 AUTH_USER_MODEL = 'accounts.User'
 
-# Cache configuration for security middleware
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
+# Cache tiers (lifeline_backend.cache). Without LIFELINE_REDIS_URL every tier is
+# an in-process LocMemCache; with it each tier lives in Redis (shared by all
+# workers), fronted by a per-process L1 of L1_TIMEOUT seconds where set.
+CACHE_REDIS_URL = os.environ.get('LIFELINE_REDIS_URL')
+CACHE_TIERS = {
+    'default': {'TIMEOUT': 300, 'MAX_ENTRIES': 10000},
+    'sessions': {'TIMEOUT': 3600, 'MAX_ENTRIES': 10000},
+    # Counters must be exact across workers: never an L1
+    'throttling': {'TIMEOUT': 300, 'MAX_ENTRIES': 50000},
+    'reports': {'TIMEOUT': 600, 'MAX_ENTRIES': 2000, 'L1_TIMEOUT': 10, 'L1_MAX_ENTRIES': 500},
+    # Short L1: role changes reach other workers within L1_TIMEOUT seconds
+    'company-scope': {'TIMEOUT': 300, 'MAX_ENTRIES': 20000, 'L1_TIMEOUT': 5, 'L1_MAX_ENTRIES': 5000},
+    # Token revocation must reach every worker at once: never an L1
+    'auth': {'TIMEOUT': 300, 'MAX_ENTRIES': 10000},
 }
+CACHES = build_caches(CACHE_TIERS, CACHE_REDIS_URL)
+
+# Sessions are read from the sessions cache tier and written through to the database.
+# LIFELINE_SESSION_ENGINE may select 'django.contrib.sessions.backends.cache' (the
+# sessions tier only, no database writes; needs Redis with more than one worker) or
+# 'django.contrib.sessions.backends.signed_cookies' (stored in the signed cookie).
+SESSION_ENGINE = os.environ.get('LIFELINE_SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Seconds a user's company ids stay cached (apps.accounts.company_scope)
+COMPANY_SCOPE_CACHE_TIMEOUT = 300
+
+# Seconds a company's dashboard figures stay cached (apps.dashboard.services);
+# ledger changes drop them sooner
+DASHBOARD_CACHE_TIMEOUT = 300
 
 ROOT_URLCONF = 'lifeline_backend.urls'
 
@@ -170,6 +199,8 @@ if 'test' in sys.argv:
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'test_db.sqlite3',
     }
+    # SQLite ignores the INCLUDE columns of covering indexes (SQL Server uses them)
+    SILENCED_SYSTEM_CHECKS = ['models.W040']
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -234,13 +265,54 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         # Allow Authorization: Bearer <token> as a fallback during local development
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.accounts.authentication.CachedJWTAuthentication',
         'apps.accounts.authentication.JWTCookieAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'apps.security.ratelimit.UserRateLimitThrottle',
+    ),
+}
+
+# Per-route latency and database metrics (apps.security.metrics), served to
+# staff users at /api/metrics/ in the Prometheus text format
+REQUEST_METRICS = {
+    'ENABLED': True,
+    'LATENCY_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    'QUERY_BUCKETS': (0, 1, 2, 5, 10, 20, 50, 100, 200),
+}
+
+# Opt-in request profiling (apps.security.profiling): requests with a signed
+# X-Lifeline-Profile header (request_profiles sign) or from USER_IDS are profiled
+# into DIRECTORY, which keeps the MAX_PROFILES most recently used profiles.
+REQUEST_PROFILING = {
+    'ENABLED': True,
+    'ENGINE': 'cprofile',  # or 'pyinstrument' (sampling; pip install pyinstrument)
+    'HEADER': 'X-Lifeline-Profile',
+    'HEADER_MAX_AGE': 3600,
+    'USER_IDS': [],
+    'DIRECTORY': os.path.join(BASE_DIR, 'logs', 'profiles'),
+    'MAX_PROFILES': 200,
+    'MAX_BYTES': 200 * 1024 * 1024,
+}
+
+# Rate limits (apps.security.ratelimit): per client IP in FedRAMPSecurityMiddleware,
+# per user in the DRF throttle. Counters live in CACHES[CACHE]; use a shared
+# (Redis) cache so every worker process enforces the same budget.
+SECURITY_RATE_LIMITS = {
+    'ENABLED': 'test' not in sys.argv,
+    'CACHE': 'throttling',
+    'ALGORITHM': 'sliding',  # or 'fixed'
+    'DEFAULT': '100/m',
+    'ROUTES': {
+        '/accounts/auth/login/': '10/m',
+        '/token/': '10/m',
+        '/importer/': '30/m',
+    },
+    'USER': '600/m',
 }
 
 SIMPLE_JWT = {
@@ -261,11 +333,45 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_COOKIE_SECURE': False, # Should be True in production
 }
 
+# Users behind verified access tokens, cached per process by jti (apps.accounts.token_cache).
+# Entries live until the token expires, at most TIMEOUT seconds.
+TOKEN_USER_CACHE = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 300,
+}
+
 # For local development allow JWT cookies to be sent in cross-site (frontend at different host)
 # Set SameSite=None for dev so cookies are attached when using withCredentials
 SIMPLE_JWT['ACCESS_TOKEN_COOKIE_SAMESITE'] = None
 SIMPLE_JWT['REFRESH_TOKEN_COOKIE_SAMESITE'] = None
 
+# Point-in-time report balances read AccountBalanceSnapshot plus the cutoff-day tail.
+# Disable to fall back to summing the full ledger history.
+LEDGER_SNAPSHOTS_ENABLED = True
+
+# Buffered audit log writer (apps.audit.writer). Tests write synchronously so
+# assertions can read rows straight after the request.
+AUDIT_LOG_WRITER = {
+    'ENABLED': 'test' not in sys.argv,
+    'BACKEND': 'thread',  # or 'celery' to insert batches from a worker
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 2.0,
+    'MAX_QUEUE': 10000,
+    'SPILL_PATH': os.path.join(BASE_DIR, 'logs', 'audit_spill.ndjson'),
+}
+
+# Audit log retention (apps.audit.retention, prune_audit_logs)
+AUDIT_LOG_RETENTION = {
+    'BATCH_SIZE': 4000,   # AuditID range deleted per transaction
+    'SLEEP': 0.0,         # pause between batches to leave room for live writes
+    'LAYOUT': 'single',   # or 'monthly' to move closed months into AuditLog_YYYYMM tables
+    'LIVE_MONTHS': 1,     # closed months kept in the live table by the monthly layout
+}
+
+# Per (company, day) audit statistics summaries (apps.audit.stats); today is never cached
+AUDIT_STATS_CACHE_TIMEOUT = 7 * 24 * 3600
+
 # Celery configuration
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
@@ -46,7 +46,9 @@ CSRF_COOKIE_SECURE = True
 # Session security settings
 SESSION_COOKIE_AGE = 3600  # 1 hour in seconds
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
-SESSION_SAVE_EVERY_REQUEST = True  # Update session expiry on each request
+# Save sessions only when modified; SessionSecurityMiddleware refreshes
+# last_activity (and so the expiry) at most every ACTIVITY_INTERVAL seconds
+SESSION_SAVE_EVERY_REQUEST = False
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SECURE = True  # HTTPS required
 SESSION_COOKIE_SAMESITE = 'Lax'
@@ -54,6 +56,11 @@ SESSION_COOKIE_SAMESITE = 'Lax'
 # Force logout after inactivity
 SESSION_SECURITY_WARN_AFTER = 1800  # 30 minutes
 SESSION_SECURITY_EXPIRE_AFTER = 3600  # 1 hour
+SESSION_SECURITY_ACTIVITY_INTERVAL = 60  # Seconds before last_activity is rewritten
+
+# Shared cache tiers in Redis (database 1; Celery uses 0)
+CACHE_REDIS_URL = os.environ.get('LIFELINE_REDIS_URL', 'redis://localhost:6379/1')
+CACHES = build_caches(CACHE_TIERS, CACHE_REDIS_URL)
 
 STATIC_ROOT = '/var/www/lifeline-accounting/static/'
 MEDIA_ROOT = '/var/www/lifeline-accounting/media/'
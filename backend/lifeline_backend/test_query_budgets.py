@@ -0,0 +1,149 @@
+"""
+Query budgets per API endpoint; CI fails when an endpoint regresses past its budget.
+
+List endpoints are measured with one and with five rows of their data: a
+count that grows with the rows is an N+1 and fails even within budget.
+Budgets are for a force-authenticated client with a warm company scope
+cache, so they count the endpoint's own queries only.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import count
+
+from django.contrib.contenttypes.models import ContentType
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from apps.accounting.models import ChartOfAccount, GeneralLedger
+from apps.accounts.models import Company, User, UserCompanyRole
+from apps.audit.models import AuditLog
+from apps.bills.models import Bill
+from apps.customers.models import Customer
+from apps.invoices.models import Invoice
+from apps.vendors.models import Vendor
+
+from .cache import clear_all
+from .testing import QueryBudgetMixin
+
+# url name -> maximum queries for a list request
+QUERY_BUDGETS = {
+    'dashboard_activity': 1,
+    'dashboard_pending': 2,
+    'generalledger-list': 1,
+    'chartofaccount-list': 1,
+    'invoices-list': 1,
+    'customer-list': 1,
+    'vendor-list': 1,
+    'bill-list': 1,
+    'company-list': 1,
+    'usercompanyrole-list': 1,
+    'audit:list': 1,
+}
+
+
+class ListEndpointQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):  # noqa: D401
+        """A superuser with one company, its customer, vendor and account."""
+        clear_all()
+        self.sequence = count(1)
+        self.user = User.objects.create_superuser(username="budget", password="pass1234", email="b@example.com")
+        self.company = Company.objects.create(CompanyName="Budget Co")
+        UserCompanyRole.objects.create(UserID=self.user, CompanyID=self.company, Role="owner")
+        self.customer = Customer.objects.create(CompanyID=self.company, Name="Customer")
+        self.vendor = Vendor.objects.create(CompanyID=self.company, Name="Vendor")
+        self.account = ChartOfAccount.objects.create(
+            CompanyID=self.company, AccountCode="1000", AccountName="Cash", AccountType="ASSET",
+        )
+        self.client.force_authenticate(self.user)
+        self.client.get(reverse('customer-list'))  # warm the company scope cache
+
+    def check(self, url_name, add_rows):
+        self.assertConstantQueries(reverse(url_name), add_rows, QUERY_BUDGETS[url_name])
+
+    def add_ledger(self, n):
+        for _ in range(n):
+            GeneralLedger.objects.create(
+                CompanyID=self.company, AccountID=self.account, TransactionDate=timezone.now(),
+                DebitAmount=Decimal('10.00'),
+            )
+
+    def add_invoices(self, n):
+        for _ in range(n):
+            i = next(self.sequence)
+            customer = Customer.objects.create(CompanyID=self.company, Name=f"Customer {i}")
+            Invoice.objects.create(
+                CompanyID=self.company, CustomerID=customer, InvoiceNumber=f"INV-{i}",
+                InvoiceDate=date(2024, 1, 1), DueDate=date(2024, 2, 1), TotalAmount=Decimal('100'), Status='Open',
+            )
+
+    def add_bills(self, n):
+        for _ in range(n):
+            i = next(self.sequence)
+            vendor = Vendor.objects.create(CompanyID=self.company, Name=f"Vendor {i}")
+            Bill.objects.create(
+                CompanyID=self.company, VendorID=vendor, BillNumber=f"BILL-{i}",
+                BillDate=date(2024, 1, 1), DueDate=date(2024, 2, 1), TotalAmount=Decimal('50'), Status='Open',
+            )
+
+    def add_companies(self, n):
+        for _ in range(n):
+            company = Company.objects.create(CompanyName=f"Company {next(self.sequence)}", AdminUserID=self.user)
+            UserCompanyRole.objects.create(UserID=self.user, CompanyID=company, Role="member")
+
+    def add_audit_logs(self, n):
+        content_type = ContentType.objects.get_for_model(Invoice)
+        for _ in range(n):
+            AuditLog.objects.create(
+                UserID=self.user, CompanyID=self.company, ActionType='VIEW',
+                ActionDescription='Viewed', ContentType=content_type, ObjectID=str(next(self.sequence)),
+                ActionDate=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            )
+
+    def test_dashboard_activity(self):
+        self.check('dashboard_activity', self.add_ledger)
+
+    def test_dashboard_pending(self):
+        self.check('dashboard_pending', lambda n: (self.add_invoices(n), self.add_bills(n)))
+
+    def test_general_ledger(self):
+        self.check('generalledger-list', self.add_ledger)
+
+    def test_chart_of_accounts(self):
+        def add_accounts(n):
+            for _ in range(n):
+                ChartOfAccount.objects.create(
+                    CompanyID=self.company, AccountCode=str(next(self.sequence)), AccountName="A", AccountType="ASSET",
+                )
+        self.check('chartofaccount-list', add_accounts)
+
+    def test_invoices(self):
+        self.check('invoices-list', self.add_invoices)
+
+    def test_customers_and_vendors(self):
+        self.check('customer-list', lambda n: Customer.objects.bulk_create(
+            [Customer(CompanyID=self.company, Name=f"C{next(self.sequence)}") for _ in range(n)]
+        ))
+        self.check('vendor-list', lambda n: Vendor.objects.bulk_create(
+            [Vendor(CompanyID=self.company, Name=f"V{next(self.sequence)}") for _ in range(n)]
+        ))
+
+    def test_bills(self):
+        self.check('bill-list', self.add_bills)
+
+    def test_companies_and_roles(self):
+        self.check('company-list', self.add_companies)
+        self.check('usercompanyrole-list', self.add_companies)
+
+    def test_audit_logs(self):
+        self.check('audit:list', self.add_audit_logs)
+
+    def test_current_user_with_company_roles(self):
+        self.assertConstantQueries(reverse('current_user'), self.add_companies, 1)
+
+    def test_user_company_role_admin_changelist(self):
+        """The changelist renders UserCompanyRole.__str__ and its FK columns per row"""
+        self.client.force_login(self.user)
+        self.assertConstantQueries(
+            reverse('admin:accounts_usercompanyrole_changelist'), self.add_companies, 4,
+        )
@@ -0,0 +1,56 @@
+"""
+Query budgets for API endpoints.
+
+``QueryBudgetMixin`` makes a request with the test client and counts the SQL
+it sends. ``assertQueryBudget`` fails when an endpoint needs more queries
+than its budget; ``assertConstantQueries`` also grows the data behind a list
+endpoint and fails unless the count stays the same, which is how an N+1
+(a lazy foreign key read per row) shows up. Both print the captured SQL on
+failure.
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """For APITestCase/TestCase classes that authenticate ``self.client``."""
+
+    def count_queries(self, url, method='get', **kwargs):
+        """Request ``url``; return ``(response, captured queries)``."""
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 400, f'{method.upper()} {url} -> {response.status_code}')
+        return response, queries.captured_queries
+
+    def _format(self, queries):
+        return '\n'.join(f"{i}. {query['sql']}" for i, query in enumerate(queries, 1))
+
+    def assertQueryBudget(self, url, budget, method='get', **kwargs):
+        """``url`` answers successfully in at most ``budget`` queries; returns the response."""
+        response, queries = self.count_queries(url, method, **kwargs)
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{method.upper()} {url} used {len(queries)} queries (budget {budget}):\n{self._format(queries)}',
+        )
+        return response
+
+    def assertConstantQueries(self, url, add_rows, budget, sizes=(1, 5)):
+        """
+        ``url`` needs the same number of queries, within ``budget``, whether
+        ``add_rows(n)`` has added ``sizes[0]`` or ``sizes[-1]`` rows in total.
+        """
+        counts = []
+        added = 0
+        for size in sizes:
+            add_rows(size - added)
+            added = size
+            _, queries = self.count_queries(url)
+            counts.append(queries)
+        self.assertEqual(
+            len(counts[0]), len(counts[-1]),
+            f'{url} query count grows with rows ({len(counts[0])} -> {len(counts[-1])}):\n{self._format(counts[-1])}',
+        )
+        self.assertLessEqual(
+            len(counts[-1]), budget,
+            f'{url} used {len(counts[-1])} queries (budget {budget}):\n{self._format(counts[-1])}',
+        )
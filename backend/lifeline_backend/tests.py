@@ -0,0 +1,250 @@
+import os
+import socketserver
+import threading
+import time
+
+from django.core.cache.backends.redis import RedisCache
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+
+from apps.accounting.models import AccountBalanceSnapshot, ChartOfAccount, GeneralLedger
+from apps.accounts.models import Company
+from apps.audit.models import AuditLog
+from apps.banking.models import BankStatementLine
+from apps.invoices.models import Invoice
+from apps.security.ratelimit import RedisCounter, counter_for
+
+from . import datagen
+from .cache import TieredCache, build_caches
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """Speaks enough RESP3 for Django's RedisCache: strings, expiry, counters and MULTI/EXEC."""
+
+    def handle(self):
+        queued = None
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            name = command[0].upper()
+            if name == 'MULTI':
+                queued = []
+                self._write('+OK')
+            elif name == 'EXEC':
+                results = [self.server.run(item) for item in queued or []]
+                queued = None
+                self._write(results)
+            elif queued is not None:
+                queued.append(command)
+                self._write('+QUEUED')
+            else:
+                self._write(self.server.run(command))
+
+    def _read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        args = []
+        for _ in range(int(header[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return [args[0].decode()] + args[1:]
+
+    def _encode(self, value):
+        if isinstance(value, str) and value[:1] in '+-':
+            return value.encode() + b'\r\n'
+        if value is None:
+            return b'_\r\n'
+        if isinstance(value, int):
+            return b':%d\r\n' % value
+        if isinstance(value, dict):
+            return b'%%%d\r\n' % len(value) + b''.join(
+                self._encode(item) for pair in value.items() for item in pair
+            )
+        if isinstance(value, list):
+            return b'*%d\r\n' % len(value) + b''.join(self._encode(item) for item in value)
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def _write(self, value):
+        self.wfile.write(self._encode(value))
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeRedisHandler)
+        self.data = {}
+        self.expires = {}
+        self.commands = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'redis://%s:%d/0' % self.server_address
+
+    def _live(self, key):
+        if key in self.expires and self.expires[key] <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def run(self, command):
+        name, args = command[0].upper(), command[1:]
+        with self.lock:
+            self.commands.append(name)
+            if name == 'HELLO':
+                return {b'server': b'fake', b'proto': 3}
+            if name in ('PING', 'SELECT'):
+                return '+OK' if name == 'SELECT' else '+PONG'
+            if name == 'GET':
+                return self.data[args[0]] if self._live(args[0]) else None
+            if name == 'MGET':
+                return [self.data[key] if self._live(key) else None for key in args]
+            if name == 'SET':
+                key, value, options = args[0], args[1], [arg.decode().upper() for arg in args[2:]]
+                if 'NX' in options and self._live(key):
+                    return None
+                self.data[key] = value
+                self.expires.pop(key, None)
+                if 'EX' in options:
+                    self.expires[key] = time.monotonic() + int(options[options.index('EX') + 1])
+                return '+OK'
+            if name == 'MSET':
+                for key, value in zip(args[::2], args[1::2]):
+                    self.data[key] = value
+                    self.expires.pop(key, None)
+                return '+OK'
+            if name == 'EXPIRE':
+                if not self._live(args[0]):
+                    return 0
+                self.expires[args[0]] = time.monotonic() + int(args[1])
+                return 1
+            if name == 'EXISTS':
+                return sum(1 for key in args if self._live(key))
+            if name == 'DEL':
+                return sum(1 for key in args if self._live(key) and self.data.pop(key) is not None)
+            if name in ('INCR', 'INCRBY'):
+                delta = int(args[1]) if name == 'INCRBY' else 1
+                value = int(self.data[args[0]]) + delta if self._live(args[0]) else delta
+                self.data[args[0]] = str(value).encode()
+                return value
+            if name == 'FLUSHDB':
+                self.data.clear()
+                self.expires.clear()
+                return '+OK'
+            return f'-ERR unknown command {name}'
+
+
+class CacheTierTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.redis = FakeRedisServer()
+        threading.Thread(target=cls.redis.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.redis.shutdown()
+        cls.redis.server_close()
+        super().tearDownClass()
+
+    def setUp(self):  # noqa: D401
+        """Tier configuration as in settings, pointed at the fake Redis server."""
+        self.redis.data.clear()
+        self.caches = build_caches({
+            'throttling': {'TIMEOUT': 60},
+            'reports': {'TIMEOUT': 600, 'L1_TIMEOUT': 30, 'L1_MAX_ENTRIES': 100},
+        }, self.redis.url)
+
+    def _open(self, alias, worker):
+        """A cache as one worker process would build it (its own L1)."""
+        config = dict(self.caches[alias])
+        backend = TieredCache if config['BACKEND'].endswith('TieredCache') else RedisCache
+        return backend(f"{config['LOCATION']}-{worker}", config)
+
+    def test_tiers_without_l1_are_plain_redis_caches(self):
+        self.assertEqual(self.caches['throttling']['BACKEND'], 'django.core.cache.backends.redis.RedisCache')
+        self.assertEqual(self.caches['throttling']['KEY_PREFIX'], 'throttling')
+        self.assertIsInstance(counter_for(self._open('throttling', 'a')), RedisCounter)
+
+    def test_l1_serves_repeat_reads_and_l2_is_shared(self):
+        """Reads after the first never reach Redis; another worker sees the value through Redis"""
+        first, second = self._open('reports', 'a'), self._open('reports', 'b')
+        first.set('figures', {'revenue': 10})
+
+        before = len(self.redis.commands)
+        for _ in range(5):
+            self.assertEqual(first.get('figures'), {'revenue': 10})
+        self.assertEqual(len(self.redis.commands), before)
+
+        self.assertEqual(second.get('figures'), {'revenue': 10})
+        self.assertEqual(self.redis.commands[-1], 'GET')
+
+        second.delete('figures')
+        self.assertIsNone(second.get('figures'))
+        self.assertIsNone(self._open('reports', 'c').get('figures'))
+
+    def test_counters_are_atomic_in_the_shared_level(self):
+        """incr goes to Redis, bypassing L1, so every worker counts on the same value"""
+        first, second = self._open('reports', 'a'), self._open('reports', 'b')
+        first.set('hits', 1)
+        self.assertEqual(second.incr('hits'), 2)
+        self.assertEqual(first.incr('hits'), 3)
+        self.assertEqual(second.get_many(['hits', 'missing']), {'hits': 3})
+
+
+class DatagenTest(TestCase):
+    def test_generates_the_requested_rows_split_across_companies(self):
+        dataset = datagen.generate(
+            companies=2, accounts=12, gl_rows=100, invoices=40, bank_lines=10, audit_rows=15, batch_size=16,
+            distribution='3,1',
+        )
+        self.assertEqual(len(dataset.companies), 2)
+        for company, (gl_rows, invoices, bank_lines, audit_rows) in zip(
+            dataset.companies, [(75, 30, 8, 11), (25, 10, 2, 4)]
+        ):
+            self.assertEqual(ChartOfAccount.objects.filter(CompanyID=company).count(), 12)
+            self.assertEqual(GeneralLedger.objects.filter(CompanyID=company).count(), gl_rows)
+            self.assertEqual(Invoice.objects.filter(CompanyID=company).count(), invoices)
+            self.assertEqual(BankStatementLine.objects.filter(BankAccountID__CompanyID=company).count(), bank_lines)
+            self.assertEqual(AuditLog.objects.filter(CompanyID=company).count(), audit_rows)
+        self.assertEqual(dataset.counts['general_ledger'], 100)
+        self.assertEqual(set(dataset.user.companies.all()), set(dataset.companies))
+        self.assertTrue(AccountBalanceSnapshot.objects.filter(CompanyID=dataset.companies[0]).exists())
+
+        # A second run replaces the first instead of adding to it
+        datagen.generate(companies=1, accounts=3, gl_rows=5, invoices=1, bank_lines=1, audit_rows=1)
+        self.assertEqual(Company.objects.count(), 1)
+        self.assertEqual(GeneralLedger.objects.count(), 5)
+
+    def test_same_seed_same_data(self):
+        def ledger():
+            datagen.generate(companies=2, accounts=5, gl_rows=30, invoices=4, bank_lines=2, audit_rows=2, seed=7)
+            return list(GeneralLedger.objects.order_by('TransactionID').values_list(
+                'AccountID__AccountCode', 'DebitAmount', 'CreditAmount', 'CompanyID__CompanyName',
+            ))
+
+        self.assertEqual(ledger(), ledger())
+
+    def test_distributions(self):
+        self.assertEqual(datagen.split(10, datagen.distribution_weights('even', 3)), [4, 3, 3])
+        self.assertEqual(datagen.split(110, datagen.distribution_weights('zipf', 3)), [60, 30, 20])
+        with self.assertRaises(ValueError):
+            datagen.distribution_weights('1,2', 3)
+        with self.assertRaises(ValueError):
+            datagen.distribution_weights('normal', 3)
+
+
+class TestDiscoveryTest(SimpleTestCase):
+    def test_app_test_packages_are_importable(self):
+        """A tests/ directory without __init__.py is silently skipped by manage.py test"""
+        apps_dir = os.path.join(settings.BASE_DIR, 'apps')
+        missing = [
+            os.path.relpath(os.path.join(root, 'tests'), settings.BASE_DIR)
+            for root, dirs, _ in os.walk(apps_dir)
+            if 'tests' in dirs and not os.path.exists(os.path.join(root, 'tests', '__init__.py'))
+        ]
+        self.assertEqual(missing, [])